@@ -0,0 +1,217 @@
+# This Python file uses the following encoding: utf-8
+"""
+用合成数据对数据处理的各个环节计时: 读取(Plastic.plastic_data)、吸附量(Adsorption.adsorption_quantity)、
+线性/非线性拟合与绘图; 每次运行的结果追加为结果文件中的一行JSON, 并与上一次运行对比
+
+    python benchmark.py --sizes 10 1000 100000 --output benchmark_results.jsonl
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from data_treatment import SpectrumCache, QuantityCache, Plastic, Adsorption
+from fitting import linear_fit, nonlinear_fit, PFO
+from synthetic import Spectrum, generate
+
+# 每个初始浓度的时间梯度, scans个数据文件对应scans/10个初始浓度
+TIMES = [5, 10, 15, 20, 30, 40, 50, 70, 90, 120]
+CONCENTRATIONS = [5, 10, 25, 50, 80, 100, 120, 150]
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Dataset(object):
+    """
+    :description: 一个规模的合成数据集, 已生成时直接复用
+    """
+    def __init__(self, root, scans, seed=0):
+        self.root = os.path.join(root, "n%d" % scans)
+        self.scans = scans
+        self.series = max(1, scans // len(TIMES))
+        # 初始浓度两位小数, 保证文件名各不相同
+        self.init_concentrations = np.round(20 + 0.01 * np.arange(self.series), 2).tolist()
+        self.seed = seed
+        self.spectrum = Spectrum()
+        self.generated = None
+
+    def prepare(self):
+        marker = os.path.join(self.root, "manifest.json")
+        if not os.path.exists(marker):
+            start = time.perf_counter()
+            generate(self.root, CONCENTRATIONS, self.init_concentrations, TIMES, "amino", self.spectrum,
+                     seed=self.seed)
+            self.generated = time.perf_counter() - start
+        return self
+
+    @property
+    def blank(self):
+        return os.path.join(self.root, "water.csv")
+
+    def paths(self):
+        # 每个初始浓度一个按时间排序的路径列表
+        return [[os.path.join(self.root, "amino_adsorption", "%g-%g.csv" % (c0, t)) for t in TIMES]
+                for c0 in self.init_concentrations]
+
+
+class Benchmark(object):
+    """
+    :description: 各环节的计时, 每个环节重复repeat次取最短时间
+    """
+    wave_length = 526
+    mass = 0.02
+    init_volume = 0.1
+    sample = 0.004
+    # 绘图环节最多绘制的图片数量
+    figures = 20
+
+    def __init__(self, dataset, repeat=3, output_dir=None):
+        self.dataset = dataset
+        self.repeat = repeat
+        self.output_dir = output_dir
+        self.results = []
+
+    def time(self, name, func, items, setup=None):
+        best = float("inf")
+        for _ in range(self.repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        record = {"name": name, "scans": self.dataset.scans, "items": items, "seconds": best,
+                  "per_item": best / items if items else None}
+        self.results.append(record)
+        print("%-24s scans=%-7d items=%-7d %10.4f s  %10.2f us/item"
+              % (name, record["scans"], items, best, 1e6 * (record["per_item"] or 0.0)))
+        return record
+
+    def run(self):
+        ds = self.dataset
+        paths = ds.paths()
+        flat = [p for series in paths for p in series]
+        a, b = ds.spectrum.a, ds.spectrum.b
+        enabled = SpectrumCache.enabled
+        if ds.generated is not None:
+            self.results.append({"name": "generate", "scans": ds.scans, "items": len(flat), "seconds": ds.generated,
+                                 "per_item": ds.generated / len(flat)})
+        try:
+            # 读取: 不使用缓存的文本解析、首次写入磁盘缓存、命中磁盘缓存
+            def parse():
+                SpectrumCache.enabled = False
+                SpectrumCache.clear()
+
+            def cold():
+                SpectrumCache.enabled = True
+                SpectrumCache.clear(os.path.dirname(flat[0]))
+
+            self.time("ingest/parse", lambda: Plastic.plastic_data(path=flat, blank=ds.blank), len(flat), parse)
+            self.time("ingest/cache_cold", lambda: Plastic.plastic_data(path=flat, blank=ds.blank), len(flat), cold)
+            self.time("ingest/cache_warm", lambda: Plastic.plastic_data(path=flat, blank=ds.blank), len(flat),
+                      SpectrumCache.clear)
+        finally:
+            SpectrumCache.enabled = enabled
+
+        # 吸附量: 逐个初始浓度调用adsorption_quantity, 以及一次批量计算的quantity_grid
+        def quantities():
+            return [Adsorption.adsorption_quantity(c0, p, self.wave_length, a, b, self.mass, self.init_volume,
+                                                   self.sample, blank=ds.blank)
+                    for c0, p in zip(ds.init_concentrations, paths)]
+
+        self.time("adsorption_quantity", quantities, len(flat), QuantityCache.clear)
+        self.time("quantity_grid", lambda: Adsorption.quantity_grid(ds.init_concentrations, paths, self.wave_length,
+                                                                    a, b, self.mass, self.init_volume, self.sample,
+                                                                    blank=ds.blank), len(flat))
+
+        # 拟合: 全部初始浓度的PSO线性化与PFO非线性拟合各一次批量完成
+        q = Adsorption.quantity_grid(ds.init_concentrations, paths, self.wave_length, a, b, self.mass,
+                                     self.init_volume, self.sample, blank=ds.blank)[:, 1:]
+        t = np.broadcast_to(np.asarray(TIMES, dtype=np.double), q.shape)
+        self.time("fit/linear_pso", lambda: linear_fit(t, t / q), len(q))
+        self.time("fit/nonlinear_pfo", lambda: nonlinear_fit(PFO, t, q), len(q))
+
+        if self.output_dir is not None:
+            self.time("render/kinetics_pso", lambda: self.render(t, q), min(self.figures, len(q)))
+        return self.results
+
+    def render(self, t, q):
+        from operation_model import Kinetics, Render
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        for i in range(min(self.figures, len(q))):
+            y = t[i] / q[i]
+            Kinetics.kinetics_pso(t[i], y, "amino", 2, "English", [0, t[i][-1] + 10],
+                                  [float(np.min(y)) - 1, float(np.max(y)) + 1],
+                                  os.path.join(self.output_dir, "pso_%d.png" % i))
+        Render.flush()
+
+
+def previous_run(output):
+    # 结果文件中的上一次运行
+    if not os.path.exists(output):
+        return None
+    with open(output, "r", encoding="utf-8") as f:
+        lines = [line for line in f if line.strip()]
+    return json.loads(lines[-1]) if lines else None
+
+
+def compare(run, previous):
+    before = {(r["name"], r["scans"]): r["seconds"] for r in previous["results"]}
+    print("\n与上一次运行(%s)对比:" % (previous.get("commit") or "unknown")[:10])
+    for r in run["results"]:
+        old = before.get((r["name"], r["scans"]))
+        if old:
+            print("%-24s scans=%-7d %10.4f s -> %10.4f s  (x%.2f)" % (r["name"], r["scans"], old, r["seconds"],
+                                                                    r["seconds"] / old))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="数据处理各环节的基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000], help="数据文件数量")
+    parser.add_argument("--data", default="bench_data", help="合成数据目录, 已生成的规模直接复用")
+    parser.add_argument("--output", default="benchmark_results.jsonl", help="结果文件, 每次运行追加一行JSON")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-render", action="store_true", help="跳过绘图环节")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if not args.no_render:
+        from operation_model import Render
+        Render.use_headless()
+
+    results = []
+    for size in args.sizes:
+        dataset = Dataset(args.data, size, args.seed).prepare()
+        figures = None if args.no_render else os.path.join(dataset.root, "figures")
+        results.extend(Benchmark(dataset, args.repeat, figures).run())
+
+    run = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime()),
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    previous = previous_run(args.output)
+    with open(args.output, "a", encoding="utf-8") as f:
+        f.write(json.dumps(run, ensure_ascii=False) + "\n")
+    if previous is not None:
+        compare(run, previous)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
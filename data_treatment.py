@@ -1,101 +1,495 @@
 # This Python file uses the following encoding: utf-8
 import math
+import os
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
 import pandas as pd
 import numpy as np
-from copy import deepcopy as dcp
 from math import log
+from emscan import Scan, ScanHeader, read_scan, read_at, pick
+from fitting import linear_fit, nonlinear_fit, bootstrap, KINETIC_MODELS, ISOTHERM_MODELS, isotherm_model
+from parallel import map_jobs
+from results import ResultSink
+from timing import Timing
 
-water = pd.read_csv("water.csv").iloc[20::, 1]
-wave_arr = np.array(pd.read_csv("water.csv").iloc[20::, 0], dtype=np.double)
+logger = logging.getLogger(__name__)
+
+
+class SpectrumCache(object):
+    """
+    :description: 荧光仪数据文件(.csv)的二进制缓存, 每个文件解析一次后以.npy形式保存荧光强度,
+                  以.json形式保存元数据头, 之后的运行直接读取而跳过文本解析
+    """
+    # 缓存根目录, 为None时在每个数据目录下建立.spectrum_cache子目录
+    root = os.environ.get("SR_SPECTRUM_CACHE")
+    enabled = True
+    # 为True时以文件内容的哈希作为键, 否则以路径、大小和修改时间作为键
+    by_content = False
+    # 进程内缓存(整个进程共用), 同一次运行中重复读取同一文件时不再访问磁盘; 缓存的荧光强度为只读数组, 可在线程间共享;
+    # 最多保留memory_limit次扫描, 超出时丢弃最久未使用的
+    memory_limit = 4096
+    _memory = OrderedDict()
+    _lock = threading.Lock()
+    # 本进程中已清理过过期缓存的目录, 每个目录只在第一次写入缓存时清理一次; 与_memory一样在_lock下读写
+    _pruned = set()
+    # 超过该时间(秒)仍未完成的临时文件视为写入失败的残留
+    stale_after = 3600
+
+    @classmethod
+    def key(cls, path):
+        """
+        :description: 计算数据文件的缓存键
+        :param path: 数据文件(.csv)路径
+        :return: 十六进制字符串
+        """
+        if cls.by_content:
+            with open(path, "rb") as f:
+                return hashlib.sha1(f.read()).hexdigest()
+        st = os.stat(path)
+        raw = "%s|%d|%d" % (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def cache_dir(cls, directory):
+        # 数据目录对应的磁盘缓存目录
+        return cls.root if cls.root else os.path.join(os.path.abspath(directory), ".spectrum_cache")
+
+    @classmethod
+    def cache_file(cls, path, key):
+        return os.path.join(cls.cache_dir(os.path.dirname(os.path.abspath(path))), key + ".npy")
+
+    @staticmethod
+    def parse(path):
+        # 文本解析, 仅在缓存未命中时调用
+        with Timing.span("parse", "io", files=1) as span:
+            if span:
+                span.add(bytes=os.path.getsize(path))
+            return read_scan(path)
+
+    @classmethod
+    def load(cls, path, remember=True, disk=True):
+        """
+        :description: 读取数据文件, 优先使用进程内缓存和磁盘缓存
+        :param path: 数据文件(.csv)路径
+        :param remember: 为False时只使用磁盘缓存, 不放入进程内缓存(调用方自己保存荧光强度时使用, 避免内存中存两份)
+        :param disk: 为False时不读取也不写入磁盘缓存(调用方自己把荧光强度保存到磁盘时使用, 避免磁盘上存两份)
+        :return: Scan(元数据头与荧光强度)
+        """
+        if not cls.enabled:
+            return cls.parse(path)
+        key = cls.key(path)
+        with cls._lock:
+            scan = cls._memory.get(key)
+            if scan is not None:
+                cls._memory.move_to_end(key)
+                return scan
+        if not disk:
+            scan = cls.parse(path)
+            scan.intensity.setflags(write=False)
+            return cls._remember(key, scan) if remember else scan
+        npy = cls.cache_file(path, key)
+        try:
+            with open(npy[:-4] + ".json", "r", encoding="utf-8") as f:
+                header = ScanHeader(**json.load(f)["header"])
+            scan = Scan(header, np.load(npy))
+        except (OSError, ValueError, TypeError, KeyError):
+            scan = cls.parse(path)
+            cls._store(npy, scan, path)
+        scan.intensity.setflags(write=False)
+        return cls._remember(key, scan) if remember else scan
+
+    @classmethod
+    def _remember(cls, key, scan):
+        with cls._lock:
+            # 多个线程同时读取同一文件时只保留先写入的一份
+            scan = cls._memory.setdefault(key, scan)
+            cls._memory.move_to_end(key)
+            while len(cls._memory) > cls.memory_limit:
+                cls._memory.popitem(last=False)
+            return scan
+
+    @classmethod
+    def _store(cls, npy, scan, source):
+        # 先写临时文件再替换, 防止多个进程同时写入时读到不完整的文件
+        # 元数据头最后写入, 只有.json存在时才认为缓存完整; .json中记录数据文件路径, 供prune判断缓存是否过期
+        root = os.path.dirname(npy)
+        with cls._lock:
+            first = root not in cls._pruned
+            cls._pruned.add(root)
+        # 清理在锁外进行, 不阻塞其他线程读取进程内缓存
+        if first:
+            cls.prune(cache=root)
+        meta = {"source": os.path.abspath(source), "header": scan.header._asdict()}
+        targets = [(npy, lambda f: np.save(f, scan.intensity), "wb"),
+                   (npy[:-4] + ".json", lambda f: json.dump(meta, f), "w")]
+        try:
+            os.makedirs(root, exist_ok=True)
+            for target, write, mode in targets:
+                tmp = "%s.%d.%d.tmp" % (target, os.getpid(), threading.get_ident())
+                try:
+                    with open(tmp, mode) as f:
+                        write(f)
+                    os.replace(tmp, target)
+                finally:
+                    # 写入失败(磁盘已满等)时不留下临时文件
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+        except OSError:
+            # 数据目录只读时仅使用进程内缓存
+            pass
+
+    @classmethod
+    def prune(cls, path=None, cache=None):
+        """
+        :description: 删除过期的磁盘缓存: 数据文件已删除或已被改写(缓存键不再相同)的条目,
+                      以及超过stale_after秒的临时文件和没有.json的残留.npy
+        :param path: 数据目录, 清理其对应的缓存目录
+        :param cache: 直接给出缓存目录; path与cache都为None时清理SpectrumCache.root
+        :return: 删除的条目数
+        """
+        if cache is None:
+            cache = cls.cache_dir(path) if path is not None else cls.root
+        if not cache or not os.path.isdir(cache):
+            return 0
+        removed = 0
+        now = time.time()
+        names = set(os.listdir(cache))
+        for name in names:
+            target = os.path.join(cache, name)
+            try:
+                if name.endswith(".json"):
+                    with open(target, "r", encoding="utf-8") as f:
+                        source = json.load(f).get("source")
+                    stale = source is None or not os.path.exists(source) or cls.key(source) != name[:-5]
+                elif name.endswith(".tmp") or (name.endswith(".npy") and name[:-4] + ".json" not in names):
+                    stale = now - os.path.getmtime(target) > cls.stale_after
+                else:
+                    continue
+            except (OSError, ValueError, AttributeError):
+                # 旧格式或损坏的.json
+                stale = name.endswith(".json")
+            if not stale:
+                continue
+            for victim in (target, target[:-5] + ".npy") if name.endswith(".json") else (target,):
+                try:
+                    os.remove(victim)
+                except OSError:
+                    pass
+            removed += 1
+        return removed
+
+    @classmethod
+    def clear(cls, path=None):
+        """
+        :description: 清空进程内缓存; 给出path时同时删除该数据目录下的磁盘缓存
+        :param path: 数据目录
+        """
+        with cls._lock:
+            cls._memory.clear()
+            cls._pruned.clear()
+        if path is not None:
+            root = cls.cache_dir(path)
+            if os.path.isdir(root):
+                for name in os.listdir(root):
+                    if name.endswith(".npy") or name.endswith(".json"):
+                        os.remove(os.path.join(root, name))
+
+
+class Blank(object):
+    """
+    :description: 空白对照(水)的荧光光谱, 首次使用时才读取, 每个进程每个文件只读取一次
+    """
+    # 默认空白对照文件, 可用环境变量SR_BLANK替换; 相对路径按本文件所在目录解析, 与工作目录无关
+    default_path = os.environ.get("SR_BLANK") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "water.csv")
+    _loaded = {}
+    # 多个线程同时取得空白对照时需要加锁; 读取文件在锁外进行
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, blank=None):
+        """
+        :description: 取得空白对照光谱
+        :param blank: None(使用默认空白对照)/空白对照数据文件(.csv)路径/已读取的Scan
+        :return: Scan
+        """
+        if isinstance(blank, Scan):
+            return blank
+        key = os.path.abspath(blank if blank is not None else cls.default_path)
+        with cls._lock:
+            scan = cls._loaded.get(key)
+        if scan is None:
+            scan = SpectrumCache.load(key)
+            with cls._lock:
+                # 多个线程同时读取时只保留先写入的一份
+                scan = cls._loaded.setdefault(key, scan)
+        return scan
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._loaded.clear()
+
+
+class QuantityCache(object):
+    """
+    :description: 同一次运行中吸附量q(t)的结果缓存, 一阶/二阶/粒子内扩散模型共用同一次计算结果;
+                  整个进程共用一份, 键中包含计算q(t)的全部输入(数据文件的路径/大小/修改时间、空白、参数),
+                  不同调用方之间只会共享完全相同的结果
+    """
+    enabled = True
+    # 最多保留limit条q(t), 超出时丢弃最久未使用的
+    limit = 1024
+    hits = 0
+    misses = 0
+    _results = OrderedDict()
+    # 计数器的累加与_results的读写不是原子操作, 多个线程同时计算q(t)时需要加锁
+    _lock = threading.Lock()
+
+    @classmethod
+    def key(cls, init_concentration, path, excitation_wave_length, a, b, mass, init_volume, sample, blank,
+            preprocessing=None):
+        # 数据文件以路径、大小和修改时间为准, 文件被改写后不会取到旧结果; 预处理流程不同的结果互不混用
+        water_scan = Blank.get(blank)
+        files = tuple(SpectrumCache.key(temp) for temp in path)
+        water = hashlib.sha1(water_scan.intensity.tobytes()).hexdigest()
+        return (files, water, repr(preprocessing)) + tuple(float(v) for v in (
+            init_concentration, excitation_wave_length, a, b, mass, init_volume, sample))
+
+    @classmethod
+    def get(cls, key, compute, label=""):
+        """
+        :description: 取出缓存的q(t), 未命中时调用compute计算并缓存
+        :param key: QuantityCache.key的返回值
+        :param compute: 无参数函数, 返回q(t)数组
+        :param label: 日志中显示的名称
+        :return: q(t)数组(只读)
+        """
+        if not cls.enabled:
+            return compute()
+        with cls._lock:
+            quantity = cls._results.get(key)
+            if quantity is not None:
+                cls._results.move_to_end(key)
+                cls.hits += 1
+            else:
+                cls.misses += 1
+            hits, misses = cls.hits, cls.misses
+        if quantity is not None:
+            logger.info("q(t) cache hit %s (hits=%d, misses=%d)", label, hits, misses)
+            return quantity
+        logger.info("q(t) cache miss %s (hits=%d, misses=%d)", label, hits, misses)
+        # 计算在锁外进行, 不同的q(t)可以并行计算
+        quantity = np.asarray(compute(), dtype=np.double)
+        quantity.setflags(write=False)
+        with cls._lock:
+            quantity = cls._results.setdefault(key, quantity)
+            cls._results.move_to_end(key)
+            while len(cls._results) > cls.limit:
+                cls._results.popitem(last=False)
+            return quantity
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._results.clear()
+            cls.hits = 0
+            cls.misses = 0
+
+
+class Calibration(NamedTuple):
+    """
+    :description: 荧光强度-浓度标准曲线y = a·c + b的拟合结果
+    """
+    a: float
+    b: float
+    r2: float
+    a_se: float
+    b_se: float
+    n: int
+
+    def concentration(self, intensity):
+        # 荧光强度 --> 浓度
+        return (np.asarray(intensity, dtype=np.double) - self.b) / self.a
+
+
+class SpectralMatrix(NamedTuple):
+    """
+    :description: 扣除空白后的光谱矩阵, intensity的行对应wavelength, 列对应sources中的数据文件
+    """
+    wavelength: np.ndarray
+    intensity: np.ndarray
+    sources: tuple
 
 
 class Plastic(object):
-    # Unify the class attribute wavelength format to DataFrame
-    fic_table = pd.DataFrame(wave_arr)
+    # 各方法的preprocessing参数为可选的光谱预处理(preprocess.Preprocessing),
+    # 在扣除空白之后、取激发波长处的荧光强度之前对整个光谱矩阵批量执行; 标准曲线与吸附实验须使用同一个流程
+    @staticmethod
+    def _load_checked(path, water_scan):
+        # 读取数据文件并检查其波长轴与空白对照一致
+        scan = SpectrumCache.load(path)
+        if not scan.header.same_axis(water_scan.header):
+            raise ValueError("%s的波长范围与空白对照不一致" % path)
+        return scan
+
+    @classmethod
+    def _table(cls, path, blank=None, preprocessing=None):
+        # 预先分配(波长 × (1 + 文件数))的矩阵, 第0列为波长, 其余列为扣除空白后的荧光强度
+        water_scan = Blank.get(blank)
+        table = np.empty((water_scan.header.points, len(path) + 1), dtype=np.double)
+        table[:, 0] = water_scan.wavelength
+        with Timing.span("ingest", "io", files=len(path)):
+            for i, temp in enumerate(path):
+                table[:, i + 1] = cls._load_checked(temp, water_scan).intensity
+        # 一次广播完成所有列的空白扣除
+        with Timing.span("blank_subtraction", "compute", files=len(path)):
+            table[:, 1:] -= water_scan.intensity[:, np.newaxis]
+        if preprocessing is not None and len(path):
+            with Timing.span("preprocess", "compute", files=len(path)):
+                table[:, 1:] = preprocessing.apply(table[:, 0], table[:, 1:])
+        return table
 
     @classmethod
-    def plastic_data(cls, kind=None, save=None, path=None):
+    def spectral_matrix(cls, path, blank=None, preprocessing=None):
+        """
+        :description: 将N个数据文件读入一个(波长 × N)的矩阵并扣除空白, 不生成中间DataFrame
+        :param path: 将从荧光仪取得的数据文件(.csv)路径进行按顺序存储进列表path传入
+        :param blank: 空白对照(水)的数据文件路径或Scan
+        :param preprocessing: 扣除空白后的光谱预处理(preprocess.Preprocessing), 为None时不处理
+        :return: SpectralMatrix
+        """
+        table = cls._table(path, blank, preprocessing)
+        return SpectralMatrix(table[:, 0], table[:, 1:], tuple(path))
+
+    @classmethod
+    def plastic_data(cls, kind=None, save=None, path=None, blank=None, preprocessing=None):
         """
         :description: 荧光强度-波长正态分布数据
         :param kind: MPs/NPs的改性类型
-        :param save: excel数据保存路径
+        :param save: 运行名, 数据表汇总保存到ResultSink.root下的该目录中
         :param path: 将从荧光仪取得的数据文件(.csv)路径进行按顺序存储进列表path传入
+        :param blank: 空白对照(水)的数据文件路径或Scan, 为None时使用Blank.default_path
+        :param preprocessing: 扣除空白后的光谱预处理(preprocess.Preprocessing), 为None时不处理
         :return:
         """
-        # 防止对类属性进行叠加，对其进行深拷进行使用
-        new_fic_table = dcp(cls.fic_table)
-
-        # fic用来存储后续差分矩阵得到的新的每一列即每个浓度的新数据
-        fic = []
-
         if path is None:
             plastic = []
         else:
             plastic = path
 
-        # 先将水的荧光强度与每种浓度的荧光强度合并为一个表
-        # 对表进行类型转换为矩阵，且数据类型是double
-        # 利用差分矩阵直接后者减前者得到新的矩阵数据后再转回DataFrame
-        # 将新的DataFrame的数据存入列表fic
-        for temp in plastic:
-            data = pd.concat([water, pd.read_csv(temp).iloc[20::, 1]],
-                             axis=1, join="outer", ignore_index=True)
-            arr = np.array(data, dtype=np.double)
-            new_arr = np.diff(arr)
-            table = pd.DataFrame(new_arr)
-            fic.append(table)
-
-        # 波长列与每种浓度的数据列整合为一个大table
-        for i in range(len(fic)):
-            new_fic_table = pd.concat([new_fic_table, fic[i]],
-                                      axis=1,  join="outer", ignore_index=True)
-        if kind:
-            if save:
-                save_path = "".join(["D:\\ZGJ\\SR_DATA\\", save, "\\%s\\%s.xlsx" % (kind, kind)])
-            # 将new_fic_table以excel的形式保存到下列路径中
-                new_fic_table.to_excel(save_path)
+        # 第0列为波长, 其余每列为一种浓度扣除空白后的荧光强度
+        # DataFrame直接包装矩阵而不复制, 供绘图函数使用
+        new_fic_table = pd.DataFrame(cls._table(plastic, blank, preprocessing), copy=False)
+        if kind and save:
+            # 将new_fic_table登记到本次运行的结果文件中(ResultSink.root/save/)
+            ResultSink.put(save, "%s/%s" % (kind, kind), new_fic_table)
         # 返回这个table
         return new_fic_table
 
+    @classmethod
+    def intensity_at(cls, path, excitation_wave_length, blank=None, interpolate=False, preprocessing=None):
+        """
+        :description: 只取出每个数据文件在激发波长处扣除空白后的荧光强度, 不构建整张光谱表
+        :param path: 将从荧光仪取得的数据文件(.csv)路径进行按顺序存储进列表path传入
+        :param excitation_wave_length: 微纳塑料的激发波长
+        :param blank: 空白对照(水)的数据文件路径或Scan
+        :param interpolate: 激发波长不在扫描网格上时是否线性插值
+        :param preprocessing: 扣除空白后的光谱预处理(preprocess.Preprocessing), 为None时不处理
+        :return: 荧光强度数组, 长度与path相同
+        """
+        water_scan = Blank.get(blank)
+        if preprocessing is not None:
+            # 预处理需要完整的光谱, 先构建整个光谱矩阵再取激发波长处的值
+            table = cls._table(path, water_scan, preprocessing)
+            return np.asarray(pick(water_scan.header, table[:, 1:], excitation_wave_length, interpolate),
+                              dtype=np.double)
+        water_value = pick(water_scan.header, water_scan.intensity, excitation_wave_length, interpolate)
+        y = np.empty(len(path), dtype=np.double)
+        with Timing.span("ingest", "io", files=len(path)):
+            for i, temp in enumerate(path):
+                if SpectrumCache.enabled:
+                    # 缓存命中时直接按元数据头计算的行号取值
+                    scan = cls._load_checked(temp, water_scan)
+                    y[i] = pick(scan.header, scan.intensity, excitation_wave_length, interpolate)
+                else:
+                    # 不使用缓存时只解析所需的数据行
+                    y[i] = read_at(temp, excitation_wave_length, interpolate)
+        with Timing.span("blank_subtraction", "compute", files=len(path)):
+            return y - water_value
+
+    @classmethod
+    def calibrate(cls, concentration, path, excitation_wave_length, blank=None, preprocessing=None):
+        """
+        :description: 由浓度梯度的数据文件拟合标准曲线, 不修改任何共享状态, 可在多个线程中同时调用
+        :param concentration: 浓度梯度, 与path对应
+        :param path: 将从荧光仪取得的数据文件(.csv)路径进行按顺序存储进列表path传入
+        :param excitation_wave_length: 微纳塑料的激发波长
+        :param blank: 空白对照(水)的数据文件路径或Scan
+        :param preprocessing: 扣除空白后的光谱预处理(preprocess.Preprocessing), 为None时不处理
+        :return: Calibration
+        """
+        y = cls.intensity_at(path, excitation_wave_length, blank, preprocessing=preprocessing)
+        with Timing.span("calibration_fit", "fit", points=len(y)):
+            fit = linear_fit(np.asarray(concentration, dtype=np.double), y)
+        return Calibration(float(fit.slope), float(fit.intercept), float(fit.r2), float(fit.slope_se),
+                           float(fit.intercept_se), int(fit.n))
+
+    @classmethod
+    def band(cls, path, low, high, blank=None, preprocessing=None):
+        """
+        :description: 取出每个数据文件在波长区间[low, high]内扣除空白后的荧光强度
+        :param path: 将从荧光仪取得的数据文件(.csv)路径进行按顺序存储进列表path传入
+        :param low: 区间下限波长
+        :param high: 区间上限波长
+        :param blank: 空白对照(水)的数据文件路径或Scan
+        :param preprocessing: 扣除空白后的光谱预处理(preprocess.Preprocessing), 为None时不处理
+        :return: (区间内的波长数组, 荧光强度矩阵(波长 × 文件))
+        """
+        water_scan = Blank.get(blank)
+        rows = water_scan.header.band(low, high)
+        if preprocessing is not None:
+            return np.array(water_scan.wavelength[rows]), cls._table(path, water_scan, preprocessing)[rows, 1:]
+        table = np.empty((len(water_scan.wavelength[rows]), len(path)), dtype=np.double)
+        with Timing.span("ingest", "io", files=len(path)):
+            for i, temp in enumerate(path):
+                table[:, i] = cls._load_checked(temp, water_scan).intensity[rows]
+        with Timing.span("blank_subtraction", "compute", files=len(path)):
+            table -= water_scan.intensity[rows, np.newaxis]
+        return np.array(water_scan.wavelength[rows]), table
+
 """
 *****************************************************************************************************************************************************
 以下为某一浓度的微纳塑料溶液开始吸附实验，故path的取值与上述不同，是时间梯度下的荧光强度数据
 """
 class Adsorption(object):
     @classmethod
-    def concentration(cls, concentration, path, excitation_wave_length, a, b):
+    def concentration(cls, concentration, path, excitation_wave_length, a, b, blank=None, preprocessing=None):
         """
         :description: 某一浓度的微纳塑料溶液在时间梯度下的吸附实验的浓度变化数据运算
         :param path: 将从荧光仪取得的数据文件(.csv)路径进行按顺序存储进列表path传入
         :param excitation_wave_length: 微纳塑料的激发波长
         :param a: 由operation_model中绘制出的荧光强度-浓度拟合直线得到的斜率a
         :param b: 由operation_model中绘制出的荧光强度-浓度拟合直线得到的截距b
+        :param blank: 空白对照(水)的数据文件路径或Scan
+        :param preprocessing: 扣除空白后的光谱预处理(preprocess.Preprocessing), 为None时不处理
         :return:
         """
 
-        # 仿照Plastic对path传进来的数据作差分矩阵运算
-        # 此时整个data表的行索引依旧是波长，而列索引变成了时间梯度
-        data = Plastic.plastic_data(kind=None, save=None, path=path)
-        wave_length = list(data.iloc[::, 0])
-        y = []
-
-        # 以激发波长为准，选取激发波长处的荧光强度
-        # 将时间梯度中的每种荧光强度存储进y
-        for val in wave_length:
-            if val == excitation_wave_length:
-                val_index = wave_length.index(val)
-                for i in range(len(path)):
-                    y.append(data.iloc[val_index, i + 1])
-                break
+        # 以激发波长为准，只取出时间梯度中每个文件在激发波长处扣除空白后的荧光强度
+        y = Plastic.intensity_at(path, excitation_wave_length, blank, preprocessing=preprocessing)
         cnc = [concentration]
         # 利用拟合直线y=ax+b算出时间梯度中微纳塑料的每种浓度，并存入cnc列表
-        for round in y:
-            cnc.append((round - b) / a)
+        cnc.extend((y - b) / a)
         return cnc
 
 
     @classmethod
-    def adsorption_quantity(cls, init_concentration, path, excitation_wave_length, a, b, mass, init_volume, sample, kind=None, concentration=None, save=None):
+    def adsorption_quantity(cls, init_concentration, path, excitation_wave_length, a, b, mass, init_volume, sample, kind=None, concentration=None, save=None, blank=None, preprocessing=None):
         """
         :description: 从0时刻开始计算时间梯度下吸附量的变化数据
         :param path: 将从荧光仪取得的数据文件(.csv)路径进行按顺序存储进列表path传入
@@ -105,104 +499,328 @@ class Adsorption(object):
         :param mass: 吸附剂气凝胶的质量
         :param init_volume: 微纳塑料溶液的初始体积
         :param sample: 时间梯度取出的小量微纳塑料样品用于测定每时刻的荧光强度
+        :param blank: 空白对照(水)的数据文件路径或Scan
+        :param preprocessing: 扣除空白后的光谱预处理(preprocess.Preprocessing), 为None时不处理
         :return:
         """
 
-        # 得到锥形瓶中每时刻的微纳塑料溶液浓度
-        cnc = cls.concentration(init_concentration, path, excitation_wave_length, a, b)
+        def compute():
+            # 取出时间梯度中每个文件在激发波长处的荧光强度, 作为只有一行的矩阵交给quantity_matrix计算
+            y = Plastic.intensity_at(path, excitation_wave_length, blank, preprocessing=preprocessing)
+            with Timing.span("quantity", "compute", files=len(path)):
+                return cls.quantity_matrix(y[np.newaxis, :], [init_concentration], a, b,
+                                           mass, init_volume, sample)[0]
 
-        # 0时刻锥形瓶中微纳塑料的总质量
-        amount = init_volume * cnc[0]
-        n = 0
-        sum_cnc = []
-        for sum_c in cnc:
-            if sum_c == cnc[0]:
-                continue
-            n += sum_c
-            sum_cnc.append(n)
+        # 相同参数的q(t)在一次运行中只计算一次
+        key = QuantityCache.key(init_concentration, path, excitation_wave_length, a, b, mass, init_volume, sample, blank,
+                                preprocessing)
+        quantity = QuantityCache.get(key, compute, "c0=%s, %d files" % (init_concentration, len(path))).tolist()
 
-        quantity = []
-        for ind, c in enumerate(cnc):
-            if c == cnc[0]:
-                quantity.append((amount - init_volume * c) / mass)
-                continue
-            if ind < 2:
-                quantity.append((amount - init_volume * c) / mass)
-            else:
-                quantity.append((amount - init_volume * c - sample * sum_cnc[ind - 2]) / mass)
-            init_volume -= sample
-
-        if kind:
-            if save:
-                save_path = "".join(["D:\\ZGJ\\SR_DATA\\", save, "\\%s\\%s_quantity.xlsx" % (kind, concentration)])
-            # 将adsorption_quantity以excel的形式保存到下列路径中
-                quantity_table = pd.DataFrame(quantity)
-                quantity_table.to_excel(save_path)
+        if kind and save:
+            # 将adsorption_quantity登记到本次运行的结果文件中
+            ResultSink.put(save, "%s/%s_quantity" % (kind, concentration), quantity)
         return quantity
 
+    @staticmethod
+    def quantity_matrix(intensity, init_concentration, a, b, mass, init_volume, sample):
+        """
+        :description: 一次性计算整个(浓度 × 时间点)网格的吸附量q(t)
+        :param intensity: 扣除空白后激发波长处的荧光强度矩阵, 行为初始浓度, 列为按时间顺序的时间点
+        :param init_concentration: 每行对应的初始浓度
+        :param a: 荧光强度-浓度拟合直线的斜率a(标量或每行一个)
+        :param b: 荧光强度-浓度拟合直线的截距b(标量或每行一个)
+        :param mass: 吸附剂气凝胶的质量(标量或每行一个)
+        :param init_volume: 微纳塑料溶液的初始体积(标量或每行一个)
+        :param sample: 每个时间点取出的样品体积(标量或每行一个)
+        :return: 吸附量矩阵(浓度 × (1 + 时间点)), 第0列为0时刻
+        """
+        def column(value):
+            # 标量保持不变, 每行一个的参数转为列向量以便广播
+            value = np.asarray(value, dtype=np.double)
+            return value if value.ndim == 0 else value.reshape(-1, 1)
+
+        y = np.atleast_2d(np.asarray(intensity, dtype=np.double))
+        c0 = column(init_concentration)
+        a, b, mass, init_volume, sample = map(column, (a, b, mass, init_volume, sample))
+
+        # 利用拟合直线y=ax+b算出每个时间点锥形瓶中的浓度
+        ct = (y - b) / a
+        # 第j个时间点(从0开始)测定时, 锥形瓶中已被取出j次样品
+        taken = np.arange(ct.shape[1], dtype=np.double)
+        volume = init_volume - taken * sample
+        # 之前各次取样带走的微纳塑料质量: sample * (c_1 + ... + c_j)
+        withdrawn = sample * (np.cumsum(ct, axis=1) - ct)
+
+        quantity = np.empty((ct.shape[0], ct.shape[1] + 1), dtype=np.double)
+        quantity[:, 0] = 0.0
+        quantity[:, 1:] = (init_volume * c0 - volume * ct - withdrawn) / mass
+        return quantity
+
+    @classmethod
+    def quantity_grid(cls, init_concentration, path, excitation_wave_length, a, b, mass, init_volume, sample, blank=None,
+                      preprocessing=None):
+        """
+        :description: 多个初始浓度、相同时间梯度下的吸附量q(t), 一次读取全部数据后批量计算
+        :param init_concentration: 初始浓度列表
+        :param path: 与init_concentration对应的数据文件路径列表的列表, 每个子列表按时间顺序排列且长度相同
+        :return: 吸附量矩阵(浓度 × (1 + 时间点)), 第0列为0时刻
+        """
+        if len({len(p) for p in path}) > 1:
+            raise ValueError("每个初始浓度的时间点数量必须相同")
+        flat = [temp for p in path for temp in p]
+        y = Plastic.intensity_at(flat, excitation_wave_length, blank, preprocessing=preprocessing).reshape(len(path), -1)
+        with Timing.span("quantity", "compute", files=len(flat)):
+            return cls.quantity_matrix(y, init_concentration, a, b, mass, init_volume, sample)
+
 """
 *****************************************************************************************************************************************************
 以下为吸附动力学，是在某一浓度下吸附量与时间梯度的关系，故path依旧是时间梯度下的数据
 """
 class KineticsData(object):
     @classmethod
-    def kinetics_pfo_y(cls, init_concentration, path, excitation_wave_length, a, b, mass, init_volume, sample, qe, kind=None, concentration=None, save=None):
+    def kinetics_pfo_y(cls, init_concentration, path, excitation_wave_length, a, b, mass, init_volume, sample, qe, kind=None, concentration=None, save=None, blank=None, preprocessing=None, t=None):
         # 利用时间梯度下的吸附量计算动力学一阶方程拟合直线需要的y值
-        qt = Adsorption.adsorption_quantity(init_concentration, path, excitation_wave_length, a, b, mass, init_volume, sample, kind, concentration, save)
-        y = []
-        e = math.e
-        for i in range(len(qt)):
-            if i == 0:
-                continue
-            y.append(log(qe - qt[i], e))
-        if kind:
-            if save:
-                save_path = "".join(["D:\\ZGJ\\SR_DATA\\", save, "\\%s\\%s_pfo_y.xlsx" % (kind, concentration)])
-            # 将kinetics_pfo_y以excel的形式保存到下列路径中
-                y_table = pd.DataFrame(y)
-                y_table.to_excel(save_path)
+        # qe为None时取非线性PFO拟合得到的饱和吸附量, 此时需要时间梯度t(含0时刻); t未给出时由"初始浓度-时间.csv"形式的文件名得到
+        qt = Adsorption.adsorption_quantity(init_concentration, path, excitation_wave_length, a, b, mass, init_volume, sample, kind, concentration, save, blank, preprocessing)
+        if qe is None and t is None:
+            t = cls.times(path)
+        y = cls.linearize(t, qt, qe, label="c0=%s" % init_concentration)["pfo"][0].tolist()
+        if kind and save:
+            # 将kinetics_pfo_y登记到本次运行的结果文件中
+            ResultSink.put(save, "%s/%s_pfo_y" % (kind, concentration), y)
         return y
 
     @classmethod
-    def kinetics_pso_y(cls, init_concentration, path, excitation_wave_length, a, b, mass, init_volume, sample, t, kind=None, concentration=None, save=None):
+    def kinetics_pso_y(cls, init_concentration, path, excitation_wave_length, a, b, mass, init_volume, sample, t, kind=None, concentration=None, save=None, blank=None, preprocessing=None):
         # 利用时间梯度下的吸附量计算动力学二阶方程拟合直线需要的y值
-        qt = Adsorption.adsorption_quantity(init_concentration, path, excitation_wave_length, a, b, mass, init_volume, sample, kind, concentration, save)
-        y = []
-        e = math.e
-        for i in range(len(qt)):
-            if i == 0:
-                continue
-            y.append(t[i] / qt[i])
-        if kind:
-            if save:
-                save_path = "".join(["D:\\ZGJ\\SR_DATA\\", save, "\\%s\\%s_pso_y.xlsx" % (kind, concentration)])
-            # 将kinetics_pso_y以excel的形式保存到下列路径中
-                y_table = pd.DataFrame(y)
-                y_table.to_excel(save_path)
+        qt = Adsorption.adsorption_quantity(init_concentration, path, excitation_wave_length, a, b, mass, init_volume, sample, kind, concentration, save, blank, preprocessing)
+        y = (np.asarray(t[1:], dtype=np.double) / np.asarray(qt[1:], dtype=np.double)).tolist()
+        if kind and save:
+            # 将kinetics_pso_y登记到本次运行的结果文件中
+            ResultSink.put(save, "%s/%s_pso_y" % (kind, concentration), y)
         return y
 
+    @classmethod
+    def linearize(cls, t, qt, qe=None, label=""):
+        """
+        :description: 一次得到一阶/二阶/粒子内扩散模型线性拟合所需的全部y值, 所有序列一起批量计算;
+                      qe未给出时由非线性PFO模型对所有序列的一次批量拟合得到
+        :param t: 时间梯度(含0时刻), 所有序列共用; 给出qe时可为None, 此时结果中的"pso"为None
+        :param qt: 吸附量(含0时刻), 一条序列或(序列 × 时间点)矩阵
+        :param qe: 一阶方程的饱和吸附量, 标量或每条序列一个, 为None时取非线性PFO拟合的结果
+        :param label: 日志中显示的名称
+        :return: {"qe": 每条序列的qe, "pfo": ln(qe - qt), "pso": t/qt, "ipd": qt}, 均为(序列 × 时间点)矩阵, 不含0时刻;
+                 qt不小于qe的点ln(qe - qt)无意义, 记为NaN, 线性拟合时跳过
+        """
+        qt = np.atleast_2d(np.asarray(qt, dtype=np.double))
+        if t is None and qe is None:
+            raise ValueError("qe为None时必须给出时间梯度t")
+        if qe is None:
+            with Timing.span("kinetics_fit", "fit", model="pfo", series=len(qt)):
+                fit = nonlinear_fit(KINETIC_MODELS["pfo"], t, qt)
+            # 未收敛的拟合结果不可信, 该序列的qe记为NaN
+            qe = np.where(fit.converged, fit.params[:, 0], np.nan)
+            if not fit.converged.all():
+                logger.warning("PFO fit %s did not converge for %d of %d series; their qe is NaN",
+                               label, int((~fit.converged).sum()), len(qt))
+        qe = np.broadcast_to(np.asarray(qe, dtype=np.double), (len(qt),))
+        q = qt[:, 1:]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            gap = qe[:, np.newaxis] - q
+            pfo = np.where(gap > 0, np.log(np.where(gap > 0, gap, 1.0)), np.nan)
+            pso = None if t is None else np.asarray(t, dtype=np.double)[1:] / q
+        dropped = int(np.sum(np.isfinite(q) & ~(gap > 0)))
+        if dropped:
+            logger.warning("PFO linearization %s: %d of %d points have qt >= qe and are skipped",
+                           label, dropped, q.size)
+        return {"qe": np.array(qe), "pfo": pfo, "pso": pso, "ipd": q.copy()}
+
+    @staticmethod
+    def times(path):
+        # 由"初始浓度-时间.csv"形式的文件名得到时间梯度, 并在前面补上0时刻
+        t = [float(os.path.splitext(os.path.basename(p))[0].rsplit("-", 1)[1]) for p in path]
+        return [0.0] + t
+
+    @classmethod
+    def fit_kinetics(cls, t, qt, models=None, labels=None, ci=True):
+        """
+        :description: 以非线性动力学模型(PFO、PSO、Elovich、粒子内扩散)拟合吸附量q(t),
+                      每个模型对所有序列只做一次批量拟合, 结果汇总为一张表
+        :param t: 时间梯度(含0时刻), 所有序列共用
+        :param qt: 吸附量, 每个元素为一条序列(如adsorption_quantity的返回值), 与t对应
+        :param models: 模型名列表, 为None时使用fitting.KINETIC_MODELS中的全部模型
+        :param labels: 每条序列的标签(如初始浓度), 为None时为序号
+        :param ci: 默认对每条序列、每个模型做bootstrap(整数为重抽样次数), 增加各参数置信区间的<参数>_low/<参数>_high列;
+                   为False时不计算
+        :return: DataFrame, 每行为(序列, 模型), 列为各模型参数、标准误差、R²、残差平方和与是否收敛
+        """
+        qt = np.atleast_2d(np.asarray(qt, dtype=np.double))
+        labels = list(range(len(qt))) if labels is None else list(labels)
+        rows = []
+        columns = ["series", "model"]
+        for name in (models or KINETIC_MODELS):
+            model = KINETIC_MODELS[name]
+            with Timing.span("kinetics_fit", "fit", model=name, series=len(qt)):
+                fit = nonlinear_fit(model, t, qt)
+            for param in model.params:
+                if param not in columns:
+                    columns += [param, param + "_se"]
+            for i, label in enumerate(labels):
+                row = {"series": label, "model": name}
+                for j, param in enumerate(model.params):
+                    row[param] = fit.params[i, j]
+                    row[param + "_se"] = fit.se[i, j]
+                row.update({"r2": fit.r2[i], "ssr": fit.ssr[i], "converged": bool(fit.converged[i]),
+                            "iterations": int(fit.iterations[i])})
+                if ci is not False and ci is not None:
+                    row.update(_interval_columns(model, t, qt[i], ci))
+                rows.append(row)
+        columns += ["r2", "ssr", "converged", "iterations"]
+        if ci is not False and ci is not None:
+            columns += list(dict.fromkeys(c for row in rows for c in row if c.endswith(("_low", "_high"))))
+        table = pd.DataFrame(rows, columns=columns)
+        _warn_not_converged(table, "series", "kinetics")
+        return table
+
 """
 *****************************************************************************************************************************************************
 以下为吸附等温线，是在浓度梯度下饱和吸附量的变化关系，故path应取每种浓度下
 上述时间梯度中得到的饱和吸附量
 """
+def _warn_not_converged(table, label, kind):
+    # 未收敛的(序列/数据集, 模型)记录到日志, 拟合表的converged列为False
+    failed = table.loc[~table["converged"].astype(bool), [label, "model"]]
+    if len(failed):
+        logger.warning("%s fits did not converge: %s", kind,
+                       ", ".join("%s/%s" % (a, b) for a, b in failed.itertuples(index=False)))
+
+
+def _interval_columns(model, x, y, ci):
+    # 一条序列的bootstrap置信区间 --> {<参数>_low: 下限, <参数>_high: 上限}; ci为True时使用默认重抽样次数
+    with Timing.span("bootstrap", "fit", model=model.name) as span:
+        result = bootstrap(model, x, y, replicates=None if ci is True else ci)
+        span.add(replicates=result.replicates)
+    row = {}
+    for param, low, high in zip(result.params, result.low, result.high):
+        row[param + "_low"] = low
+        row[param + "_high"] = high
+    return row
+
+
+def _series_qe(job):
+    # 一个初始浓度的时间梯度数据 --> 饱和吸附量, 定义在模块层以便在进程池中调用
+    init_concentration, path, excitation_wave_length, a, b, mass, init_volume, sample, blank, preprocessing = job
+    temp = Adsorption.adsorption_quantity(init_concentration, path, excitation_wave_length, a, b, mass, init_volume,
+                                          sample, kind=None, concentration=None, save=None, blank=blank,
+                                          preprocessing=preprocessing)
+    temp.sort()
+    return temp[len(temp) - 1] + 1
+
+
+def _isotherm_job(job):
+    # 一个等温线模型对一组数据集的批量拟合, 定义在模块层以便在进程池中调用
+    name, temperature, x, y, labels, ci = job
+    model = isotherm_model(name, temperature)
+    with Timing.span("isotherm_fit", "fit", model=name, datasets=len(labels)):
+        fit = nonlinear_fit(model, x, y)
+    aic, aicc, bic = fit.aic, fit.aicc, fit.bic
+    rows = []
+    for i, label in enumerate(labels):
+        row = {"dataset": label, "model": name}
+        for j, param in enumerate(model.params):
+            row[param] = fit.params[i, j]
+            row[param + "_se"] = fit.se[i, j]
+        row.update({"r2": fit.r2[i], "ssr": fit.ssr[i], "aic": aic[i], "aicc": aicc[i], "bic": bic[i],
+                    "converged": bool(fit.converged[i]), "iterations": int(fit.iterations[i])})
+        if ci is not False and ci is not None:
+            row.update(_interval_columns(model, x[i], y[i], ci))
+        rows.append(row)
+    return rows
+
+
 class IsothermData(object):
-    qe = []
-
-    @classmethod
-    def isotherm_l_y(cls, path, excitation_wave_length, a, b, mass, init_volume, sample, kind=None, save=None):
-        for i in range(len(path)):
-            temp = Adsorption.adsorption_quantity(path[i], excitation_wave_length, a, b, mass, init_volume, sample,
-                                           kind=None, concentration=None, save=None)
-            temp.sort()
-            cls.qe.append(temp[len(temp) - 1] + 1)
-        if kind:
-            if save:
-                save_path = "".join(["D:\\ZGJ\\SR_DATA\\", save, "\\%s\\%s_isotherm_y.xlsx" % (kind, kind)])
-            # 将isotherm_l_y以excel的形式保存到下列路径中
-                y_table = pd.DataFrame(cls.qe)
-                y_table.to_excel(save_path)
-        return cls.qe
+    @classmethod
+    def isotherm_l_y(cls, init_concentration, path, excitation_wave_length, a, b, mass, init_volume, sample, kind=None, save=None, blank=None,
+                     workers=None, executor="process", preprocessing=None):
+        """
+        :description: 浓度梯度下的饱和吸附量, 每个初始浓度的时间梯度数据相互独立, 可并行处理
+        :param init_concentration: 初始浓度列表
+        :param path: 与init_concentration对应的数据文件路径列表的列表, 每个子列表按时间顺序排列
+        :param blank: 空白对照(水)的数据文件路径或Scan
+        :param workers: 并行的进程/线程数, 为None或1时按顺序逐个处理
+        :param executor: "process"使用进程池, "thread"使用线程池
+        :param preprocessing: 扣除空白后的光谱预处理(preprocess.Preprocessing), 随任务一起传给子进程
+        :return:
+        """
+        # 空白对照只取一次, 所有浓度共用
+        blank = Blank.get(blank)
+        jobs = [(init_concentration[i], path[i], excitation_wave_length, a, b, mass, init_volume, sample, blank,
+                 preprocessing) for i in range(len(path))]
+        qe = map_jobs(_series_qe, jobs, workers, executor, chunksize=max(1, len(jobs) // ((workers or 1) * 4)))
+        if kind and save:
+            # 将isotherm_l_y登记到本次运行的结果文件中
+            ResultSink.put(save, "%s/%s_isotherm_y" % (kind, kind), qe)
+        return qe
+
+    @classmethod
+    def select_models(cls, ce, qe, models=None, labels=None, temperature=298.15, workers=None, executor="process",
+                      chunk_size=None, ci=True, criterion="aicc"):
+        """
+        :description: 以全部等温线模型拟合每组数据, 按信息准则排序选出最优模型;
+                      任务按(模型, 数据集分块)划分, 可在进程/线程池中并行, 每个任务内为一次批量拟合
+        :param ce: 平衡浓度, 每个元素为一组数据(一种吸附剂或一个批次), 长度可以不同
+        :param qe: 饱和吸附量, 与ce对应
+        :param models: 模型名列表, 为None时使用fitting.ISOTHERM_MODELS中的全部模型
+        :param labels: 每组数据的标签, 为None时为序号
+        :param temperature: 吸附温度(K), Dubinin-Radushkevich模型使用
+        :param workers: 并行的进程/线程数, 为None或1时按顺序逐个处理
+        :param executor: "process"使用进程池, "thread"使用线程池
+        :param chunk_size: 每个任务的数据集数, 为None时按workers均分
+        :param ci: 默认对每组数据、每个模型做bootstrap(整数为重抽样次数), 增加各参数置信区间的<参数>_low/<参数>_high列;
+                   为False时不计算
+        :param criterion: 排序使用的信息准则: "aicc"(默认, 小样本修正的AIC; 等温线通常只有十个以内的数据点,
+                          未修正的AIC偏向参数多的模型)、"aic"或"bic"(对参数个数的惩罚随数据点数增大)
+        :return: DataFrame, 每行为(数据集, 模型), 含参数、标准误差、R²、AIC、AICc、BIC,
+                 以及同一数据集内按criterion的排名rank、与最优模型的差delta_<criterion>和权重<criterion>_weight;
+                 未收敛(converged为False)或criterion没有定义(AICc要求数据点数多于参数个数+1)的模型不参与排名
+        """
+        if criterion not in ("aic", "aicc", "bic"):
+            raise ValueError("criterion只能为\"aic\"、\"aicc\"或\"bic\"")
+        # 长度不同的数据集以NaN补齐为矩阵
+        width = max(len(v) for v in ce)
+        x = np.full((len(ce), width), np.nan)
+        y = np.full((len(ce), width), np.nan)
+        for i in range(len(ce)):
+            x[i, :len(ce[i])] = ce[i]
+            y[i, :len(qe[i])] = qe[i]
+        labels = list(range(len(ce))) if labels is None else list(labels)
+        models = list(models or ISOTHERM_MODELS)
+
+        if chunk_size is None:
+            chunk_size = max(1, -(-len(labels) // (workers or 1)))
+        jobs = [(name, temperature, x[i:i + chunk_size], y[i:i + chunk_size], labels[i:i + chunk_size], ci)
+                for name in models for i in range(0, len(labels), chunk_size)]
+        results = map_jobs(_isotherm_job, jobs, workers, executor)
+
+        columns = ["dataset", "model"]
+        for name in models:
+            for param in isotherm_model(name, temperature).params:
+                if param not in columns:
+                    columns += [param, param + "_se"]
+        rows = [row for rows in results for row in rows]
+        columns += ["r2", "ssr", "aic", "aicc", "bic", "converged", "iterations"]
+        if ci is not False and ci is not None:
+            columns += list(dict.fromkeys(c for row in rows for c in row if c.endswith(("_low", "_high"))))
+        table = pd.DataFrame(rows, columns=columns)
+        _warn_not_converged(table, "dataset", "isotherm")
+        # 同一数据集内按criterion排序; 未收敛的模型不参与排名(rank、delta与weight为NaN), 排在最后
+        score = table[criterion].where(table["converged"].astype(bool))
+        delta = "delta_" + criterion
+        table["rank"] = score.groupby(table["dataset"], sort=False).rank(method="min")
+        table[delta] = score - score.groupby(table["dataset"], sort=False).transform("min")
+        weight = np.exp(-0.5 * table[delta])
+        table[criterion + "_weight"] = weight / weight.groupby(table["dataset"], sort=False).transform("sum")
+        return table.sort_values(["dataset", "rank"], kind="stable").reset_index(drop=True)
 
 
 
@@ -0,0 +1,243 @@
+# This Python file uses the following encoding: utf-8
+"""
+一批实验数据的光谱索引: 只扫描一次数据目录, 之后按(材料, 浓度, 时间)直接取出荧光强度, 不再拼接路径、不再访问文件
+
+    dataset = SpectralDataset.scan(".", blank="water.csv")
+    t = dataset.times("amino", 70)
+    q = dataset.quantity("amino", 70, 526, a, b, mass, init_volume, sample)
+"""
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from data_treatment import Blank, SpectrumCache, SpectralMatrix, Adsorption
+from emscan import ScanHeader, pick
+from preprocess import Preprocessing
+from timing import Timing
+
+# 标准曲线数据: <材料>/<浓度>.csv; 吸附实验数据: <材料>_adsorption/<初始浓度>-<时间>.csv
+CALIBRATION_FILE = re.compile(r"^(?P<c>\d+(?:\.\d+)?)\.csv$")
+ADSORPTION_FILE = re.compile(r"^(?P<c0>\d+(?:\.\d+)?)-(?P<t>\d+(?:\.\d+)?)\.csv$")
+ADSORPTION_SUFFIX = "_adsorption"
+
+
+def _find(root, materials=None):
+    # 数据目录下的全部数据文件 --> [(材料, 浓度, 时间(标准曲线为None), 路径)]
+    found = []
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if not entry.is_dir() or entry.name.startswith("."):
+                continue
+            adsorption = entry.name.endswith(ADSORPTION_SUFFIX)
+            material = entry.name[:-len(ADSORPTION_SUFFIX)] if adsorption else entry.name
+            if materials is not None and material not in materials:
+                continue
+            pattern = ADSORPTION_FILE if adsorption else CALIBRATION_FILE
+            for name in os.listdir(entry.path):
+                match = pattern.match(name)
+                if match is None:
+                    continue
+                if adsorption:
+                    found.append((material, float(match.group("c0")), float(match.group("t")),
+                                  os.path.join(entry.path, name)))
+                else:
+                    found.append((material, float(match.group("c")), None, os.path.join(entry.path, name)))
+    return found
+
+
+class SpectralDataset(object):
+    """
+    :description: 全部扣除空白后的荧光强度存放在一个连续的(扫描 × 波长)数组中, 可以是内存中的数组或磁盘上的.npy内存映射;
+                  行按(材料, 标准曲线/吸附实验, 浓度, 时间)排序, 同一材料的标准曲线、同一初始浓度的时间梯度各占连续的行,
+                  切片返回数组视图而不复制
+    """
+    # 预处理时每块的扫描数
+    chunk = 4096
+
+    def __init__(self, header, intensity, keys, sources, blank, preprocessing=None):
+        """
+        :param header: 共同的ScanHeader
+        :param intensity: (扫描 × 波长)数组
+        :param keys: 每行的(材料, 浓度, 时间), 标准曲线的时间为None
+        :param sources: 每行对应的数据文件路径
+        :param blank: 空白对照的荧光强度(已从intensity中扣除)
+        :param preprocessing: 已对intensity执行过的光谱预处理(preprocess.Preprocessing), 为None时未处理
+        """
+        self.header = header
+        self.intensity = intensity
+        self.keys = [tuple(k) for k in keys]
+        self.sources = list(sources)
+        self.blank = np.asarray(blank, dtype=np.double)
+        self.preprocessing = preprocessing
+        self.concentration = np.array([k[1] for k in self.keys], dtype=np.double)
+        # 标准曲线的时间为NaN
+        self.time = np.array([np.nan if k[2] is None else k[2] for k in self.keys], dtype=np.double)
+        self._rows = {}
+        # (材料, 初始浓度) --> 时间梯度的行切片; 材料 --> 标准曲线的行切片
+        self._series = {}
+        self._calibration = {}
+        for i, (material, c, t) in enumerate(self.keys):
+            if (material, c, t) in self._rows:
+                raise ValueError("数据重复: %s与%s" % (self.sources[self._rows[(material, c, t)]], self.sources[i]))
+            self._rows[(material, c, t)] = i
+            groups, group = (self._calibration, material) if t is None else (self._series, (material, c))
+            start = groups[group].start if group in groups else i
+            groups[group] = slice(start, i + 1)
+
+    @staticmethod
+    def _order(key):
+        material, c, t = key
+        return material, t is not None, c, -1.0 if t is None else t
+
+    @classmethod
+    def scan(cls, root, blank=None, materials=None, store=None, preprocessing=None, cache=None):
+        """
+        :description: 扫描数据目录一次, 读入全部数据文件
+        :param root: 数据目录, 其下为<材料>/与<材料>_adsorption/子目录
+        :param blank: 空白对照(水)的数据文件路径或Scan, 为None时使用Blank.default_path
+        :param materials: 只读取这些材料, 为None时读取全部
+        :param store: .npy文件路径; 给出时荧光强度写入该内存映射文件(可超过内存大小), 索引保存为同名.json,
+                      之后可用SpectralDataset.open直接打开; 为None时存放在内存中
+        :param preprocessing: 扣除空白后的光谱预处理(preprocess.Preprocessing), 读入时执行一次,
+                              与Plastic各方法传入同一个流程时得到相同的荧光强度
+        :param cache: 是否使用SpectrumCache的磁盘缓存(.spectrum_cache中每个文件一份.npy);
+                      为None时只在store为None时使用, 给出store时荧光强度只写入store, 不在磁盘上存两份
+        :return: SpectralDataset
+        """
+        if cache is None:
+            cache = store is None
+        water_scan = Blank.get(blank)
+        header = water_scan.header
+        found = sorted(_find(root, materials), key=lambda item: cls._order(item[:3]))
+        shape = (len(found), header.points)
+        if store is None:
+            intensity = np.empty(shape, dtype=np.double)
+        else:
+            intensity = np.lib.format.open_memmap(store, mode="w+", dtype=np.double, shape=shape)
+        with Timing.span("ingest", "io", files=len(found)):
+            for i, (_, _, _, path) in enumerate(found):
+                # 荧光强度只保存在数据集自己的数组中, 不放入SpectrumCache的进程内缓存
+                scan = SpectrumCache.load(path, remember=False, disk=cache)
+                if not scan.header.same_axis(header):
+                    raise ValueError("%s的波长范围与空白对照不一致" % path)
+                intensity[i] = scan.intensity
+        with Timing.span("blank_subtraction", "compute", files=len(found)):
+            intensity -= water_scan.intensity
+        if preprocessing is not None and len(found):
+            with Timing.span("preprocess", "compute", files=len(found)):
+                # 各扫描的预处理相互独立, 分块执行, 内存映射时不需要把整个数组读入内存
+                for start in range(0, len(found), cls.chunk):
+                    rows = slice(start, start + cls.chunk)
+                    intensity[rows] = preprocessing.apply(header.wavelength, intensity[rows].T).T
+        dataset = cls(header, intensity, [item[:3] for item in found], [item[3] for item in found],
+                      water_scan.intensity, preprocessing)
+        if store is not None:
+            intensity.flush()
+            dataset._save_index(os.path.splitext(store)[0] + ".json")
+        return dataset
+
+    def _save_index(self, path):
+        preprocessing = None if self.preprocessing is None else self.preprocessing._asdict()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"header": self.header._asdict(), "keys": self.keys, "sources": self.sources,
+                       "blank": self.blank.tolist(), "preprocessing": preprocessing}, f, ensure_ascii=False)
+
+    @classmethod
+    def open(cls, store):
+        """
+        :description: 以只读内存映射打开SpectralDataset.scan(store=...)保存的数据集
+        :param store: .npy文件路径
+        :return: SpectralDataset
+        """
+        with open(os.path.splitext(store)[0] + ".json", "r", encoding="utf-8") as f:
+            index = json.load(f)
+        intensity = np.load(store, mmap_mode="r")
+        preprocessing = index.get("preprocessing")
+        return cls(ScanHeader(**index["header"]), intensity, index["keys"], index["sources"], index["blank"],
+                   None if preprocessing is None else Preprocessing(**preprocessing))
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def wavelength(self):
+        return self.header.wavelength
+
+    def materials(self):
+        return sorted({k[0] for k in self.keys})
+
+    def init_concentrations(self, material):
+        # 该材料吸附实验的初始浓度, 升序
+        return [c0 for m, c0 in self._series if m == material]
+
+    def _slice(self, material, init_concentration=None):
+        try:
+            if init_concentration is None:
+                return self._calibration[material]
+            return self._series[(material, float(init_concentration))]
+        except KeyError:
+            raise KeyError("没有%s的数据" % (material if init_concentration is None
+                                             else "%s, %smg/L" % (material, init_concentration))) from None
+
+    def row(self, material, concentration, time=None):
+        """
+        :description: 一次扫描扣除空白后的荧光强度(视图)
+        :param time: 吸附实验的时间, 标准曲线为None
+        """
+        return self.intensity[self._rows[(material, float(concentration), None if time is None else float(time))]]
+
+    def series(self, material, init_concentration=None):
+        """
+        :description: 一个初始浓度的全部时间点(按时间排序), init_concentration为None时为该材料的标准曲线(按浓度排序)
+        :return: (时间梯度 × 波长)的数组视图
+        """
+        return self.intensity[self._slice(material, init_concentration)]
+
+    def times(self, material, init_concentration):
+        return self.time[self._slice(material, init_concentration)]
+
+    def concentrations(self, material):
+        # 标准曲线的浓度梯度
+        return self.concentration[self._slice(material)]
+
+    def paths(self, material, init_concentration=None):
+        # 与series行顺序一致的数据文件路径
+        return self.sources[self._slice(material, init_concentration)]
+
+    def spectral_matrix(self, material, init_concentration=None):
+        """
+        :description: 与Plastic.spectral_matrix相同形式的(波长 × N)矩阵, 不读取文件
+        :return: SpectralMatrix
+        """
+        sl = self._slice(material, init_concentration)
+        return SpectralMatrix(self.wavelength, self.intensity[sl].T, tuple(self.sources[sl]))
+
+    def table(self, material, init_concentration=None):
+        """
+        :description: 与Plastic.plastic_data相同形式的DataFrame(第0列为波长, 其余每列为一次扫描), 供绘图函数使用
+        :return: DataFrame
+        """
+        series = self.series(material, init_concentration)
+        return pd.DataFrame(np.column_stack([self.wavelength, series.T]))
+
+    def intensity_at(self, material, init_concentration, excitation_wave_length, interpolate=False):
+        """
+        :description: 与Plastic.intensity_at(preprocessing=dataset.preprocessing)相同, 每次扫描在激发波长处扣除空白后的荧光强度
+        :param init_concentration: 初始浓度, 为None时为标准曲线
+        :return: 一维数组
+        """
+        return np.asarray(pick(self.header, self.series(material, init_concentration).T, excitation_wave_length,
+                               interpolate), dtype=np.double)
+
+    def quantity(self, material, init_concentration, excitation_wave_length, a, b, mass, init_volume, sample):
+        """
+        :description: 与Adsorption.adsorption_quantity相同的吸附量q(t)(第0个为0时刻), 不读取文件
+        :return: 一维数组
+        """
+        y = self.intensity_at(material, init_concentration, excitation_wave_length)
+        with Timing.span("quantity", "compute", files=len(y)):
+            return Adsorption.quantity_matrix(y[np.newaxis, :], [init_concentration], a, b, mass, init_volume,
+                                              sample)[0]
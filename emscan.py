@@ -0,0 +1,234 @@
+# This Python file uses the following encoding: utf-8
+from functools import lru_cache
+from itertools import islice
+from typing import NamedTuple
+
+import numpy as np
+
+
+class ScanHeader(NamedTuple):
+    """
+    :description: 荧光仪EmScan数据文件(.csv)的元数据头
+    """
+    label: str = ""
+    scan_type: str = ""
+    comment: str = ""
+    start: float = 0.0
+    stop: float = 0.0
+    step: float = 1.0
+    fixed_offset: float = 0.0
+    x_axis: str = ""
+    y_axis: str = ""
+    scan_corr_by_file: bool = False
+    corr_by_ref_det: bool = False
+    fixed_offset_corr_by_file: bool = False
+    repeats: int = 1
+    dwell_time: float = 0.0
+    lamp: str = ""
+    temp: float = 0.0
+    scan_polariser: str = ""
+    scan_slit: float = 0.0
+    fixed_offset_polariser: str = ""
+    fixed_offset_slit: float = 0.0
+    detector: str = ""
+
+    @property
+    def points(self):
+        # 由Start/Stop/Step得到的数据点数
+        return int(round((self.stop - self.start) / self.step)) + 1
+
+    @property
+    def wavelength(self):
+        return _wavelength_axis(self.start, self.step, self.points)
+
+    def same_axis(self, other):
+        # 两次扫描的波长轴是否一致
+        return self.start == other.start and self.step == other.step and self.points == other.points
+
+    def position(self, wave_length):
+        """
+        :description: 由Start/Step直接计算波长对应的(浮点)行号, 不需要查找波长列
+        :param wave_length: 波长(标量或数组)
+        :return: 行号(与wave_length形状相同)
+        """
+        pos = (np.asarray(wave_length, dtype=np.double) - self.start) / self.step
+        # 容许浮点误差, 超出扫描范围则报错
+        if np.any(pos < -1e-6) or np.any(pos > self.points - 1 + 1e-6):
+            raise ValueError("波长%s超出扫描范围[%s, %s]" % (wave_length, self.start, self.stop))
+        return np.clip(pos, 0, self.points - 1)
+
+    def band(self, low, high):
+        """
+        :description: 波长区间[low, high]对应的行切片
+        :return: slice
+        """
+        return slice(int(np.ceil(self.position(low) - 1e-6)), int(np.floor(self.position(high) + 1e-6)) + 1)
+
+
+class Scan(NamedTuple):
+    """
+    :description: 一次扫描的元数据与荧光强度, 波长轴由元数据头生成
+    """
+    header: ScanHeader
+    intensity: np.ndarray
+
+    @property
+    def wavelength(self):
+        return self.header.wavelength
+
+
+def _to_bool(text):
+    return text.strip().lower() == "true"
+
+
+# 元数据头中的键 --> (ScanHeader字段名, 类型转换)
+_HEADER_FIELDS = {
+    "Labels": ("label", str),
+    "Type": ("scan_type", str),
+    "Comment": ("comment", str),
+    "Start": ("start", float),
+    "Stop": ("stop", float),
+    "Step": ("step", float),
+    "Fixed/Offset": ("fixed_offset", float),
+    "Xaxis": ("x_axis", str),
+    "Yaxis": ("y_axis", str),
+    "Scan Corr. by File": ("scan_corr_by_file", _to_bool),
+    "Corr. by Ref. Det.": ("corr_by_ref_det", _to_bool),
+    "Fixed/Offset Corr. by File": ("fixed_offset_corr_by_file", _to_bool),
+    "Repeats": ("repeats", int),
+    "Dwell Time": ("dwell_time", float),
+    "Lamp": ("lamp", str),
+    "Temp": ("temp", float),
+    "Scan Polariser": ("scan_polariser", str),
+    "Scan Slit": ("scan_slit", float),
+    "Fixed/Offset Polariser": ("fixed_offset_polariser", str),
+    "Fixed/Offset Slit": ("fixed_offset_slit", float),
+    "Detector": ("detector", str),
+}
+
+
+@lru_cache(maxsize=64)
+def _wavelength_axis(start, step, points):
+    # 同一仪器设置下的波长轴只生成一次, 设为只读以便在多个Scan之间共享
+    axis = start + step * np.arange(points, dtype=np.double)
+    axis.setflags(write=False)
+    return axis
+
+
+def parse_header(lines):
+    """
+    :description: 解析元数据头, 直到第一个空行为止
+    :param lines: 数据文件按行拆分后的列表
+    :return: (ScanHeader, 数据起始行号)
+    """
+    values = {}
+    for number, line in enumerate(lines):
+        line = line.strip()
+        if not line:
+            return ScanHeader(**values), number + 1
+        key, _, rest = line.partition(",")
+        if key in _HEADER_FIELDS:
+            name, convert = _HEADER_FIELDS[key]
+            values[name] = convert(rest.rstrip(",").strip())
+    raise ValueError("未找到EmScan元数据头的结束空行")
+
+
+def _header_from_file(f):
+    # 逐行读取到元数据头结束的空行, 文件指针停在第一行数据处
+    lines = []
+    for line in f:
+        lines.append(line)
+        if not line.strip():
+            break
+    return parse_header(lines)[0]
+
+
+def read_header(path):
+    """
+    :description: 只读取数据文件的元数据头
+    :param path: 数据文件(.csv)路径
+    :return: ScanHeader
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return _header_from_file(f)
+
+
+def pick(header, intensity, wave_length, interpolate=False):
+    """
+    :description: 从荧光强度中取出指定波长处的值
+    :param header: ScanHeader
+    :param intensity: 荧光强度, 第一维为波长(一维或二维)
+    :param wave_length: 波长(标量或数组)
+    :param interpolate: 波长不在扫描网格上时是否线性插值, 为False时报错
+    :return: 荧光强度
+    """
+    pos = header.position(wave_length)
+    nearest = np.rint(pos)
+    if np.allclose(pos, nearest, rtol=0, atol=1e-6):
+        return intensity[nearest.astype(np.intp)]
+    if not interpolate:
+        raise ValueError("波长%s不在扫描网格上(Step=%s), 可设置interpolate=True" % (wave_length, header.step))
+    low = np.floor(pos).astype(np.intp)
+    high = np.minimum(low + 1, header.points - 1)
+    weight = pos - low
+    if intensity.ndim > 1:
+        weight = weight.reshape(weight.shape + (1,) * (intensity.ndim - 1))
+    return intensity[low] * (1 - weight) + intensity[high] * weight
+
+
+def read_scan(path):
+    """
+    :description: 读取荧光仪EmScan数据文件, 只对荧光强度列做数值解析;
+                  仪器尚未写完的文件(最后一行不完整或未到Stop波长)报ValueError
+    :param path: 数据文件(.csv)路径
+    :return: Scan
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    header, data_start = parse_header(lines)
+    rows = [line for line in lines[data_start:] if line.strip()]
+    _check_complete(path, header, rows)
+    intensity = np.loadtxt(rows, delimiter=",", usecols=1, dtype=np.double, ndmin=1)
+    if intensity.shape[0] != header.points:
+        raise ValueError("%s: 数据点数%d与元数据头(Start=%s, Stop=%s, Step=%s)不一致"
+                         % (path, intensity.shape[0], header.start, header.stop, header.step))
+    return Scan(header, intensity)
+
+
+def _check_complete(path, header, rows):
+    # 数据点数相同时仍可能最后一个数字被截断: 最后一行必须与第一行同样以","结尾, 且波长等于Stop
+    if not rows:
+        raise ValueError("%s: 没有数据行" % path)
+    last = rows[-1].rstrip()
+    if rows[0].rstrip().endswith(",") and not last.endswith(","):
+        raise ValueError("%s: 最后一行不完整: %r" % (path, last))
+    try:
+        stop = float(last.split(",")[0])
+        float(last.split(",")[1])
+    except (ValueError, IndexError):
+        raise ValueError("%s: 最后一行无法解析: %r" % (path, last)) from None
+    if abs(stop - header.stop) > abs(header.step) * 1e-3:
+        raise ValueError("%s: 最后一行的波长%s与元数据头的Stop=%s不一致" % (path, stop, header.stop))
+
+
+def read_at(path, wave_length, interpolate=False):
+    """
+    :description: 只读取指定波长处的荧光强度, 其余数据行不做解析
+    :param path: 数据文件(.csv)路径
+    :param wave_length: 波长(标量)
+    :param interpolate: 波长不在扫描网格上时是否线性插值
+    :return: 荧光强度(标量)
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        header = _header_from_file(f)
+        pos = float(header.position(wave_length))
+        low = int(np.floor(pos + 1e-6))
+        weight = max(pos - low, 0.0)
+        if weight > 1e-6 and not interpolate:
+            raise ValueError("波长%s不在扫描网格上(Step=%s), 可设置interpolate=True" % (wave_length, header.step))
+        # 只取出所需的一行(插值时两行)
+        rows = list(islice(f, low, low + (2 if weight > 1e-6 else 1)))
+    values = [float(line.split(",")[1]) for line in rows]
+    if len(values) == 1:
+        return values[0]
+    return values[0] * (1 - weight) + values[1] * weight
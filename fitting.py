@@ -0,0 +1,689 @@
+# This Python file uses the following encoding: utf-8
+"""
+一元线性回归(最小二乘)的闭式解与非线性模型的批量Levenberg-Marquardt拟合,
+均可一次拟合多条相互独立的数据序列
+"""
+import math
+from typing import NamedTuple
+
+import numpy as np
+
+
+class LinearFit(NamedTuple):
+    """
+    :description: 线性拟合y = slope * x + intercept的结果; 批量拟合时各字段的第一维为序列
+    """
+    slope: np.ndarray
+    intercept: np.ndarray
+    r2: np.ndarray
+    slope_se: np.ndarray
+    intercept_se: np.ndarray
+    residuals: np.ndarray
+    n: np.ndarray
+
+    def predict(self, x):
+        """
+        :description: 拟合直线在x处的值
+        :param x: 自变量, 批量拟合时最后一维为数据点
+        """
+        x = np.asarray(x, dtype=np.double)
+        slope = np.asarray(self.slope)
+        intercept = np.asarray(self.intercept)
+        if slope.ndim and x.ndim:
+            slope = slope[..., None]
+            intercept = intercept[..., None]
+        return slope * x + intercept
+
+    def function_str(self, i=None):
+        # 图例中显示的拟合方程, 与原来的格式一致
+        a = float(self.slope if i is None else self.slope[i])
+        b = float(self.intercept if i is None else self.intercept[i])
+        if b < 0:
+            return "y = %.4fx - %.4f" % (a, -b)
+        elif b > 0:
+            return "y = %.4fx + %.4f" % (a, b)
+        return ""
+
+
+# 线性化模型(PFO/PSO/IPD)给出拟合直线所需的最少有效数据点数, 少于该数时不绘制、拟合表中记为NaN
+MIN_LINEAR_POINTS = 3
+
+
+def linear_fit(x, y):
+    """
+    :description: 最小二乘线性拟合, 由中心化后的求和直接得到斜率、截距、R²与标准误差;
+                  x, y为二维数组时每一行是一条独立的序列, 所有序列在一次向量化计算中完成,
+                  值为NaN的数据点不参与拟合
+    :param x: 自变量, 形状(m,)或(n, m), 一维时所有序列共用
+    :param y: 因变量, 形状(m,)或(n, m)
+    :return: LinearFit, 输入为一维时各字段为标量
+    """
+    x = np.asarray(x, dtype=np.double)
+    y = np.asarray(y, dtype=np.double)
+    single = x.ndim == 1 and y.ndim == 1
+    x, y = np.broadcast_arrays(np.atleast_2d(x), np.atleast_2d(y))
+    valid = np.isfinite(x) & np.isfinite(y)
+    xv = np.where(valid, x, 0.0)
+    yv = np.where(valid, y, 0.0)
+
+    n = valid.sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_mean = xv.sum(axis=-1) / n
+        y_mean = yv.sum(axis=-1) / n
+        dx = np.where(valid, x - x_mean[:, None], 0.0)
+        dy = np.where(valid, y - y_mean[:, None], 0.0)
+        sxx = (dx * dx).sum(axis=-1)
+        sxy = (dx * dy).sum(axis=-1)
+        syy = (dy * dy).sum(axis=-1)
+
+        slope = sxy / sxx
+        intercept = y_mean - slope * x_mean
+        residuals = np.where(valid, y - (slope[:, None] * x + intercept[:, None]), np.nan)
+        ss_res = np.nansum(residuals * residuals, axis=-1)
+        # 与sklearn.metrics.r2_score一致: y为常数时完全拟合记为1, 否则记为0; 直线无法确定(少于2个点)时为NaN
+        r2 = np.where(syy > 0, 1 - ss_res / syy, np.where(ss_res > 0, 0.0, 1.0))
+        r2 = np.where(np.isfinite(slope), r2, np.nan)
+
+        # 残差的方差, 数据点不多于2个时标准误差没有意义
+        s2 = np.where(n > 2, ss_res / (n - 2), np.nan)
+        slope_se = np.sqrt(s2 / sxx)
+        intercept_se = np.sqrt(s2 * (1 / n + x_mean * x_mean / sxx))
+
+    fit = LinearFit(slope, intercept, r2, slope_se, intercept_se, residuals, n)
+    if single:
+        return LinearFit(*(f[0] for f in fit))
+    return fit
+
+
+class LinearStats(object):
+    """
+    :description: 线性拟合的充分统计量(n, Σx, Σy, Σx², Σxy, Σy²), 新数据点到达时只需累加,
+                  不必保留全部数据即可得到与linear_fit相同的斜率、截距、R²与标准误差
+    """
+    def __init__(self):
+        self.n = 0
+        self.sx = 0.0
+        self.sy = 0.0
+        self.sxx = 0.0
+        self.sxy = 0.0
+        self.syy = 0.0
+
+    def add(self, x, y):
+        # 累加一个数据点, 非有限值(如ln(负数))跳过
+        if not (math.isfinite(x) and math.isfinite(y)):
+            return
+        self.n += 1
+        self.sx += x
+        self.sy += y
+        self.sxx += x * x
+        self.sxy += x * y
+        self.syy += y * y
+
+    def fit(self):
+        """
+        :description: 由充分统计量求解, 残差不可得, residuals为空数组
+        :return: LinearFit
+        """
+        n = self.n
+        nan = float("nan")
+        if n < 2:
+            return LinearFit(nan, nan, nan, nan, nan, np.empty(0), n)
+        sxx = self.sxx - self.sx * self.sx / n
+        sxy = self.sxy - self.sx * self.sy / n
+        syy = self.syy - self.sy * self.sy / n
+        if sxx <= 0:
+            return LinearFit(nan, nan, nan, nan, nan, np.empty(0), n)
+        slope = sxy / sxx
+        intercept = (self.sy - slope * self.sx) / n
+        ss_res = max(syy - slope * sxy, 0.0)
+        if syy > 0:
+            r2 = 1 - ss_res / syy
+        else:
+            r2 = 0.0 if ss_res > 0 else 1.0
+        if n > 2:
+            s2 = ss_res / (n - 2)
+            x_mean = self.sx / n
+            slope_se = math.sqrt(s2 / sxx)
+            intercept_se = math.sqrt(s2 * (1 / n + x_mean * x_mean / sxx))
+        else:
+            slope_se = intercept_se = nan
+        return LinearFit(slope, intercept, r2, slope_se, intercept_se, np.empty(0), n)
+
+
+def r_square(y, y_predict):
+    """
+    :description: 决定系数R², 最后一维为数据点
+    :param y: 实验数据
+    :param y_predict: 模型预测值
+    """
+    y = np.asarray(y, dtype=np.double)
+    y_predict = np.asarray(y_predict, dtype=np.double)
+    ss_res = ((y - y_predict) ** 2).sum(axis=-1)
+    ss_tot = ((y - y.mean(axis=-1, keepdims=True)) ** 2).sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(ss_tot > 0, 1 - ss_res / ss_tot, np.where(ss_res > 0, 0.0, 1.0))[()]
+
+
+class Model(NamedTuple):
+    """
+    :description: 非线性拟合模型; func/jacobian对最后一维(数据点)广播, 参数的最后一维为模型参数
+    """
+    name: str
+    params: tuple
+    # func(x, p) --> y
+    func: object
+    # jacobian(x, p) --> dy/dp, 形状为x.shape + (参数个数,)
+    jacobian: object
+    # guess(x, y) --> 初始参数, 由线性化形式拟合得到
+    guess: object
+
+    def __call__(self, x, p):
+        return self.func(np.asarray(x, dtype=np.double), np.asarray(p, dtype=np.double))
+
+
+def _langmuir(c, p):
+    qm, k = p[..., 0:1], p[..., 1:2]
+    return qm * k * c / (1 + k * c)
+
+
+def _langmuir_jacobian(c, p):
+    qm, k = p[..., 0:1], p[..., 1:2]
+    d = 1 + k * c
+    return np.stack([k * c / d, qm * c / (d * d)], axis=-1)
+
+
+def _langmuir_guess(c, q):
+    # 线性化: Ce/qe = Ce/qm + 1/(qm·K)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fit = linear_fit(c, c / q)
+        qm = 1 / fit.slope
+        k = fit.slope / fit.intercept
+        # 线性化结果不合理(qm或K非正)时, 以最大吸附量与浓度的中位数估计
+        bad = ~((qm > 0) & (k > 0) & np.isfinite(qm) & np.isfinite(k))
+        qm = np.where(bad, np.nanmax(q, axis=-1) * 1.2, qm)
+        k = np.where(bad, 1 / np.nanmedian(np.abs(c), axis=-1), k)
+    return np.stack([qm, k], axis=-1)
+
+
+def _freundlich(c, p):
+    n, k = p[..., 0:1], p[..., 1:2]
+    return k * c ** n
+
+
+def _freundlich_jacobian(c, p):
+    n, k = p[..., 0:1], p[..., 1:2]
+    cn = c ** n
+    with np.errstate(invalid="ignore", divide="ignore"):
+        log_c = np.where(c > 0, np.log(np.where(c > 0, c, 1.0)), 0.0)
+    return np.stack([k * cn * log_c, cn], axis=-1)
+
+
+def _freundlich_guess(c, q):
+    # 线性化: ln(qe) = ln(K) + n·ln(Ce), 非正的数据点不参与
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fit = linear_fit(np.where(c > 0, np.log(c), np.nan), np.where(q > 0, np.log(q), np.nan))
+        n = fit.slope
+        k = np.exp(fit.intercept)
+        bad = ~(np.isfinite(n) & np.isfinite(k))
+        n = np.where(bad, 1.0, n)
+        k = np.where(bad, np.nanmean(q / c, axis=-1), k)
+    return np.stack([n, k], axis=-1)
+
+
+# 理想气体常数, J/(mol·K)
+GAS_CONSTANT = 8.314
+
+
+def _polanyi(c, temperature):
+    # Polanyi势 ε = RT·ln(1 + 1/Ce), 单位J/mol
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return GAS_CONSTANT * temperature * np.log1p(1 / c)
+
+
+def _dr(temperature):
+    def func(c, p):
+        qm, k = p[..., 0:1], p[..., 1:2]
+        e = _polanyi(c, temperature)
+        return qm * np.exp(-k * e * e)
+
+    def jacobian(c, p):
+        qm, k = p[..., 0:1], p[..., 1:2]
+        e2 = _polanyi(c, temperature) ** 2
+        ex = np.exp(-k * e2)
+        return np.stack([ex, -qm * e2 * ex], axis=-1)
+
+    def guess(c, q):
+        # 线性化: ln(qe) = ln(qm) - K·ε²
+        e2 = _polanyi(c, temperature) ** 2
+        with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+            fit = linear_fit(e2, np.where(q > 0, np.log(q), np.nan))
+            k = -fit.slope
+            qm = np.exp(fit.intercept)
+            bad = ~(np.isfinite(qm) & np.isfinite(k) & (k > 0))
+            qm = np.where(bad, np.nanmax(q, axis=-1), qm)
+            k = np.where(bad, 1 / np.nanmedian(e2, axis=-1), k)
+        return np.stack([qm, k], axis=-1)
+
+    return func, jacobian, guess
+
+
+def dubinin_radushkevich(temperature=298.15):
+    """
+    :description: Dubinin-Radushkevich模型 qe = qm·exp(-K·ε²), ε = RT·ln(1 + 1/Ce);
+                  平均吸附能E = 1/(2K)^(1/2), 单位J/mol
+    :param temperature: 吸附温度(K)
+    :return: Model
+    """
+    return Model("dubinin_radushkevich", ("qm", "K"), *_dr(float(temperature)))
+
+
+def _temkin(c, p):
+    a, b = p[..., 0:1], p[..., 1:2]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return b * np.log(a * c)
+
+
+def _temkin_jacobian(c, p):
+    a, b = p[..., 0:1], p[..., 1:2]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.stack([np.broadcast_to(b / a, np.shape(c * a)), np.log(a * c)], axis=-1)
+
+
+def _temkin_guess(c, q):
+    # 对ln(Ce)线性: qe = B·ln(A) + B·ln(Ce), 吸附热相关常数b = RT/B
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        fit = linear_fit(np.where(c > 0, np.log(c), np.nan), q)
+        b = fit.slope
+        a = np.exp(fit.intercept / fit.slope)
+        bad = ~(np.isfinite(a) & np.isfinite(b) & (a > 0))
+        b = np.where(bad, np.nanmean(q, axis=-1), b)
+        a = np.where(bad, np.e / np.nanmedian(c, axis=-1), a)
+    return np.stack([a, b], axis=-1)
+
+
+# 参数顺序与operation_model中langmuir(Ce, qm, Ka)、freundlich(Ce, n, Ka)一致
+LANGMUIR = Model("langmuir", ("qm", "K"), _langmuir, _langmuir_jacobian, _langmuir_guess)
+FREUNDLICH = Model("freundlich", ("n", "K"), _freundlich, _freundlich_jacobian, _freundlich_guess)
+TEMKIN = Model("temkin", ("A", "B"), _temkin, _temkin_jacobian, _temkin_guess)
+DUBININ_RADUSHKEVICH = dubinin_radushkevich()
+ISOTHERM_MODELS = {m.name: m for m in (LANGMUIR, FREUNDLICH, DUBININ_RADUSHKEVICH, TEMKIN)}
+
+
+def isotherm_model(name, temperature=298.15):
+    """
+    :description: 按名称取得等温线模型, 与温度有关的模型(Dubinin-Radushkevich)按temperature构建
+    :param name: ISOTHERM_MODELS中的模型名
+    :param temperature: 吸附温度(K)
+    :return: Model
+    """
+    if name == "dubinin_radushkevich":
+        return dubinin_radushkevich(temperature)
+    if name not in ISOTHERM_MODELS:
+        raise ValueError("未知的等温线模型%s, 可选: %s" % (name, ", ".join(ISOTHERM_MODELS)))
+    return ISOTHERM_MODELS[name]
+
+
+def _scale_guess(t, q):
+    # 饱和吸附量与时间尺度的粗略估计: 绝对值最大的吸附量与时间的中位数
+    with np.errstate(invalid="ignore"):
+        idx = np.nanargmax(np.where(np.isfinite(q), np.abs(q), -1.0), axis=-1)
+        qe = np.take_along_axis(q, idx[..., None], axis=-1)[..., 0] * 1.05
+        qe = np.where(qe == 0, 1.0, qe)
+        tau = np.nanmedian(np.where(t > 0, t, np.nan), axis=-1)
+    return qe, np.where(np.isfinite(tau) & (tau > 0), tau, 1.0)
+
+
+def _pfo(t, p):
+    qe, k1 = p[..., 0:1], p[..., 1:2]
+    return qe * (1 - np.exp(-k1 * t))
+
+
+def _pfo_jacobian(t, p):
+    qe, k1 = p[..., 0:1], p[..., 1:2]
+    e = np.exp(-k1 * t)
+    return np.stack([1 - e, qe * t * e], axis=-1)
+
+
+def _pfo_guess(t, q):
+    # 线性化: ln(1 - qt/qe) = -k1·t, 只使用qt/qe < 1的数据点, 不会出现对负数取对数
+    qe, tau = _scale_guess(t, q)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = 1 - q / qe[..., None]
+        fit = linear_fit(t, np.where(z > 0, np.log(z), np.nan))
+        k1 = -fit.slope
+    k1 = np.where(np.isfinite(k1) & (k1 > 0), k1, 1 / tau)
+    return np.stack([qe, k1], axis=-1)
+
+
+def _pso(t, p):
+    qe, k2 = p[..., 0:1], p[..., 1:2]
+    u = qe * k2 * t
+    return qe * u / (1 + u)
+
+
+def _pso_jacobian(t, p):
+    qe, k2 = p[..., 0:1], p[..., 1:2]
+    u = qe * k2 * t
+    d = (1 + u) * (1 + u)
+    return np.stack([u * (2 + u) / d, qe * qe * t / d], axis=-1)
+
+
+def _pso_guess(t, q):
+    # 线性化: t/qt = 1/(k2·qe²) + t/qe
+    qe0, tau = _scale_guess(t, q)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fit = linear_fit(t, np.where((t > 0) & (q != 0), t / q, np.nan))
+        qe = 1 / fit.slope
+        k2 = fit.slope * fit.slope / fit.intercept
+    bad = ~(np.isfinite(qe) & np.isfinite(k2) & (qe * k2 > 0))
+    qe = np.where(bad, qe0, qe)
+    k2 = np.where(bad, 1 / (qe0 * tau), k2)
+    return np.stack([qe, k2], axis=-1)
+
+
+def _elovich(t, p):
+    alpha, beta = p[..., 0:1], p[..., 1:2]
+    return np.log1p(alpha * beta * t) / beta
+
+
+def _elovich_jacobian(t, p):
+    alpha, beta = p[..., 0:1], p[..., 1:2]
+    w = 1 + alpha * beta * t
+    return np.stack([t / w, alpha * t / (beta * w) - np.log(w) / (beta * beta)], axis=-1)
+
+
+def _elovich_guess(t, q):
+    # αβt >> 1时: qt = ln(αβ)/β + ln(t)/β
+    qe, tau = _scale_guess(t, q)
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        fit = linear_fit(np.where(t > 0, np.log(t), np.nan), q)
+        beta = 1 / fit.slope
+        alpha = np.exp(fit.intercept / fit.slope) / beta
+    bad = ~(np.isfinite(alpha) & np.isfinite(beta) & (alpha * beta > 0))
+    beta = np.where(bad, 1 / qe, beta)
+    alpha = np.where(bad, qe / tau, alpha)
+    return np.stack([alpha, beta], axis=-1)
+
+
+def _ipd(t, p):
+    kid, c = p[..., 0:1], p[..., 1:2]
+    return kid * np.sqrt(t) + c
+
+
+def _ipd_jacobian(t, p):
+    root = np.sqrt(t)
+    return np.stack([root, np.ones_like(root)], axis=-1)
+
+
+def _ipd_guess(t, q):
+    # 对参数是线性的, 直接由qt对t^(1/2)的线性拟合得到
+    fit = linear_fit(np.sqrt(t), q)
+    return np.stack([fit.slope, fit.intercept], axis=-1)
+
+
+# 动力学模型, 自变量为时间t(min), 因变量为吸附量qt(mg/g)
+PFO = Model("pfo", ("qe", "k1"), _pfo, _pfo_jacobian, _pfo_guess)
+PSO = Model("pso", ("qe", "k2"), _pso, _pso_jacobian, _pso_guess)
+ELOVICH = Model("elovich", ("alpha", "beta"), _elovich, _elovich_jacobian, _elovich_guess)
+IPD = Model("ipd", ("kid", "C"), _ipd, _ipd_jacobian, _ipd_guess)
+KINETIC_MODELS = {m.name: m for m in (PFO, PSO, ELOVICH, IPD)}
+
+
+class NonlinearFit(NamedTuple):
+    """
+    :description: 非线性拟合的结果; 批量拟合时各字段的第一维为数据集
+    """
+    model: Model
+    params: np.ndarray
+    se: np.ndarray
+    r2: np.ndarray
+    ssr: np.ndarray
+    # 是否收敛: 阻尼过大而停止、参数非有限或不可辨识(雅可比矩阵列相关)时为False
+    converged: np.ndarray
+    iterations: np.ndarray
+    nfev: np.ndarray
+    n: np.ndarray
+
+    @property
+    def aic(self):
+        # 以残差平方和计算的AIC, 参数个数不同的模型之间可以比较
+        return information_criteria(self.ssr, self.n, len(self.model.params))[0]
+
+    @property
+    def aicc(self):
+        # 小样本修正的AIC: AIC + 2k(k+1)/(n-k-1), 数据点少时对参数多的模型惩罚更重; n <= k + 1时没有定义, 为NaN
+        k = len(self.model.params)
+        n = np.asarray(self.n, dtype=np.double)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(n > k + 1, self.aic + 2 * k * (k + 1) / (n - k - 1), np.nan)[()]
+
+    @property
+    def bic(self):
+        return information_criteria(self.ssr, self.n, len(self.model.params))[1]
+
+    def predict(self, x):
+        """
+        :description: 拟合曲线在x处的值
+        :param x: 自变量, 批量拟合时最后一维为数据点
+        """
+        x = np.asarray(x, dtype=np.double)
+        p = np.asarray(self.params)
+        if p.ndim == 1:
+            return self.model.func(x[..., None], p).reshape(x.shape) if x.ndim else \
+                float(self.model.func(x.reshape(1), p)[0])
+        return self.model.func(np.broadcast_to(x, p.shape[:-1] + x.shape[-1:]), p)
+
+
+def nonlinear_fit(model, x, y, p0=None, max_iter=200, ftol=1e-10, xtol=1e-10):
+    """
+    :description: 批量Levenberg-Marquardt拟合, 使用模型的解析雅可比矩阵;
+                  所有数据集同时迭代, 每个数据集分别判断收敛, 值为NaN的数据点不参与拟合
+    :param model: Model, 如LANGMUIR、FREUNDLICH
+    :param x: 自变量, 形状(m,)或(n, m)
+    :param y: 因变量, 形状(m,)或(n, m), 长度不同的数据集以NaN补齐
+    :param p0: 初始参数, 形状(k,)或(n, k); 为None或含NaN时由线性化形式估计
+    :param max_iter: 最大迭代次数
+    :param ftol: 残差平方和的相对变化小于ftol时收敛
+    :param xtol: 参数的相对变化小于xtol时收敛
+    :return: NonlinearFit, 输入为一维时各字段为单个数据集的结果
+    """
+    x = np.asarray(x, dtype=np.double)
+    y = np.asarray(y, dtype=np.double)
+    single = x.ndim == 1 and y.ndim == 1
+    x, y = np.broadcast_arrays(np.atleast_2d(x), np.atleast_2d(y))
+    valid = np.isfinite(x) & np.isfinite(y)
+    # 无效的数据点以1.0代替x, 保证各模型(含ln(Ce)、1/Ce)在该处有定义, 其残差与雅可比矩阵之后置0
+    x = np.where(valid, x, 1.0)
+    y = np.where(valid, y, np.nan)
+    count = len(x)
+    k = len(model.params)
+
+    p = model.guess(np.where(valid, x, np.nan), y)
+    if p0 is not None:
+        given = np.broadcast_to(np.asarray(p0, dtype=np.double), p.shape)
+        p = np.where(np.isfinite(given), given, p)
+    p = np.array(p, dtype=np.double)
+    start = p.copy()
+
+    def residual(params):
+        return np.where(valid, y - model.func(x, params), 0.0)
+
+    r = residual(p)
+    ssr = (r * r).sum(axis=-1)
+    lam = np.full(count, 1e-3)
+    converged = np.zeros(count, dtype=bool)
+    stalled = np.zeros(count, dtype=bool)
+    iterations = np.zeros(count, dtype=np.intp)
+    nfev = np.ones(count, dtype=np.intp)
+    eye = np.eye(k)
+
+    for _ in range(max_iter):
+        active = ~converged & ~stalled & np.isfinite(ssr)
+        if not active.any():
+            break
+        idx = np.flatnonzero(active)
+        J = np.where(valid[idx, :, None], model.jacobian(x[idx], p[idx]), 0.0)
+        A = np.einsum("nmi,nmj->nij", J, J)
+        g = np.einsum("nmi,nm->ni", J, r[idx])
+        # 阻尼项按对角元缩放(Marquardt), 对角元为0时以单位阵代替
+        diag = np.einsum("nii->ni", A)
+        damping = lam[idx, None, None] * (np.where(diag > 0, diag, 1.0)[:, :, None] * eye)
+        try:
+            step = np.linalg.solve(A + damping, g[..., None])[..., 0]
+        except np.linalg.LinAlgError:
+            step = np.stack([np.linalg.lstsq(a, b, rcond=None)[0] for a, b in zip(A + damping, g)])
+        trial = p[idx] + step
+        with np.errstate(invalid="ignore", over="ignore"):
+            r_trial = np.where(valid[idx], y[idx] - model.func(x[idx], trial), 0.0)
+            ssr_trial = (r_trial * r_trial).sum(axis=-1)
+        iterations[idx] += 1
+        nfev[idx] += 1
+
+        better = np.isfinite(ssr_trial) & (ssr_trial <= ssr[idx])
+        small_f = better & (ssr[idx] - ssr_trial <= ftol * np.maximum(ssr[idx], 1e-300))
+        # 被拒绝的步长因阻尼增大而变小, 只有被接受的步长才能判断参数收敛
+        small_x = better & np.all(np.abs(step) <= xtol * (np.abs(p[idx]) + xtol), axis=-1)
+        accept = idx[better]
+        p[accept] = trial[better]
+        r[accept] = r_trial[better]
+        ssr[accept] = ssr_trial[better]
+        lam[idx] = np.where(better, lam[idx] / 10, lam[idx] * 10)
+        converged[idx] = small_f | small_x
+        # 阻尼过大说明已无法再下降: 停止迭代, 但不算收敛
+        stalled[idx] = ~converged[idx] & (lam[idx] > 1e16)
+
+    # 参数的标准误差: s²·(JᵀJ)⁻¹的对角元
+    J = np.where(valid[..., None], model.jacobian(x, p), 0.0)
+    A = np.einsum("nmi,nmj->nij", J, J)
+    n_points = valid.sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        s2 = np.where(n_points > k, ssr / (n_points - k), np.nan)
+        cov = np.linalg.pinv(A)
+        se = np.sqrt(np.einsum("nii->ni", cov) * s2[:, None])
+        y_mean = np.nanmean(y, axis=-1, keepdims=True)
+        ss_tot = np.nansum((y - y_mean) ** 2, axis=-1)
+        r2 = np.where(ss_tot > 0, 1 - ssr / ss_tot, np.where(ssr > 0, 0.0, 1.0))
+    # 参数发散(如k1 --> ∞时模型退化为常数)时雅可比矩阵的某一列为0或参数比初始值大许多个数量级, 参数不可辨识, 不算收敛
+    diverged = np.any(np.abs(p) > 1e10 * (np.abs(start) + 1), axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        norm = np.sqrt(np.einsum("nii->ni", A))
+        scaled = A / (norm[:, :, None] * norm[:, None, :])
+        identified = np.all(norm > 0, axis=-1) & np.all(np.isfinite(scaled), axis=(-2, -1))
+        identified[identified] = np.linalg.cond(scaled[identified]) < 1e12
+    converged &= np.all(np.isfinite(p), axis=-1) & identified & ~diverged
+
+    fit = NonlinearFit(model, p, se, r2, ssr, converged, iterations, nfev, n_points)
+    if single:
+        return NonlinearFit(model, *(f[0] for f in fit[1:]))
+    return fit
+
+
+def information_criteria(ssr, n, k):
+    """
+    :description: 最小二乘拟合的AIC与BIC(高斯误差假设): n·ln(SSR/n) + 2k与n·ln(SSR/n) + k·ln(n)
+    :param ssr: 残差平方和
+    :param n: 数据点数
+    :param k: 模型参数个数
+    :return: (AIC, BIC)
+    """
+    ssr = np.asarray(ssr, dtype=np.double)
+    n = np.asarray(n, dtype=np.double)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # 完全拟合时SSR为0, 以极小值代替以免出现-inf
+        base = n * np.log(np.maximum(ssr, 1e-300) / n)
+        return (base + 2 * k)[()], (base + k * np.log(n))[()]
+
+
+# 默认的bootstrap重抽样次数; 一万次重抽样的批量拟合不到0.1秒, 拟合表(fit_kinetics、select_models与runner)默认计算,
+# 绘图函数的返回值会多一项, 只在ci参数要求时计算
+BOOTSTRAP_REPLICATES = 10000
+
+
+class Bootstrap(NamedTuple):
+    """
+    :description: bootstrap置信区间; model为None时参数为(slope, intercept)
+    """
+    params: tuple
+    estimate: np.ndarray
+    low: np.ndarray
+    high: np.ndarray
+    level: float
+    replicates: int
+    # 未收敛或结果非有限而被舍弃的重抽样次数
+    failed: int
+
+    def summary(self):
+        # 每个参数一行: 参数名 = 估计值 [下限, 上限]
+        return ["%s = %.4g [%.4g, %.4g]" % (name, e, lo, hi)
+                for name, e, lo, hi in zip(self.params, self.estimate, self.low, self.high)]
+
+
+def _solve(model, x, y, p0=None):
+    # 批量拟合, 返回(重抽样次数, 参数个数)的参数矩阵, 拟合失败的行为NaN
+    if model is None:
+        fit = linear_fit(x, y)
+        return np.stack([fit.slope, fit.intercept], axis=-1)
+    fit = nonlinear_fit(model, x, y, p0=p0)
+    return np.where(fit.converged[:, None], fit.params, np.nan)
+
+
+def _bootstrap_chunk(job):
+    # 一块重抽样在一次批量拟合中完成
+    model, x, y, y_fit, residuals, estimate, method, size, seed = job
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, len(x), size=(size, len(x)))
+    if method == "residual":
+        return _solve(model, np.broadcast_to(x, idx.shape), y_fit + residuals[idx], estimate)
+    return _solve(model, x[idx], y[idx], estimate)
+
+
+def bootstrap(model, x, y, replicates=None, method="residual", level=0.95, seed=0, chunk_size=2000):
+    """
+    :description: 拟合参数的bootstrap百分位置信区间; 重抽样分块后每块一次批量拟合(以原拟合结果为初始参数),
+                  各块的随机数由seed派生, 结果可重复; 计算很快, 在调用方所在的线程中顺序执行,
+                  需要并行时由调用方在序列/数据集之间并行
+    :param model: fitting中的非线性模型, 为None时为线性拟合y = slope * x + intercept
+    :param x: 自变量(一条序列)
+    :param y: 因变量, NaN的数据点不参与
+    :param replicates: 重抽样次数, 为None时为BOOTSTRAP_REPLICATES, 为0时只返回估计值
+    :param method: "residual"对残差重抽样(x固定), "pairs"对数据点(x, y)成对重抽样
+    :param level: 置信水平
+    :param seed: 随机数种子
+    :param chunk_size: 每块的重抽样次数
+    :return: Bootstrap
+    """
+    if method not in ("residual", "pairs"):
+        raise ValueError("method只能为\"residual\"或\"pairs\"")
+    replicates = BOOTSTRAP_REPLICATES if replicates is None else int(replicates)
+    replicates = max(replicates, 0)
+    x = np.asarray(x, dtype=np.double)
+    y = np.asarray(y, dtype=np.double)
+    valid = np.isfinite(x) & np.isfinite(y)
+    x, y = x[valid], y[valid]
+    if model is None:
+        fit = linear_fit(x, y)
+        estimate = np.array([fit.slope, fit.intercept])
+        y_fit = fit.predict(x)
+        params = ("slope", "intercept")
+    else:
+        fit = nonlinear_fit(model, x, y)
+        estimate = np.asarray(fit.params)
+        y_fit = fit.predict(x)
+        params = model.params
+    # 残差按自由度放大, 抵消最小二乘残差偏小的影响
+    k = len(params)
+    residuals = (y - y_fit) * np.sqrt(len(x) / max(len(x) - k, 1))
+
+    sizes = [min(chunk_size, replicates - i) for i in range(0, replicates, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(model, x, y, y_fit, residuals, estimate, method, size, ss) for size, ss in zip(sizes, seeds)]
+    results = [_bootstrap_chunk(job) for job in jobs]
+
+    samples = np.concatenate(results) if results else np.empty((0, k))
+    ok = np.all(np.isfinite(samples), axis=-1)
+    alpha = (1 - level) / 2
+    if ok.any():
+        low, high = np.percentile(samples[ok], [100 * alpha, 100 * (1 - alpha)], axis=0)
+    else:
+        low = high = np.full(k, np.nan)
+    return Bootstrap(params, estimate, low, high, level, replicates, int((~ok).sum()))
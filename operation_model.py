@@ -1,13 +1,20 @@
 # This Python file uses the following encoding: utf-8
+import atexit
 import math
+import io
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
 
 from matplotlib import pyplot as plt
-from sklearn.linear_model import LinearRegression
+from matplotlib.collections import LineCollection
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 import numpy as np
-from sklearn.metrics import r2_score
-from time import localtime
-from time import strftime
-from scipy import optimize as op
+
+from fitting import linear_fit, nonlinear_fit, bootstrap, MIN_LINEAR_POINTS, LANGMUIR, FREUNDLICH, TEMKIN, ELOVICH, dubinin_radushkevich
+from timing import Timing
 
 
 def langmuir(Ce, qm, Ka):
@@ -18,9 +25,479 @@ def freundlich(Ce, n, Ka):
     return Ka * Ce ** n
 
 
+# 可以在后台线程中由PIL压缩编码的位图格式
+_RASTER_FORMATS = {"png": "PNG", "jpg": "JPEG", "jpeg": "JPEG", "tif": "TIFF", "tiff": "TIFF", "webp": "WEBP"}
+
+
+def _encode(buf, path, fmt):
+    # 将未压缩的PNG重新编码为目标格式并写盘, 在FigureWriter的后台线程中执行
+    from PIL import Image, PngImagePlugin
+
+    buf.seek(0)
+    with Timing.span("save/encode", "io", files=1) as span, Image.open(buf) as image:
+        kwargs = {}
+        if "dpi" in image.info:
+            kwargs["dpi"] = image.info["dpi"]
+        if fmt == "PNG":
+            info = PngImagePlugin.PngInfo()
+            for k, v in image.text.items():
+                info.add_text(k, v)
+            kwargs["pnginfo"] = info
+            image.save(path, format=fmt, **kwargs)
+        else:
+            image.convert("RGB").save(path, format=fmt, **kwargs)
+        if span:
+            span.add(bytes=os.path.getsize(path))
+
+
+class FigureWriter(object):
+    """
+    :description: 后台保存图片的线程, 绘图与拟合不必等待图片压缩编码和写盘
+    """
+    def __init__(self, maxsize=4):
+        # 队列有上限, 保存速度跟不上时绘图线程等待, 避免待保存的图片在内存中堆积
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._errors = []
+        # fork出的子进程不会继承后台线程, 以进程号判断是否需要新建
+        self.pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="FigureWriter", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                job()
+            except Exception as error:
+                self._errors.append(error)
+            finally:
+                self._queue.task_done()
+
+    def submit(self, fig, path):
+        """
+        :description: 保存图片; 位图格式在调用线程中只渲染出未压缩的PNG, 压缩编码与写盘在后台完成,
+                      矢量格式(svg/pdf/eps)直接在调用线程中保存. 返回后图片可以继续修改.
+                      渲染(Agg绘制)留在调用线程中: headless模式下的模板图片返回后立即被下一次绘图修改,
+                      后台线程再渲染会读到修改到一半的图片; 需要并行渲染时使用render_batch在多个进程中绘图
+        :param fig: Figure
+        :param path: 保存路径
+        """
+        fmt = os.path.splitext(path)[1][1:].lower()
+        if fmt not in _RASTER_FORMATS:
+            fig.savefig(path)
+            return
+        # 在调用线程中渲染, 保存时使用当前样式上下文中的rcParams(dpi、bbox等)
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", pil_kwargs={"compress_level": 0})
+        self._queue.put(lambda: _encode(buf, path, _RASTER_FORMATS[fmt]))
+
+    def flush(self):
+        """
+        :description: 等待已提交的图片全部保存完毕, 有保存失败时抛出第一个异常
+        """
+        self._queue.join()
+        if self._errors:
+            error = self._errors[0]
+            self._errors = []
+            raise error
+
+    def close(self):
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+
+
+class Render(object):
+    """
+    :description: 图片的输出方式; 无显示器的计算节点上使用headless模式(Agg后端, 不调用plt.show);
+                  headless、figsize、dpi与后台保存线程是整个进程共用的设置, 在启动时设定一次, 不随调用改变
+    """
+    headless = os.environ.get("SR_HEADLESS", "") not in ("", "0")
+    # 图片尺寸(英寸)与分辨率
+    figsize = (12, 10)
+    dpi = 180
+    _writer = None
+    _writer_lock = threading.Lock()
+    # headless模式下按绘图类型缓存的模板, 每个线程各自一份, 同一张模板图片不会被两个线程同时修改;
+    # 各线程的模板另外登记在_all_templates中, 供close统一释放
+    _local = threading.local()
+    _all_templates = []
+    _templates_lock = threading.Lock()
+
+    @classmethod
+    def use_headless(cls, headless=True):
+        cls.headless = headless
+        if headless:
+            plt.switch_backend("Agg")
+
+    @classmethod
+    def writer(cls):
+        with cls._writer_lock:
+            if cls._writer is None or cls._writer.pid != os.getpid():
+                cls._writer = FigureWriter()
+                atexit.register(cls.close)
+            return cls._writer
+
+    @classmethod
+    def figure(cls):
+        """
+        :description: 新建figsize英寸、dpi分辨率(默认12×10英寸、180dpi)的图片
+        :return: (Figure, Axes)
+        """
+        if cls.headless:
+            # 模板图片不注册到pyplot中, 长期保留也不会触发打开图片过多的警告
+            fig = Figure(figsize=cls.figsize, dpi=cls.dpi)
+            FigureCanvasAgg(fig)
+        else:
+            fig = plt.figure(figsize=cls.figsize, dpi=cls.dpi)
+        return fig, fig.add_subplot()
+
+    @classmethod
+    def template(cls, key, build):
+        """
+        :description: 取得绘图模板; headless模式下同一key的模板只构建一次, 之后只更新数据; 交互模式下每次新建
+        :param key: 模板的键(绘图类型、材料、语言等)
+        :param build: 构建模板的函数
+        """
+        if not cls.headless:
+            return build()
+        templates = cls._templates()
+        template = templates.get(key)
+        if template is None:
+            template = build()
+            templates[key] = template
+        return template
+
+    @classmethod
+    def _templates(cls):
+        templates = getattr(cls._local, "templates", None)
+        if templates is None:
+            templates = cls._local.templates = {}
+            with cls._templates_lock:
+                cls._all_templates.append(templates)
+        return templates
+
+    @classmethod
+    def finish(cls, fig, save=None):
+        """
+        :description: 保存(可选)并显示图片; 交互模式下显示后关闭图片, headless模式下保留模板图片以便重复使用
+        :param fig: Figure
+        :param save: 保存路径, 为None时不保存
+        """
+        if cls.headless:
+            if save is not None:
+                with Timing.span("save", "io", files=1):
+                    cls.writer().submit(fig, save)
+            return
+        # 选择是否要保存图片以及格式(jpg/png/svg)
+        if save is not None:
+            with Timing.span("save", "io", files=1):
+                fig.savefig(save)
+        plt.show()
+        plt.close(fig)
+
+    @classmethod
+    def flush(cls):
+        """
+        :description: 等待已提交的图片全部保存完毕; 模板图片保留, 之后的绘图继续使用
+        """
+        if cls._writer is not None and cls._writer.pid == os.getpid():
+            cls._writer.flush()
+
+    @classmethod
+    def close(cls):
+        """
+        :description: 等待图片保存完毕后结束后台保存线程, 并释放所有线程的模板图片; 在全部绘图结束后调用,
+                      之后再次绘图时重新构建模板、重新启动后台线程
+        """
+        with cls._writer_lock:
+            writer, cls._writer = cls._writer, None
+        with cls._templates_lock:
+            all_templates, cls._all_templates = cls._all_templates, []
+        for templates in all_templates:
+            for template in templates.values():
+                template.fig.clear()
+            templates.clear()
+        cls._local = threading.local()
+        if writer is not None and writer.pid == os.getpid():
+            writer.close()
+
+    @classmethod
+    def clear_templates(cls):
+        # 只清空当前线程的模板
+        templates = cls._templates()
+        for template in templates.values():
+            template.fig.clear()
+        templates.clear()
+
+
+def _render_job(job):
+    # 在子进程中执行一个绘图任务: (绘图函数, 位置参数, 关键字参数)
+    func, args, kwargs = job
+    func(*args, **kwargs)
+    Render.flush()
+
+
+def render_batch(jobs, workers=None):
+    """
+    :description: 在多个进程中以headless模式批量绘图并保存, 任一任务失败时抛出其异常
+    :param jobs: [(绘图函数, 位置参数, 关键字参数)], 绘图函数如Kinetics.kinetics_pfo
+    :param workers: 进程数, 为None时使用CPU核数
+    """
+    # 先保存完本进程中待保存的图片, 避免在后台线程持有matplotlib内部锁时fork子进程
+    Render.flush()
+    with ProcessPoolExecutor(max_workers=workers, initializer=Render.use_headless) as pool:
+        for _ in pool.map(_render_job, jobs):
+            pass
+
+
+def _confidence(model, x, y, ci):
+    # 绘图函数的ci参数: False时不计算; True时以fitting.BOOTSTRAP_REPLICATES次重抽样计算; 整数为重抽样次数
+    if ci is False or ci is None:
+        return None
+    with Timing.span("bootstrap", "fit") as span:
+        result = bootstrap(model, x, y, replicates=None if ci is True else ci)
+        span.add(replicates=result.replicates)
+    return result
+
+
+def axis_limits(values, pad=0.1):
+    """
+    :description: 根据数据自动得到坐标轴范围, 忽略NaN
+    :param values: 数据
+    :param pad: 两端留出的空白占数据范围的比例
+    :return: [下限, 上限]
+    """
+    values = np.asarray(values, dtype=np.double)
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return [0, 1]
+    low, high = float(values.min()), float(values.max())
+    span = (high - low) or abs(high) or 1.0
+    return [low - span * pad, high + span * pad]
+
+
+def sample_curve(func, low, high, x_limit=None, y_limit=None, tolerance=0.25, initial=17):
+    """
+    :description: 在[low, high]上自适应地采样拟合曲线: 从均匀的粗网格开始, 每轮只在区间中点处折线与曲线的偏差
+                  超过tolerance个像素的区间内加密, 总点数不超过图片的水平像素数
+    :param func: 拟合模型, 如fit.predict, 对数组逐点求值; 定义域之外可返回NaN
+    :param x_limit: 坐标范围, 用于把偏差换算为像素, 为None时取[low, high]
+    :param y_limit: 坐标范围, 为None时取粗网格上曲线的取值范围
+    :param tolerance: 允许的偏差(像素)
+    :param initial: 粗网格的点数
+    :return: (x, y)
+    """
+    width, height = Render.figsize[0] * Render.dpi, Render.figsize[1] * Render.dpi
+    x = np.linspace(low, high, initial)
+    with np.errstate(all="ignore"):
+        y = np.asarray(func(x), dtype=np.double)
+        finite = y[np.isfinite(y)]
+        x_span = (x_limit[1] - x_limit[0]) if x_limit is not None else (high - low)
+        y_span = (y_limit[1] - y_limit[0]) if y_limit is not None else (np.ptp(finite) if len(finite) else 0.0)
+        # 每单位长度对应的像素数; 小于1个像素的区间不再细分
+        x_scale = width / (x_span or 1.0)
+        y_scale = height / (y_span or 1.0)
+        while len(x) < width:
+            mid = 0.5 * (x[:-1] + x[1:])
+            y_mid = np.asarray(func(mid), dtype=np.double)
+            deviation = np.abs(y_mid - 0.5 * (y[:-1] + y[1:])) * y_scale
+            ok = np.isfinite(y)
+            # 定义域的边界(有一端为NaN)所在的区间总是细分
+            edge = (ok[:-1] != ok[1:]) | (np.isfinite(y_mid) != (ok[:-1] & ok[1:]))
+            deviation[edge] = np.inf
+            deviation[~np.isfinite(deviation) & ~edge] = 0.0
+            deviation[(x[1:] - x[:-1]) * x_scale <= 1.0] = 0.0
+            refine = np.flatnonzero(deviation > tolerance)
+            if not len(refine):
+                break
+            budget = int(width) - len(x)
+            if len(refine) > budget:
+                # 点数受限时优先细分偏差最大的区间
+                refine = np.sort(refine[np.argsort(-deviation[refine])[:budget]])
+            x = np.insert(x, refine + 1, mid[refine])
+            y = np.insert(y, refine + 1, y_mid[refine])
+    return x, y
+
+
+def _set_limits(ax, x_limit, y_limit):
+    # 坐标范围, 坐标轴交于(x_limit[0], y_limit[0])
+    ax.spines['bottom'].set_position(('data', y_limit[0]))
+    ax.spines['left'].set_position(('data', x_limit[0]))
+    ax.set_xlim(x_limit[0], x_limit[1])
+    ax.set_ylim(y_limit[0], y_limit[1])
+
+
+class FitFigure(object):
+    """
+    :description: 实验数据散点+拟合曲线的绘图模板, 样式只构建一次, 之后只更新数据、坐标范围和图例文字
+    """
+    def __init__(self, title, x_label, y_label, tick_params, legend_kind=True):
+        self.fig, ax = Render.figure()
+        self.ax = ax
+        ax.set_title(title, fontdict={"family": "Microsoft YaHei", "size": 22})
+        ax.tick_params(**tick_params)
+        ax.set_xlabel(x_label, fontdict={"family": "Microsoft YaHei", "size": 22})
+        ax.set_ylabel(y_label, fontdict={"family": "Microsoft YaHei", "size": 22})
+
+        ax.xaxis.set_ticks_position('bottom')
+        ax.yaxis.set_ticks_position('left')
+        ax.spines['bottom'].set_linewidth(1.5)  # 设置底部坐标轴的粗细
+        ax.spines['left'].set_linewidth(1.5)  # 设置左边坐标轴的粗细
+        ax.spines['right'].set_linewidth(1.5)  # 设置右边坐标轴的粗细
+        ax.spines['top'].set_linewidth(1.5)  # 设置上部坐标轴的粗细
+
+        self.points = ax.scatter([], [], s=80, marker='s', facecolor='none', edgecolor='#0000FF')
+        self.line, = ax.plot([], [], c="#FF7F50")
+        # 白色的线只用于在图例中显示R²
+        y_r2, = ax.plot(0, 0, c="white")
+        handles = [self.line, y_r2, self.points] if legend_kind else [self.line, y_r2]
+        self.legend = ax.legend(handles, [" "] * len(handles), loc=0, edgecolor='black', prop={'size': 20})
+
+    def update(self, x, y, x_fit, y_fit, labels, x_limit, y_limit, xticks=None):
+        """
+        :param x: 实验数据x
+        :param y: 实验数据y
+        :param x_fit: 拟合曲线x
+        :param y_fit: 拟合曲线y
+        :param labels: 图例文字
+        :param xticks: x轴刻度, 为None时自动
+        """
+        self.points.set_offsets(np.column_stack([np.ravel(x), np.ravel(y)]))
+        self.line.set_data(np.ravel(x_fit), np.ravel(y_fit))
+        if xticks is not None:
+            self.ax.set_xticks(xticks)
+        _set_limits(self.ax, x_limit, y_limit)
+        for text, label in zip(self.legend.get_texts(), labels):
+            text.set_text(label)
+        return self.fig
+
+
+class SpectraFigure(object):
+    """
+    :description: 荧光强度-波长曲线的绘图模板, 波长轴与曲线条数相同的数据共用一个模板
+    """
+    def __init__(self, title, x_label, y_label, wave_length, line_num):
+        self.fig, ax = Render.figure()
+        self.ax = ax
+        x = wave_length
+        _x = np.arange(len(x))
+        self.lines = [ax.plot(_x, np.zeros(len(x)))[0] for _ in range(line_num)]
+
+        _xtick_labels = [i for i in range(int(x[0]), int(x[len(x) - 1]) + 1)]
+        intervals = int((x[len(x) - 1] - x[0]) / 10)
+        ax.set_xticks(_x[::intervals])
+        ax.set_xticklabels(_xtick_labels[::intervals])
+        ax.set_title(title, fontdict={"family": "Microsoft YaHei", "size": 22})
+
+        ax.minorticks_on()
+        ax.tick_params(direction='out', left=False, right=False, width=1, length=6, labelsize=22)
+        ax.tick_params(which='minor', direction='out', left=False, right=False, width=1, length=3)
+        ax.set_xlabel(x_label, fontdict={"family": "Microsoft YaHei"}, size=22)
+        ax.set_ylabel(y_label, fontdict={"family": "Microsoft YaHei"}, size=22)
+
+        ax.xaxis.set_ticks_position('bottom')
+        ax.spines['bottom'].set_position(('data', 0))
+        ax.spines['bottom'].set_linewidth(1.5)  # 设置底部坐标轴的粗细
+        ax.spines['left'].set_linewidth(1.5)  # 设置左边坐标轴的粗细
+        ax.spines['right'].set_linewidth(1.5)  # 设置右边坐标轴的粗细
+        ax.spines['top'].set_linewidth(1.5)  # 设置上部坐标轴的粗细
+        self.legend = ax.legend(self.lines, [" "] * line_num, loc=0, edgecolor='#000000', prop={'size': 20})
+
+    def update(self, intensity, labels, y_limit):
+        """
+        :param intensity: 荧光强度矩阵(波长 × 曲线)
+        :param labels: 图例文字
+        """
+        for i, line in enumerate(self.lines):
+            line.set_ydata(intensity[:, i])
+        self.ax.set_ylim(y_limit[0], y_limit[1])
+        for text, label in zip(self.legend.get_texts(), labels):
+            text.set_text(label)
+        return self.fig
+
+
+def _spectra_axes(ax, title, x_label, y_label):
+    # 光谱集合图与热图共用的坐标轴样式
+    ax.set_title(title, fontdict={"family": "Microsoft YaHei", "size": 22})
+    ax.minorticks_on()
+    ax.tick_params(direction='out', width=1, length=6, labelsize=22)
+    ax.tick_params(which='minor', direction='out', width=1, length=3)
+    ax.set_xlabel(x_label, fontdict={"family": "Microsoft YaHei"}, size=22)
+    ax.set_ylabel(y_label, fontdict={"family": "Microsoft YaHei"}, size=22)
+    for side in ('bottom', 'left', 'right', 'top'):
+        ax.spines[side].set_linewidth(1.5)
+
+
+class SpectraCollectionFigure(object):
+    """
+    :description: 大量荧光强度-波长曲线的绘图模板: 全部曲线为一个LineCollection, 颜色按浓度或时间映射, 以色条代替逐条图例
+    """
+    def __init__(self, title, x_label, y_label, value_label, cmap):
+        self.fig, ax = Render.figure()
+        self.ax = ax
+        _spectra_axes(ax, title, x_label, y_label)
+        self.lines = LineCollection([], cmap=cmap, linewidths=1)
+        ax.add_collection(self.lines)
+        self.colorbar = self.fig.colorbar(self.lines, ax=ax)
+        self.colorbar.set_label(value_label, fontdict={"family": "Microsoft YaHei"}, size=22)
+        self.colorbar.ax.tick_params(labelsize=18)
+
+    def update(self, wave_length, intensity, values, y_limit):
+        """
+        :param wave_length: 波长
+        :param intensity: 荧光强度矩阵(波长 × 曲线)
+        :param values: 每条曲线对应的浓度或时间, 决定曲线颜色
+        """
+        segments = np.empty((intensity.shape[1], intensity.shape[0], 2))
+        segments[:, :, 0] = wave_length
+        segments[:, :, 1] = intensity.T
+        self.lines.set_segments(segments)
+        values = np.asarray(values, dtype=np.double)
+        self.lines.set_array(values)
+        self.lines.set_clim(values.min(), values.max())
+        self.ax.set_xlim(wave_length[0], wave_length[len(wave_length) - 1])
+        self.ax.set_ylim(y_limit[0], y_limit[1])
+        return self.fig
+
+
+class SpectraHeatmapFigure(object):
+    """
+    :description: 波长 × 样品的荧光强度热图模板, 每行为一个样品(按浓度或时间排列)
+    """
+    def __init__(self, title, x_label, value_label, color_label, cmap):
+        self.fig, ax = Render.figure()
+        self.ax = ax
+        _spectra_axes(ax, title, x_label, value_label)
+        self.image = ax.imshow(np.zeros((1, 1)), aspect="auto", origin="lower", interpolation="nearest", cmap=cmap)
+        self.colorbar = self.fig.colorbar(self.image, ax=ax)
+        self.colorbar.set_label(color_label, fontdict={"family": "Microsoft YaHei"}, size=22)
+        self.colorbar.ax.tick_params(labelsize=18)
+
+    def update(self, wave_length, intensity, values, c_limit=None):
+        """
+        :param intensity: 荧光强度矩阵(波长 × 样品)
+        :param values: 每个样品对应的浓度或时间, 作为纵轴刻度
+        :param c_limit: 颜色范围, 为None时取数据范围
+        """
+        step = (wave_length[len(wave_length) - 1] - wave_length[0]) / max(len(wave_length) - 1, 1)
+        self.image.set_data(intensity.T)
+        self.image.set_extent((wave_length[0] - step / 2, wave_length[len(wave_length) - 1] + step / 2,
+                               -0.5, intensity.shape[1] - 0.5))
+        if c_limit is None:
+            c_limit = (np.nanmin(intensity), np.nanmax(intensity))
+        self.image.set_clim(c_limit[0], c_limit[1])
+        # 样品较多时只标注约10个刻度
+        ticks = np.arange(0, len(values), max(1, len(values) // 10))
+        self.ax.set_yticks(ticks)
+        self.ax.set_yticklabels(["%g" % values[i] for i in ticks])
+        self.ax.minorticks_off()
+        return self.fig
+
+
 class Microplastic(object):
-    # 实例化一个线性拟合转换器
-    line_model = LinearRegression()
     title_carboxyl_sc = {"English": "The fluorescence intensity/concentration standard curve of PS-COOH",
                    "Chinese": "PS-COOH的荧光强度-浓度标准曲线"}
     title_carboxyl_lc = {"English": "The fluorescence intensity/concentration linearity curve of PS-COOH",
@@ -37,172 +514,125 @@ class Microplastic(object):
     x_label_sc = {"English": "Wave length(nm)", "Chinese": "波长(nm)"}
     y_label_sc = {"English": "Fluorescence intensity", "Chinese": "荧光强度(10$^{4}$)"}
     x_label_lc = {"English": "Concentration(mg/L)", "Chinese": "浓度(mg/L)"}
+    # 光谱集合图与热图中颜色/纵轴对应的量
+    value_label = {"concentration": {"English": "Concentration(mg/L)", "Chinese": "浓度(mg/L)"},
+                   "time": {"English": "t(min)", "Chinese": "时间(min)"}}
     y_label_lc = {"English": "Fluorescence intensity", "Chinese": "荧光强度(10$^{4}$)"}
 
     # line_style = ['solid', (0, (5, 10)), (0, (1, 10)), (0, (3, 5, 1, 5)), (0, (3, 5, 1, 5, 1, 5)), 'dashed', 'dotted']
 
     @classmethod
-    def plot_fic_sc(cls, deal_data, line_num, kind, key, legend_labels, y_limit, save=None):
-        print(strftime("start --> %Y-%m-%d %H:%M:%S", localtime()))
-        with plt.style.context(['science', 'nature', 'no-latex']):
-            fig = plt.figure(figsize=(12, 10), dpi=180)
-            x = deal_data.iloc[::, 0]
-            _x = [i for i in range(len(x))]
-            line_list = []
-
-            i = 0
-            while i < line_num:
-                if i == 0:
-                    i += 1
-                    continue
-                y = deal_data.iloc[::, i]
-                # if i < len(cls.line_style) + 1:
-                #     line = plt.plot(_x, y / 10000, ls=cls.line_style[i - 1])
-                # else:
-                line = plt.plot(_x, y / 10000)
-
-                line_list.append(line)
-                i += 1
-
-            _xtick_labels = [i for i in range(int(x[0]), int(x[len(x) - 1]) + 1)]
-            intervals = (x[len(x) - 1] - x[0]) / 10
-            plt.xticks(_x[::int(intervals)], _xtick_labels[::int(intervals)])
-            if kind == "amino":
-                plt.title(cls.title_list[1][key], fontdict={"family": "Microsoft YaHei", "size": 22})
-            elif kind == "carboxyl":
-                plt.title(cls.title_list[0][key], fontdict={"family": "Microsoft YaHei", "size": 22})
-            elif kind == "null":
-                plt.title(cls.title_list[4][key], fontdict={"family": "Microsoft YaHei", "size": 22})
-            else:
-                print("请输入正确信息！")
-                return
-
-            plt.minorticks_on()
-            plt.tick_params(direction='out', left=False, right=False, width=1, length=6, labelsize=22)
-            plt.tick_params(which='minor', direction='out', left=False, right=False, width=1, length=3)
-            plt.xlabel(cls.x_label_sc[key], fontdict={"family": "Microsoft YaHei"}, size=22)
-            plt.ylabel(cls.y_label_sc[key], fontdict={"family": "Microsoft YaHei"}, size=22)
-
-            ax = plt.gca()  # 获得坐标轴的句柄
-            ax.xaxis.set_ticks_position('bottom')
-            ax.spines['bottom'].set_position(('data', 0))
-
-            ax.spines['bottom'].set_linewidth(1.5)  # 设置底部坐标轴的粗细
-            ax.spines['left'].set_linewidth(1.5)  # 设置左边坐标轴的粗细
-            ax.spines['right'].set_linewidth(1.5)  # 设置右边坐标轴的粗细
-            ax.spines['top'].set_linewidth(1.5)  # 设置上部坐标轴的粗细
-
-            plt.ylim(y_limit[0], y_limit[1])
-
-            plt.legend(line_list, labels=legend_labels, loc=0, edgecolor='#000000', prop={'size': 20})
+    def plot_fic_sc(cls, deal_data, line_num, kind, key, legend_labels, y_limit, save=None, mode="legend", values=None,
+                    value_kind="concentration"):
+        """
+        :description: 荧光强度-波长曲线; mode为"legend"时每条曲线一个图例, 为"collection"或"heatmap"时交给plot_spectra
+        :param values: mode不为"legend"时每条曲线对应的浓度或时间
+        """
+        titles = {"carboxyl": cls.title_list[0], "amino": cls.title_list[1], "null": cls.title_list[4]}
+        if kind not in titles:
+            print("请输入正确信息！")
+            return
+        if mode != "legend":
+            return cls.plot_spectra(deal_data.iloc[::, 0].to_numpy(dtype=np.double),
+                                    deal_data.iloc[::, 1:line_num].to_numpy(dtype=np.double), values, kind, key,
+                                    mode, value_kind, y_limit, save)
+        with Timing.span("render/fic_sc", "render"), plt.style.context(['science', 'nature', 'no-latex']):
+            x = deal_data.iloc[::, 0].to_numpy(dtype=np.double)
+            # 波长轴与曲线条数相同时复用同一个模板, 只更新曲线数据与图例
+            template = Render.template(
+                ("fic_sc", kind, key, x[0], x[len(x) - 1], len(x), line_num),
+                lambda: SpectraFigure(titles[kind][key], cls.x_label_sc[key], cls.y_label_sc[key], x, line_num - 1))
+            # if i < len(cls.line_style) + 1:
+            #     line = plt.plot(_x, y / 10000, ls=cls.line_style[i - 1])
+            fig = template.update(deal_data.iloc[::, 1:line_num].to_numpy(dtype=np.double) / 10000,
+                                  legend_labels, y_limit)
+            Render.finish(fig, save)
 
-            # 选择是否要保存图片以及格式(jpg/png/svg)
-            if save is None:
-                pass
+    @classmethod
+    def plot_spectra(cls, wave_length, intensity, values, kind, key, mode="collection", value_kind="concentration",
+                     y_limit=None, save=None, cmap="viridis"):
+        """
+        :description: 直接以光谱矩阵绘制大量荧光强度-波长曲线(如一次动力学实验的全部扫描)
+        :param wave_length: 波长
+        :param intensity: 扣除空白后的荧光强度矩阵(波长 × 样品), 如SpectralMatrix.intensity
+        :param values: 每个样品对应的浓度或时间
+        :param mode: "collection"为一个LineCollection、颜色按values映射; "heatmap"为波长 × 样品的热图
+        :param value_kind: values的含义, "concentration"或"time"
+        :param y_limit: collection模式下的纵轴范围、heatmap模式下的颜色范围(10⁴为单位), 为None时取数据范围
+        """
+        titles = {"carboxyl": cls.title_list[0], "amino": cls.title_list[1], "null": cls.title_list[4]}
+        if kind not in titles or mode not in ("collection", "heatmap") or value_kind not in cls.value_label:
+            print("请输入正确信息！")
+            return
+        wave_length = np.asarray(wave_length, dtype=np.double)
+        intensity = np.asarray(intensity, dtype=np.double) / 10000
+        values = np.arange(intensity.shape[1]) if values is None else np.asarray(values, dtype=np.double)
+        if intensity.shape != (len(wave_length), len(values)):
+            raise ValueError("荧光强度矩阵的形状%s与波长(%d)、样品数(%d)不一致"
+                             % (intensity.shape, len(wave_length), len(values)))
+        value_label = cls.value_label[value_kind][key]
+        with Timing.span("render/spectra_%s" % mode, "render", lines=len(values)), \
+                plt.style.context(['science', 'nature', 'no-latex']):
+            if mode == "collection":
+                if y_limit is None:
+                    y_limit = [min(0.0, float(np.nanmin(intensity))), float(np.nanmax(intensity)) * 1.1]
+                template = Render.template(
+                    ("spectra_collection", kind, key, value_kind, cmap),
+                    lambda: SpectraCollectionFigure(titles[kind][key], cls.x_label_sc[key], cls.y_label_sc[key],
+                                                    value_label, cmap))
+                fig = template.update(wave_length, intensity, values, y_limit)
             else:
-                plt.savefig(save)
-
-            plt.show()
-        print(strftime("end --> %Y-%m-%d %H:%M:%S", localtime()))
-        print("-------------------------------------------------------------")
+                template = Render.template(
+                    ("spectra_heatmap", kind, key, value_kind, cmap),
+                    lambda: SpectraHeatmapFigure(titles[kind][key], cls.x_label_sc[key], value_label,
+                                                 cls.y_label_sc[key], cmap))
+                fig = template.update(wave_length, intensity, values, y_limit)
+            Render.finish(fig, save)
 
     @classmethod
-    def plot_fic_lc(cls, deal_data, excitation_wave_length, dot_num, xtick, kind, key, x_limit, y_limit, save=None):
-        print(strftime("start --> %Y-%m-%d %H:%M:%S", localtime()))
-        with plt.style.context(['science', 'nature', 'no-latex']):
-            fig = plt.figure(figsize=(12, 10), dpi=180)
-
+    def plot_fic_lc(cls, deal_data, excitation_wave_length, dot_num, xtick, kind, key, x_limit, y_limit, save=None,
+                    ci=False):
+        """
+        :description: 荧光强度-浓度拟合直线图
+        :param ci: 为True(或重抽样次数)时同时计算斜率与截距的bootstrap置信区间
+        :return: (斜率a, 截距b), ci不为False时为(a, b, fitting.Bootstrap)
+        """
+        titles = {"carboxyl": cls.title_list[2], "amino": cls.title_list[3], "null": cls.title_list[5]}
+        if kind not in titles:
+            print("请输入正确信息！")
+            return
+        with Timing.span("render/fic_lc", "render"), plt.style.context(['science', 'nature', 'no-latex']):
             x_dot = xtick
-            wave_length = list(deal_data.iloc[::, 0])
-            y = []
-            y0 = []
-
-            for value in wave_length:
-                if value == excitation_wave_length:
-                    index_value = wave_length.index(value)
-                    i = 0
-                    while i < dot_num:
-                        if i == 0:
-                            i += 1
-                            continue
-                        y.append(deal_data.iloc[index_value, i])
-                        y0.append(deal_data.iloc[index_value, i] / 10000)
-                        i += 1
-                    break
-
-            # 调整将要传入线性转换器中的参数的数据类型
-            x_arr = np.array(x_dot).reshape(len(x_dot), 1)
-            y_arr = np.array(y).reshape(len(y), 1)
-            y0_arr = np.array(y0).reshape(len(y0), 1)
-
-            # 进行线性拟合并将拟合曲线条件下的y值求出
-            cls.line_model.fit(x_arr, y_arr)
-            y_predict = cls.line_model.predict(x_arr)
-            a1 = cls.line_model.coef_[0][0]
-            b = cls.line_model.intercept_[0]
-
-            cls.line_model.fit(x_arr, y0_arr)
-            y0_predict = cls.line_model.predict(x_arr)
-
-            function_str = ""
-            if b < 0:
-                function_str = "y = %.4fx - %.4f" % (a1, -b)
-            elif b > 0:
-                function_str = "y = %.4fx + %.4f" % (a1, b)
-
-            R_square = r2_score(y_arr, y_predict)
-            r2_str = "R$^{2}$ = %.4f" % (R_square)
-
-            plt.scatter(x_dot, y0, marker='s', s=80, facecolor='none', edgecolor='#0000FF')
-
-            y_function = plt.plot(x_arr, y0_predict, c="#FF7F50")
-            y_r2 = plt.plot(0, 0, c="white")
-
-            if kind == "amino":
-                plt.title(cls.title_list[3][key], fontdict={"family": "Microsoft YaHei", "size": 22})
-            elif kind == "carboxyl":
-                plt.title(cls.title_list[2][key], fontdict={"family": "Microsoft YaHei", "size": 22})
-            elif kind == "null":
-                plt.title(cls.title_list[5][key], fontdict={"family": "Microsoft YaHei", "size": 22})
-            else:
-                print("请输入正确信息！")
-                return
-
-            _x_ticks = [i for i in x_dot]
-            plt.xticks(_x_ticks)
-
-            plt.tick_params(direction='in', left=False, width=1, length=6, labelsize=22)
-
-            plt.ylabel(cls.y_label_lc[key], fontdict={"family": "Microsoft YaHei", "size": 22})
-            plt.xlabel(cls.x_label_lc[key], fontdict={"family": "Microsoft YaHei"}, size=22)
-            ax = plt.gca()  # 获得坐标轴的句柄
-            ax.xaxis.set_ticks_position('bottom')
-            ax.yaxis.set_ticks_position('left')
-            ax.spines['bottom'].set_position(('data', y_limit[0]))
-            ax.spines['left'].set_position(('data', x_limit[0]))
-
-            ax.spines['bottom'].set_linewidth(1.5)  # 设置底部坐标轴的粗细
-            ax.spines['left'].set_linewidth(1.5)  # 设置左边坐标轴的粗细
-            ax.spines['right'].set_linewidth(1.5)  # 设置右边坐标轴的粗细
-            ax.spines['top'].set_linewidth(1.5)  # 设置上部坐标轴的粗细
-
-            plt.xlim(x_limit[0], x_limit[1])
-            plt.ylim(y_limit[0], y_limit[1])
-            plt.tick_params(direction='in', left=False, width=1, length=6, labelsize=22)
+            # 波长列是升序的, 用二分查找激发波长所在的行
+            wave_length = deal_data.iloc[::, 0].to_numpy(dtype=np.double)
+            index_value = int(np.searchsorted(wave_length, excitation_wave_length))
+            if index_value == len(wave_length) or abs(wave_length[index_value] - excitation_wave_length) > 1e-6:
+                raise ValueError("激发波长%s不在光谱数据中" % excitation_wave_length)
+            y = deal_data.iloc[index_value, 1:dot_num].to_numpy(dtype=np.double)
+            x_arr = np.asarray(x_dot, dtype=np.double)
+
+            # 进行线性拟合, 图中的荧光强度以10⁴为单位, 拟合直线同比例缩放即可, 不必重新拟合
+            with Timing.span("calibration_fit", "fit", points=len(x_arr)):
+                fit = linear_fit(x_arr, y)
+            a1 = float(fit.slope)
+            b = float(fit.intercept)
+            y0 = y / 10000
+            y0_predict = fit.predict(x_arr) / 10000
+
+            function_str = fit.function_str()
+            r2_str = "R$^{2}$ = %.4f" % (fit.r2)
+            interval = _confidence(None, x_arr, y, ci)
+
+            template = Render.template(
+                ("fic_lc", kind, key),
+                lambda: FitFigure(titles[kind][key], cls.x_label_lc[key], cls.y_label_lc[key],
+                                  {"direction": 'in', "left": False, "width": 1, "length": 6, "labelsize": 22},
+                                  legend_kind=False))
             # 设置图例标签labels
-            plt.legend([y_function, y_r2], labels=[function_str, r2_str],
-                       loc=0, edgecolor='black', prop={'size': 20})
-
-            # 选择是否要保存图片以及格式(jpg/png/svg)
-            if save is None:
-                pass
-            else:
-                plt.savefig(save)
-
-            plt.show()
-        print(strftime("end --> %Y-%m-%d %H:%M:%S", localtime()))
-        print("-------------------------------------------------------------")
-        return a1, b
+            fig = template.update(x_dot, y0, x_arr, y0_predict, [function_str, r2_str], x_limit, y_limit,
+                                  xticks=[i for i in x_dot])
+            Render.finish(fig, save)
+        return (a1, b) if interval is None else (a1, b, interval)
 
 
 class Kinetics(object):
@@ -225,230 +655,111 @@ class Kinetics(object):
                          "Chinese": "CNF-AG去除PSNPs的动力学粒子内扩散拟合数据曲线"}
     title_null_s = {"English": "Experimental data and calculated PSO curves of CNF-AG for PSNPs removal",
                          "Chinese": "CNF-AG去除PSNPs的动力学二阶拟合数据曲线"}
+    title_carboxyl_e = {"English": "Experimental data and calculated Elovich curves of CNF-AG for PSNPs(-) removal",
+                        "Chinese": "CNF-AG去除PSNPs(-)的动力学Elovich拟合数据曲线"}
+    title_amino_e = {"English": "Experimental data and calculated Elovich curves of CNF-AG for PSNPs(+) removal",
+                     "Chinese": "CNF-AG去除PSNPs(+)的动力学Elovich拟合数据曲线"}
+    title_null_e = {"English": "Experimental data and calculated Elovich curves of CNF-AG for PSNPs removal",
+                    "Chinese": "CNF-AG去除PSNPs的动力学Elovich拟合数据曲线"}
     title_list = [title_null_f, title_carboxyl_f, title_amino_f,
                   title_null_s, title_carboxyl_s, title_amino_s,
-                  title_null_ipd, title_carboxyl_ipd, title_amino_ipd]
+                  title_null_ipd, title_carboxyl_ipd, title_amino_ipd,
+                  title_null_e, title_carboxyl_e, title_amino_e]
     x_label_fs = ["t(min)"]
     y_label_fs = ["ln(q$_{e}$ - q$_{t}$)", "t/q$_{t}$"]
     x_label_ipd = ["t$^{1/2}$(min)"]
     y_label_ipd = ["q$_{t}$"]
-
-    # 实例化一个线性拟合转换器
-    line_model = LinearRegression()
+    y_label_e = ["q$_{t}$(mg/g)"]
 
     @classmethod
-    def kinetics_pfo(cls, t, qt, kind, order, key, x_limit, y_limit, save=None):
-        print(strftime("start --> %Y-%m-%d %H:%M:%S", localtime()))
-        with plt.style.context(['science', 'nature', 'no-latex']):
-            fig = plt.figure(figsize=(12, 10), dpi=180)
-            # 调整将要传入线性转换器中的参数的数据类型
-            t_arr = np.array(t).reshape(len(t), 1)
-            qt_arr = np.array(qt).reshape(len(qt), 1)
-
+    def _linear_plot(cls, name, title_index, x_label, y_label, t, y, kind, key, x_limit, y_limit, save=None,
+                     ci=False, fit=None):
+        # 一阶/二阶/粒子内扩散模型共用: 线性拟合后在同一种模板上更新数据, 返回拟合结果LinearFit;
+        # ci不为False时返回(LinearFit, 斜率与截距的fitting.Bootstrap);
+        # fit为已有的拟合结果(如增量更新的LinearStats.fit())时直接绘制, 不再拟合;
+        # 有效数据点少于MIN_LINEAR_POINTS个(如PFO中qt >= qe的点被跳过)时不绘制, 返回None
+        kinds = {"null": 0, "carboxyl": 1, "amino": 2}
+        if kind not in kinds:
+            print("请输入正确信息！")
+            return
+        points = int(np.sum(np.isfinite(np.asarray(t, dtype=np.double)) & np.isfinite(np.asarray(y, dtype=np.double))))
+        if points < MIN_LINEAR_POINTS:
+            print("%s的有效数据点只有%d个(至少需要%d个), 不绘制拟合直线" % (name, points, MIN_LINEAR_POINTS))
+            return
+        with Timing.span("render/%s" % name, "render"), plt.style.context(['science', 'nature', 'no-latex']):
             # 进行线性拟合并将拟合曲线条件下的y值求出
-            cls.line_model.fit(t_arr, qt_arr)
-            y_predict = cls.line_model.predict(t_arr)
-            a1 = cls.line_model.coef_[0][0]
-            b = cls.line_model.intercept_[0]
-            function_str = ""
-            if b < 0:
-                function_str = "y = %.4fx - %.4f" % (a1, -b)
-            elif b > 0:
-                function_str = "y = %.4fx + %.4f" % (a1, b)
-
-            R_square = r2_score(qt_arr, y_predict)
-            r2_str = "R$^{2}$ = %.4f" % (R_square)
-
-            line1 = plt.scatter(t, qt, s=80, marker='s', facecolor='none', edgecolor='#0000FF')
-
-            line2 = plt.plot(t_arr, y_predict, c="#FF7F50")
-            y_r2 = plt.plot(0, 0, c="white")
-
-            if kind == "null":
-                plt.title(cls.title_list[0][key], fontdict={"family": "Microsoft YaHei", "size": 22})
-            elif kind == "carboxyl":
-                plt.title(cls.title_list[1][key], fontdict={"family": "Microsoft YaHei", "size": 22})
-            elif kind == "amino":
-                plt.title(cls.title_list[2][key], fontdict={"family": "Microsoft YaHei", "size": 22})
-            else:
-                print("请输入正确信息！")
-                return
-
-            plt.tick_params(direction='in', width=1, length=6, labelsize=22)
-            _x_ticks = [i for i in t]
-            plt.xticks(_x_ticks)
-            plt.xlabel(cls.x_label_fs[0], fontdict={"family": "Microsoft YaHei", "size": 22})
-            plt.ylabel(cls.y_label_fs[order - 1], fontdict={"family": "Microsoft YaHei", "size": 22})
-
-            ax = plt.gca()  # 获得坐标轴的句柄
-            ax.xaxis.set_ticks_position('bottom')
-            ax.yaxis.set_ticks_position('left')
-            ax.spines['bottom'].set_position(('data', y_limit[0]))
-            ax.spines['left'].set_position(('data', x_limit[0]))
-
-            ax.spines['bottom'].set_linewidth(1.5)  # 设置底部坐标轴的粗细
-            ax.spines['left'].set_linewidth(1.5)  # 设置左边坐标轴的粗细
-            ax.spines['right'].set_linewidth(1.5)  # 设置右边坐标轴的粗细
-            ax.spines['top'].set_linewidth(1.5)  # 设置上部坐标轴的粗细
-
-            plt.xlim(x_limit[0], x_limit[1])
-            plt.ylim(y_limit[0], y_limit[1])
-
-            plt.legend([line2, y_r2, line1], labels=[function_str, r2_str, kind],
-                       loc=0, edgecolor='black', prop={'size': 20})
-            # 选择是否要保存图片以及格式(jpg/png/svg)
-            if save is None:
-                pass
-            else:
-                plt.savefig(save)
-
-            plt.show()
-        print(strftime("end --> %Y-%m-%d %H:%M:%S", localtime()))
-        print("-------------------------------------------------------------")
+            t_arr = np.asarray(t, dtype=np.double)
+            if fit is None:
+                with Timing.span("kinetics_fit", "fit", model=name, points=len(t_arr)):
+                    fit = linear_fit(t_arr, y)
+            y_predict = fit.predict(t_arr)
+
+            function_str = fit.function_str()
+            r2_str = "R$^{2}$ = %.4f" % (fit.r2)
+            interval = _confidence(None, t_arr, y, ci)
+
+            title = cls.title_list[title_index + kinds[kind]][key]
+            template = Render.template(
+                (name, kind, key, y_label),
+                lambda: FitFigure(title, x_label, y_label,
+                                  {"direction": 'in', "width": 1, "length": 6, "labelsize": 22}))
+            fig = template.update(t, y, t_arr, y_predict, [function_str, r2_str, kind], x_limit, y_limit,
+                                  xticks=[i for i in t])
+            Render.finish(fig, save)
+        return fit if interval is None else (fit, interval)
 
     @classmethod
-    def kinetics_pso(cls, t, y, kind, order, key, x_limit, y_limit, save=None):
-        print(strftime("start --> %Y-%m-%d %H:%M:%S", localtime()))
-        with plt.style.context(['science', 'nature', 'no-latex']):
-            fig = plt.figure(figsize=(12, 10), dpi=180)
-            # 调整将要传入线性转换器中的参数的数据类型
-            t_arr = np.array(t).reshape(len(t), 1)
-            qt_arr = np.array(y).reshape(len(y), 1)
-
-            # 进行线性拟合并将拟合曲线条件下的y值求出
-            cls.line_model.fit(t_arr, qt_arr)
-            y_predict = cls.line_model.predict(t_arr)
-            a1 = cls.line_model.coef_[0][0]
-            b = cls.line_model.intercept_[0]
-            function_str = ""
-            if b < 0:
-                function_str = "y = %.4fx - %.4f" % (a1, -b)
-            elif b > 0:
-                function_str = "y = %.4fx + %.4f" % (a1, b)
-
-            R_square = r2_score(qt_arr, y_predict)
-            r2_str = "R$^{2}$ = %.4f" % (R_square)
-
-            line1 = plt.scatter(t, y, s=80, marker='s', facecolor='none', edgecolor='#0000FF')
-
-            line2 = plt.plot(t_arr, y_predict, c="#FF7F50")
-            y_r2 = plt.plot(0, 0, c="white")
-
-            if kind == "null":
-                plt.title(cls.title_list[3][key], fontdict={"family": "Microsoft YaHei", "size": 22})
-            elif kind == "carboxyl":
-                plt.title(cls.title_list[4][key], fontdict={"family": "Microsoft YaHei", "size": 22})
-            elif kind == "amino":
-                plt.title(cls.title_list[5][key], fontdict={"family": "Microsoft YaHei", "size": 22})
-            else:
-                print("请输入正确信息！")
-                return
-
-            plt.tick_params(direction='in', width=1, length=6, labelsize=22)
-            _x_ticks = [i for i in t]
-            plt.xticks(_x_ticks)
-            plt.xlabel(cls.x_label_fs[0], fontdict={"family": "Microsoft YaHei", "size": 22})
-            plt.ylabel(cls.y_label_fs[order - 1], fontdict={"family": "Microsoft YaHei", "size": 22})
-
-            ax = plt.gca()  # 获得坐标轴的句柄
-            ax.xaxis.set_ticks_position('bottom')
-            ax.yaxis.set_ticks_position('left')
-            ax.spines['bottom'].set_position(('data', y_limit[0]))
-            ax.spines['left'].set_position(('data', x_limit[0]))
-
-            ax.spines['bottom'].set_linewidth(1.5)  # 设置底部坐标轴的粗细
-            ax.spines['left'].set_linewidth(1.5)  # 设置左边坐标轴的粗细
-            ax.spines['right'].set_linewidth(1.5)  # 设置右边坐标轴的粗细
-            ax.spines['top'].set_linewidth(1.5)  # 设置上部坐标轴的粗细
-
-            plt.xlim(x_limit[0], x_limit[1])
-            plt.ylim(y_limit[0], y_limit[1])
-
-            plt.legend([line2, y_r2, line1], labels=[function_str, r2_str, kind],
-                       loc=0, edgecolor='black', prop={'size': 20})
-            # 选择是否要保存图片以及格式(jpg/png/svg)
-            if save is None:
-                pass
-            else:
-                plt.savefig(save)
-
-            plt.show()
-        print(strftime("end --> %Y-%m-%d %H:%M:%S", localtime()))
-        print("-------------------------------------------------------------")
+    def kinetics_pfo(cls, t, qt, kind, order, key, x_limit, y_limit, save=None, ci=False, fit=None):
+        return cls._linear_plot("pfo", 0, cls.x_label_fs[0], cls.y_label_fs[order - 1], t, qt, kind, key,
+                                 x_limit, y_limit, save, ci, fit)
 
     @classmethod
-    def kinetics_ipd(cls, t, y, kind, key, x_limit, y_limit, save=None):
-        print(strftime("start --> %Y-%m-%d %H:%M:%S", localtime()))
-        with plt.style.context(['science', 'nature', 'no-latex']):
-            fig = plt.figure(figsize=(12, 10), dpi=180)
-            # 调整将要传入线性转换器中的参数的数据类型
-            t_arr = np.array(t).reshape(len(t), 1)
-            qt_arr = np.array(y).reshape(len(y), 1)
-
-            # 进行线性拟合并将拟合曲线条件下的y值求出
-            cls.line_model.fit(t_arr, qt_arr)
-            y_predict = cls.line_model.predict(t_arr)
-            a1 = cls.line_model.coef_[0][0]
-            b = cls.line_model.intercept_[0]
-            function_str = ""
-            if b < 0:
-                function_str = "y = %.4fx - %.4f" % (a1, -b)
-            elif b > 0:
-                function_str = "y = %.4fx + %.4f" % (a1, b)
-
-            R_square = r2_score(qt_arr, y_predict)
-            r2_str = "R$^{2}$ = %.4f" % (R_square)
-
-            line1 = plt.scatter(t, y, s=80, marker='s', facecolor='none', edgecolor='#0000FF')
-
-            line2 = plt.plot(t_arr, y_predict, c="#FF7F50")
-            y_r2 = plt.plot(0, 0, c="white")
-
-            if kind == "null":
-                plt.title(cls.title_list[6][key], fontdict={"family": "Microsoft YaHei", "size": 22})
-            elif kind == "carboxyl":
-                plt.title(cls.title_list[7][key], fontdict={"family": "Microsoft YaHei", "size": 22})
-            elif kind == "amino":
-                plt.title(cls.title_list[8][key], fontdict={"family": "Microsoft YaHei", "size": 22})
-            else:
-                print("请输入正确信息！")
-                return
-
-            plt.tick_params(direction='in', width=1, length=6, labelsize=22)
-            _x_ticks = [i for i in t]
-            plt.xticks(_x_ticks)
-            plt.xlabel(cls.x_label_ipd[0], fontdict={"family": "Microsoft YaHei", "size": 22})
-            plt.ylabel(cls.y_label_ipd[0], fontdict={"family": "Microsoft YaHei", "size": 22})
-
-            ax = plt.gca()  # 获得坐标轴的句柄
-            ax.xaxis.set_ticks_position('bottom')
-            ax.yaxis.set_ticks_position('left')
-            ax.spines['bottom'].set_position(('data', y_limit[0]))
-            ax.spines['left'].set_position(('data', x_limit[0]))
-
-            ax.spines['bottom'].set_linewidth(1.5)  # 设置底部坐标轴的粗细
-            ax.spines['left'].set_linewidth(1.5)  # 设置左边坐标轴的粗细
-            ax.spines['right'].set_linewidth(1.5)  # 设置右边坐标轴的粗细
-            ax.spines['top'].set_linewidth(1.5)  # 设置上部坐标轴的粗细
-
-            plt.xlim(x_limit[0], x_limit[1])
-            plt.ylim(y_limit[0], y_limit[1])
-
-            plt.legend([line2, y_r2, line1], labels=[function_str, r2_str, kind],
-                       loc=0, edgecolor='black', prop={'size': 20})
-            # 选择是否要保存图片以及格式(jpg/png/svg)
-            if save is None:
-                pass
-            else:
-                plt.savefig(save)
+    def kinetics_pso(cls, t, y, kind, order, key, x_limit, y_limit, save=None, ci=False, fit=None):
+        return cls._linear_plot("pso", 3, cls.x_label_fs[0], cls.y_label_fs[order - 1], t, y, kind, key,
+                                 x_limit, y_limit, save, ci, fit)
 
-            plt.show()
-        print(strftime("end --> %Y-%m-%d %H:%M:%S", localtime()))
-        print("-------------------------------------------------------------")
+    @classmethod
+    def kinetics_ipd(cls, t, y, kind, key, x_limit, y_limit, save=None, ci=False, fit=None):
+        return cls._linear_plot("ipd", 6, cls.x_label_ipd[0], cls.y_label_ipd[0], t, y, kind, key,
+                                 x_limit, y_limit, save, ci, fit)
 
     @classmethod
-    def kinetics_e(cls):
-        pass
+    def kinetics_e(cls, t, qt, kind, key, x_limit, y_limit, save=None, alpha_predict=None, beta_predict=None,
+                   ci=False):
+        """
+        :description: Elovich模型qt = ln(1 + αβt)/β的非线性拟合曲线, 初始参数为None时自动估计
+        :param t: 时间梯度(含0时刻)
+        :param qt: 吸附量, 与t对应
+        :param ci: 为True(或重抽样次数)时同时计算α、β的bootstrap置信区间
+        :return: (α, β), ci不为False时为(α, β, fitting.Bootstrap)
+        """
+        kinds = {"null": 0, "carboxyl": 1, "amino": 2}
+        if kind not in kinds:
+            print("请输入正确信息！")
+            return
+        with Timing.span("render/elovich", "render"), plt.style.context(['science', 'nature', 'no-latex']):
+            t_arr = np.asarray(t, dtype=np.double)
+            with Timing.span("kinetics_fit", "fit", model=ELOVICH.name, points=len(t_arr)):
+                fit = nonlinear_fit(ELOVICH, t_arr, qt,
+                                    p0=[np.nan if v is None else v for v in (alpha_predict, beta_predict)])
+            if not fit.converged:
+                print("elovich拟合未收敛(迭代%d次), 结果仅供参考" % fit.iterations)
+            function_str = "α = %.4f, β = %.4f" % (fit.params[0], fit.params[1])
+            r2_str = "R$^{2}$ = %.4f" % (fit.r2)
+            interval = _confidence(ELOVICH, t_arr, qt, ci)
+
+            title = cls.title_list[9 + kinds[kind]][key]
+            template = Render.template(
+                ("elovich", kind, key),
+                lambda: FitFigure(title, cls.x_label_fs[0], cls.y_label_e[0],
+                                  {"direction": 'in', "width": 1, "length": 6, "labelsize": 22}))
+            # 拟合曲线只在曲率大的地方加密采样
+            t_new, qt_predict = sample_curve(fit.predict, t_arr[0], t_arr[len(t_arr) - 1], x_limit, y_limit)
+            fig = template.update(t, qt, t_new, qt_predict, [function_str, r2_str, kind], x_limit, y_limit,
+                                  xticks=[i for i in t])
+            Render.finish(fig, save)
+        params = float(fit.params[0]), float(fit.params[1])
+        return params if interval is None else params + (interval,)
 
 
 
@@ -467,138 +778,86 @@ class Isotherm(object):
         "Chinese": "CNF-AG去除PSNPs的Langmuir拟合数据曲线"}
     title_null_f = {"English": "Experimental data and calculated Freundlich curves of CNF-AG for PSNPs removal",
         "Chinese": "CNF-AG去除PSNPs的Freundlich拟合数据曲线"}
+    title_carboxyl_dr = {"English": "Experimental data and calculated D-R curves of CNF-AG for PSNPs(-) removal",
+        "Chinese": "CNF-AG去除PSNPs(-)的D-R拟合数据曲线"}
+    title_amino_dr = {"English": "Experimental data and calculated D-R curves of CNF-AG for PSNPs(+) removal",
+        "Chinese": "CNF-AG去除PSNPs(+)的D-R拟合数据曲线"}
+    title_null_dr = {"English": "Experimental data and calculated D-R curves of CNF-AG for PSNPs removal",
+        "Chinese": "CNF-AG去除PSNPs的D-R拟合数据曲线"}
+    title_carboxyl_tk = {"English": "Experimental data and calculated Temkin curves of CNF-AG for PSNPs(-) removal",
+        "Chinese": "CNF-AG去除PSNPs(-)的Temkin拟合数据曲线"}
+    title_amino_tk = {"English": "Experimental data and calculated Temkin curves of CNF-AG for PSNPs(+) removal",
+        "Chinese": "CNF-AG去除PSNPs(+)的Temkin拟合数据曲线"}
+    title_null_tk = {"English": "Experimental data and calculated Temkin curves of CNF-AG for PSNPs removal",
+        "Chinese": "CNF-AG去除PSNPs的Temkin拟合数据曲线"}
     title_list = [title_carboxyl_l, title_amino_l, title_null_l,
-                  title_carboxyl_f, title_amino_f, title_null_f]
+                  title_carboxyl_f, title_amino_f, title_null_f,
+                  title_carboxyl_dr, title_amino_dr, title_null_dr,
+                  title_carboxyl_tk, title_amino_tk, title_null_tk]
     x_label_lf = ["C$_{e}$(mg/L)"]
     y_label_lf = ["q$_{e}$(mg/g)"]
 
     @classmethod
-    def isotherm_l(cls, c, sq, qm_predict, Ka_predict, kind, key, x_limit, y_limit, save=None):
-        print(strftime("start --> %Y-%m-%d %H:%M:%S", localtime()))
-        with plt.style.context(['science', 'nature', 'no-latex']):
-            fig = plt.figure(figsize=(12, 10), dpi=180)
-            ce = np.array(c)
-            s_quantity = np.array(sq)
-            popt, pv = op.curve_fit(langmuir, ce, s_quantity, p0=[qm_predict, Ka_predict])
-            function_str = "q$_{m}$ = %.4f, K$_{L}$ = %.4f" % (popt[0], popt[1])
-            y_predict = langmuir(ce, popt[0], popt[1])
-            ce_new = np.arange(c[0] - 0.9, c[len(c) - 1] + 0.9, 0.01)
-            y_predict_plot = langmuir(ce_new, popt[0], popt[1])
-            R_square = r2_score(s_quantity, y_predict)
-            print(R_square)
-            line1 = plt.scatter(c, sq, s=80, marker='s', facecolor='none', edgecolor='#0000FF')
-            line2 = plt.plot(ce_new, y_predict_plot, c="#FF7F50")
-            y_r2 = plt.plot(0, 0, c="white")
-
-            r2_score2_str = "R$^{2}$ = %.4f" % (R_square)
-
-            if kind == "null":
-                plt.title(cls.title_list[2][key], fontdict={"family": "Microsoft YaHei", "size": 22})
-            elif kind == "amino":
-                plt.title(cls.title_list[1][key], fontdict={"family": "Microsoft YaHei", "size": 22})
-            elif kind == "carboxyl":
-                plt.title(cls.title_list[0][key], fontdict={"family": "Microsoft YaHei", "size": 22})
-            else:
-                print("请输入正确信息！")
-                return
-
-            plt.tick_params(direction='in', width=1, length=6, labelsize=22)
-
-            plt.xlabel(cls.x_label_lf[0], fontdict={"family": "Microsoft YaHei", "size": 22})
-            plt.ylabel(cls.y_label_lf[0], fontdict={"family": "Microsoft YaHei", "size": 22})
-
-            ax = plt.gca()  # 获得坐标轴的句柄
-            ax.xaxis.set_ticks_position('bottom')
-            ax.yaxis.set_ticks_position('left')
-            ax.spines['bottom'].set_position(('data', y_limit[0]))
-            ax.spines['left'].set_position(('data', x_limit[0]))
-
-            ax.spines['bottom'].set_linewidth(1.5)  # 设置底部坐标轴的粗细
-            ax.spines['left'].set_linewidth(1.5)  # 设置左边坐标轴的粗细
-            ax.spines['right'].set_linewidth(1.5)  # 设置右边坐标轴的粗细
-            ax.spines['top'].set_linewidth(1.5)  # 设置上部坐标轴的粗细
-
-            plt.xlim(x_limit[0], x_limit[1])
-            plt.ylim(y_limit[0], y_limit[1])
-
-            plt.legend([line2, y_r2, line1], labels=[function_str, r2_score2_str, kind],
-                       loc=0, edgecolor='black', prop={'size': 20})
-            # 选择是否要保存图片以及格式(jpg/png/svg)
-            if save is None:
-                pass
-            else:
-                plt.savefig(save)
-
-            plt.show()
-        print(strftime("end --> %Y-%m-%d %H:%M:%S", localtime()))
-        print("-------------------------------------------------------------")
+    def _isotherm(cls, model, title_index, p0, function_fmt, c, sq, kind, key, x_limit, y_limit, save=None, ci=False):
+        """
+        :description: 各等温线模型共用: 非线性拟合后在同一种模板上更新实验数据与拟合曲线
+        :param model: fitting中的等温线模型
+        :param title_index: 该模型在title_list中的起始位置(carboxyl, amino, null依次排列)
+        :param p0: 初始参数, 为None的参数由线性化形式自动估计
+        :param function_fmt: 图例中显示拟合参数的格式
+        :param ci: 为True(或重抽样次数)时同时计算拟合参数的bootstrap置信区间
+        :return: 拟合参数, ci不为False时最后附加fitting.Bootstrap
+        """
+        kinds = {"carboxyl": 0, "amino": 1, "null": 2}
+        if kind not in kinds:
+            print("请输入正确信息！")
+            return
+        with Timing.span("render/%s" % model.name, "render"), plt.style.context(['science', 'nature', 'no-latex']):
+            ce = np.array(c, dtype=np.double)
+            s_quantity = np.array(sq, dtype=np.double)
+            with Timing.span("isotherm_fit", "fit", model=model.name, points=len(ce)):
+                fit = nonlinear_fit(model, ce, s_quantity, p0=[np.nan if v is None else v for v in p0])
+            if not fit.converged:
+                print("%s拟合未收敛(迭代%d次), 结果仅供参考" % (model.name, fit.iterations))
+            function_str = function_fmt % tuple(fit.params)
+            # 自适应采样拟合曲线, 模型在定义域之外(如Ce <= 0时的ln(Ce))为NaN, 绘图时自动跳过
+            ce_new, y_predict_plot = sample_curve(fit.predict, c[0] - 0.9, c[len(c) - 1] + 0.9, x_limit, y_limit)
+            print(fit.r2)
+            interval = _confidence(model, ce, s_quantity, ci)
+            r2_score2_str = "R$^{2}$ = %.4f" % (fit.r2)
+
+            title = cls.title_list[title_index + kinds[kind]][key]
+            template = Render.template(
+                (model.name, kind, key),
+                lambda: FitFigure(title, cls.x_label_lf[0], cls.y_label_lf[0],
+                                  {"direction": 'in', "width": 1, "length": 6, "labelsize": 22}))
+            fig = template.update(c, sq, ce_new, y_predict_plot, [function_str, r2_score2_str, kind], x_limit, y_limit)
+            Render.finish(fig, save)
+        params = tuple(float(v) for v in fit.params)
+        return params if interval is None else params + (interval,)
 
     @classmethod
-    def isotherm_f(cls, c, sq, n_predict, Ka_predict, kind, key, x_limit, y_limit, save=None):
-        print(strftime("start --> %Y-%m-%d %H:%M:%S", localtime()))
-        with plt.style.context(['science', 'nature', 'no-latex']):
-            fig = plt.figure(figsize=(12, 10), dpi=180)
-            ce = np.array(c)
-            s_quantity = np.array(sq)
-            popt, pv = op.curve_fit(freundlich, ce, s_quantity, p0=[n_predict, Ka_predict])
-            function_str = "n = %.4f, K$_{F}$ = %.4f" % (popt[0], popt[1])
-            y_predict = freundlich(ce, popt[0], popt[1])
-            ce_new = np.arange(c[0] - 0.9, c[len(c) - 1] + 0.9, 0.01)
-            y_predict_plot = freundlich(ce_new, popt[0], popt[1])
-            R_square = r2_score(s_quantity, y_predict)
-            print(R_square)
-            line1 = plt.scatter(c, sq, s=80, marker='s', facecolor='none', edgecolor='#0000FF')
-            line2 = plt.plot(ce_new, y_predict_plot, c="#FF7F50")
-            y_r2 = plt.plot(0, 0, c="white")
-
-            r2_score2_str = "R$^{2}$ = %.4f" % (R_square)
-
-            if kind == "null":
-                plt.title(cls.title_list[5][key], fontdict={"family": "Microsoft YaHei", "size": 22})
-            if kind == "amino":
-                plt.title(cls.title_list[4][key], fontdict={"family": "Microsoft YaHei", "size": 22})
-            elif kind == "carboxyl":
-                plt.title(cls.title_list[3][key], fontdict={"family": "Microsoft YaHei", "size": 22})
-            else:
-                print("请输入正确信息！")
-                return
-
-            plt.tick_params(direction='in', width=1, length=6, labelsize=22)
-
-            plt.xlabel(cls.x_label_lf[0], fontdict={"family": "Microsoft YaHei", "size": 22})
-            plt.ylabel(cls.y_label_lf[0], fontdict={"family": "Microsoft YaHei", "size": 22})
+    def isotherm_l(cls, c, sq, qm_predict, Ka_predict, kind, key, x_limit, y_limit, save=None, ci=False):
+        return cls._isotherm(LANGMUIR, 0, [qm_predict, Ka_predict], "q$_{m}$ = %.4f, K$_{L}$ = %.4f",
+                             c, sq, kind, key, x_limit, y_limit, save, ci)
 
-            ax = plt.gca()  # 获得坐标轴的句柄
-            ax.xaxis.set_ticks_position('bottom')
-            ax.yaxis.set_ticks_position('left')
-            ax.spines['bottom'].set_position(('data', y_limit[0]))
-            ax.spines['left'].set_position(('data', x_limit[0]))
-
-            ax.spines['bottom'].set_linewidth(1.5)  # 设置底部坐标轴的粗细
-            ax.spines['left'].set_linewidth(1.5)  # 设置左边坐标轴的粗细
-            ax.spines['right'].set_linewidth(1.5)  # 设置右边坐标轴的粗细
-            ax.spines['top'].set_linewidth(1.5)  # 设置上部坐标轴的粗细
-
-            plt.xlim(x_limit[0], x_limit[1])
-            plt.ylim(y_limit[0], y_limit[1])
-
-            plt.legend([line2, y_r2, line1], labels=[function_str, r2_score2_str, kind],
-                       loc=0, edgecolor='black', prop={'size': 20})
-            # 选择是否要保存图片以及格式(jpg/png/svg)
-            if save is None:
-                pass
-            else:
-                plt.savefig(save)
-
-            plt.show()
-        print(strftime("end --> %Y-%m-%d %H:%M:%S", localtime()))
-        print("-------------------------------------------------------------")
+    @classmethod
+    def isotherm_f(cls, c, sq, n_predict, Ka_predict, kind, key, x_limit, y_limit, save=None, ci=False):
+        return cls._isotherm(FREUNDLICH, 3, [n_predict, Ka_predict], "n = %.4f, K$_{F}$ = %.4f",
+                             c, sq, kind, key, x_limit, y_limit, save, ci)
 
-    def isotherm_dr(self):
-        pass
+    @classmethod
+    def isotherm_dr(cls, c, sq, qm_predict, K_predict, kind, key, x_limit, y_limit, save=None, temperature=298.15,
+                    ci=False):
+        # Dubinin-Radushkevich: qe = qm·exp(-K·ε²), ε = RT·ln(1 + 1/Ce), temperature为吸附温度(K)
+        return cls._isotherm(dubinin_radushkevich(temperature), 6, [qm_predict, K_predict],
+                             "q$_{m}$ = %.4f, K$_{DR}$ = %.4e", c, sq, kind, key, x_limit, y_limit, save, ci)
 
-    def isotherm_tk(self):
-        pass
+    @classmethod
+    def isotherm_tk(cls, c, sq, A_predict, B_predict, kind, key, x_limit, y_limit, save=None, ci=False):
+        # Temkin: qe = B·ln(A·Ce)
+        return cls._isotherm(TEMKIN, 9, [A_predict, B_predict], "A$_{T}$ = %.4f, B$_{T}$ = %.4f",
+                             c, sq, kind, key, x_limit, y_limit, save, ci)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,25 @@
+# This Python file uses the following encoding: utf-8
+"""
+相互独立的任务在进程池/线程池中并行执行, 结果按输入顺序返回; 并行数为None或1时在当前线程中按顺序执行
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+EXECUTORS = {"process": ProcessPoolExecutor, "thread": ThreadPoolExecutor}
+
+
+def map_jobs(func, jobs, workers=None, executor="process", chunksize=1):
+    """
+    :description: 对每个任务调用func, 相当于[func(job) for job in jobs]
+    :param func: 单参数函数; 使用进程池时func与任务须可被pickle(模块层定义的函数)
+    :param jobs: 任务列表
+    :param workers: 并行的进程/线程数, 为None或1时按顺序逐个执行
+    :param executor: "process"使用进程池, "thread"使用线程池
+    :param chunksize: 进程池每次分发给子进程的任务数
+    :return: 结果列表, 与jobs顺序一致
+    """
+    if executor not in EXECUTORS:
+        raise ValueError("executor只能为\"process\"或\"thread\"")
+    if workers is None or workers <= 1:
+        return [func(job) for job in jobs]
+    with EXECUTORS[executor](max_workers=workers) as pool:
+        return list(pool.map(func, jobs, chunksize=chunksize))
@@ -1,10 +1,17 @@
 # This Python file uses the following encoding: utf-8
+import logging
 import numpy as np
 from operation_model import Microplastic
 from operation_model import Kinetics
 from operation_model import Isotherm
-from data_treatment import Plastic, KineticsData, IsothermData
-from data_treatment import Adsorption
+from data_treatment import KineticsData, IsothermData
+from timing import Timing
+from dataset import SpectralDataset
+
+# 显示q(t)缓存命中情况等运行日志
+logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+# 记录各环节耗时, 结束时打印汇总
+Timing.enable()
 
 grade = "M_1/2st"
 type = "amino"
@@ -20,20 +27,19 @@ data_save_path = None
 # s2 = "".join([type, "_png/", grade,"/荧光强度-浓度拟合直线图.png"])
 s1 = None
 s2 = None
-path = []
 c_label = []
-for ind, val in enumerate(c):
-    path.append("".join([type, "/", str(val), ".csv"]))
 for i in c:
     c_label.append("".join([str(i), "mg/L"]))
 a1 = 0
 b1 = 0
+# 只扫描一次数据目录, 之后按(材料, 浓度, 时间)直接取出扣除空白后的荧光强度, 不再拼接路径、不再读取文件
+dataset = SpectralDataset.scan(".", materials=[type])
 """
 ------------------------------------------------------------------------------------------------------------------------
 """
 try:
-    # 导入浓度梯度下的微纳塑料母液荧光强度数据, 并完成差分矩阵运算处理
-    data_a = Plastic.plastic_data(type, data_save_path, path)
+    # 浓度梯度下的微纳塑料母液荧光强度数据(已扣除空白), 浓度按升序排列
+    data_a = dataset.table(type)
     # 8要比绘制的点(条)数多1, 荧光强度-波长正态分布曲线图
     Microplastic.plot_fic_sc(data_a, c_num, type, "English", c_label, y_limit, s1)
     # 8要比绘制的点(条)数多1, 荧光强度-浓度拟合直线图，返回斜率a和截距b
@@ -51,7 +57,7 @@ mass = 0.02
 init_volume = 0.1
 sample = 0.004
 concentration = "70"
-c_qe = -1.9  # 每种浓度下的饱和吸附量
+c_qe = None  # 每种浓度下的饱和吸附量, 为None时取非线性PFO拟合的结果
 # 一/二阶模型的x和y坐标定义域
 k_x_limit = [0, t[len(t) - 1] + 10]
 f_y_limit = [-5, 5]
@@ -64,28 +70,29 @@ data_save_path = None
 # s3 = "".join([type, "_png/", grade,"/吸附动力学一阶模型.png"])
 # s4 = "".join([type, "_png/", grade,"/吸附动力学二阶模型.png"])
 # s5 = "".join([type, "_png/", grade,"/吸附动力学粒子内扩散模型.png"])
+# s6 = "".join([type, "_png/", grade,"/吸附动力学Elovich模型.png"])
 s3 = None
 s4 = None
 s5 = None
-qt = []
-for i in t[1:]:
-    qt.append("".join([type, "_adsorption/", concentration, "-", str(i), ".csv"]))
+s6 = None
 """
 ------------------------------------------------------------------------------------------------------------------------
 """
 
-# 一阶方程的y值
-f = KineticsData.kinetics_pfo_y(int(concentration), qt, excitation_wave_length, a1, b1, mass, init_volume, sample, c_qe, type, concentration, data_save_path)
-# 二阶方程的y值
-s = KineticsData.kinetics_pso_y(int(concentration), qt, excitation_wave_length, a1, b1, mass, init_volume, sample, t, type, concentration, data_save_path)
-# 粒子内扩散的y值
-ipd = Adsorption.adsorption_quantity(int(concentration), qt, excitation_wave_length, a1, b1, mass, init_volume, sample, type, concentration, data_save_path)
+# 粒子内扩散的y值(吸附量q(t))
+ipd = dataset.quantity(type, concentration, excitation_wave_length, a1, b1, mass, init_volume, sample).tolist()
+# 一阶、二阶方程的y值由同一条q(t)一次得到
+linear = KineticsData.linearize(t, ipd, c_qe, label="c0=%s" % concentration)
+f = linear["pfo"][0]
+s = linear["pso"][0]
 # 开始绘制动力学一阶拟合直线
 Kinetics.kinetics_pfo(t[1:], f, type, 1, "English", k_x_limit, f_y_limit, s3)
 # 开始绘制动力学二阶拟合直线
 Kinetics.kinetics_pso(t[1:], s, type, 2, "English", k_x_limit, s_y_limit, s4)
 # 开始绘制动力学粒子内扩散拟合直线
 Kinetics.kinetics_ipd(t_ipd[1:], ipd[1:], type, "English", i_x_limit, i_y_limit, s5)
+# 开始绘制动力学Elovich拟合曲线
+Kinetics.kinetics_e(t, ipd, type, "English", k_x_limit, i_y_limit, s6)
 # except Exception as result:
 #     print("请检查data_treatment中是否形参都对应或是否开始吸附实验")
 """
@@ -96,27 +103,33 @@ Kinetics.kinetics_ipd(t_ipd[1:], ipd[1:], type, "English", i_x_limit, i_y_limit,
 try:
     # data_save_path = "M_1\\2st\\adsorption\\20220702"
     data_save_path = None
-    path = []
-    for i in range(len(c)):
-        qt = []
-        for j in t:
-            qt.append("".join([type, "_adsorption/%d_" % c[i], str(j), ".csv"]))
-        path.append(qt)
-    ce = [49.85, 67.98]
-    qe = IsothermData.isotherm_l_y(path, excitation_wave_length, a1, b1, mass, init_volume, sample, type, data_save_path)
-    K_Langmuir_predict = 0.01
-    qm = 60
-    K_Freundlich_predict = 20
-    n = 0.3
+    # 各初始浓度的q(t)一起计算; 平衡浓度取最后一个时间点的浓度, 饱和吸附量取非线性PFO拟合的qe
+    c0_list = dataset.init_concentrations(type)
+    q_all = [dataset.quantity(type, c0, excitation_wave_length, a1, b1, mass, init_volume, sample) for c0 in c0_list]
+    ce = [float((dataset.intensity_at(type, c0, excitation_wave_length)[-1] - b1) / a1) for c0 in c0_list]
+    qe = KineticsData.linearize([0] + dataset.times(type, c0_list[0]).tolist(), q_all, label=type)["qe"].tolist()
+    # 拟合的初始参数, 为None时由线性化形式自动估计
+    K_Langmuir_predict = None
+    qm = None
+    K_Freundlich_predict = None
+    n = None
     i_x_limit = [40, 160]
     i_y_limit = [50, 200]
     # s5 = "".join([type, "_png/", grade,"/Langmuir模型.png"])
     # s6 = "".join([type, "_png/", grade,"/Freundlich模型.png"])
     s5 = None
     s6 = None
+    s7 = None
+    s8 = None
     # Langmuir曲线绘制
     Isotherm.isotherm_l(ce, qe, qm, K_Langmuir_predict, type, "English", i_x_limit, i_y_limit, s5)
     # Freundlich曲线绘制
     Isotherm.isotherm_f(ce, qe, n, K_Freundlich_predict, type, "English", i_x_limit, i_y_limit, s6)
+    # Dubinin-Radushkevich与Temkin曲线绘制, 初始参数自动估计
+    Isotherm.isotherm_dr(ce, qe, None, None, type, "English", i_x_limit, i_y_limit, s7)
+    Isotherm.isotherm_tk(ce, qe, None, None, type, "English", i_x_limit, i_y_limit, s8)
+    # 全部等温线模型按AIC排序
+    print(IsothermData.select_models([ce], [qe], labels=[type]))
 except Exception as result:
     print("未知错误 %s" % result)
+Timing.report()
@@ -0,0 +1,175 @@
+# This Python file uses the following encoding: utf-8
+"""
+光谱预处理: Savitzky-Golay平滑、多项式/非对称最小二乘(ALS)基线扣除与归一化;
+全部函数以(波长 × 样品)矩阵为输入, 一次处理所有样品, 不逐个文件循环
+
+    preprocessing = Preprocessing(smooth_window=11, baseline="als", normalise="area")
+    y = Plastic.intensity_at(path, 526, blank, preprocessing=preprocessing)
+"""
+from typing import NamedTuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import scipy
+from scipy.linalg import solveh_banded
+
+# numpy 2.0起np.trapz更名为np.trapezoid
+_trapezoid = getattr(np, "trapezoid", None) or np.trapz
+# scipy 1.15起solveh_banded支持批量求解(前导维度为批量)
+_BATCHED_BANDED = tuple(int(v) for v in scipy.__version__.split(".")[:2]) >= (1, 15)
+
+
+def _savgol_matrix(window, order):
+    # 窗口内最小二乘多项式拟合的帽子矩阵, 第j行给出窗口内第j个位置的拟合值
+    half = window // 2
+    x = np.arange(-half, half + 1, dtype=np.double)
+    vander = np.vander(x, order + 1, increasing=True)
+    return vander @ np.linalg.pinv(vander)
+
+
+def savgol(intensity, window=11, order=2):
+    """
+    :description: Savitzky-Golay平滑, 两端按窗口内的多项式拟合外推(与scipy.signal.savgol_filter的mode="interp"相同)
+    :param intensity: 荧光强度矩阵(波长 × 样品)或一维光谱
+    :param window: 窗口长度(奇数, 大于order)
+    :param order: 多项式阶数
+    :return: 与intensity形状相同的数组
+    """
+    intensity = np.asarray(intensity, dtype=np.double)
+    if window % 2 == 0 or window <= order:
+        raise ValueError("window必须为大于order的奇数")
+    n = intensity.shape[0]
+    if n < window:
+        raise ValueError("数据点数%d小于窗口长度%d" % (n, window))
+    hat = _savgol_matrix(window, order)
+    half = window // 2
+    smooth = np.empty_like(intensity)
+    # (n - window + 1, 样品, window)的滑动窗口视图与中心行的卷积系数相乘
+    smooth[half:n - half] = sliding_window_view(intensity, window, axis=0) @ hat[half]
+    smooth[:half] = hat[:half] @ intensity[:window]
+    smooth[n - half:] = hat[half + 1:] @ intensity[n - window:]
+    return smooth
+
+
+def poly_baseline(wave_length, intensity, order=2, iterations=20):
+    """
+    :description: 多项式基线; iterations > 0时为修正多项式法(modpoly): 每次把高于拟合值的点(发射峰)压到拟合值上再重新拟合
+    :param wave_length: 波长
+    :param intensity: 荧光强度矩阵(波长 × 样品)
+    :param order: 多项式阶数
+    :param iterations: 迭代次数, 为0时为普通最小二乘拟合
+    :return: 基线, 与intensity形状相同
+    """
+    wave_length = np.asarray(wave_length, dtype=np.double)
+    y = np.array(intensity, dtype=np.double)
+    # 波长缩放到[-1, 1], 避免高阶范德蒙矩阵病态
+    x = (wave_length - wave_length.mean()) / (np.ptp(wave_length) / 2 or 1.0)
+    vander = np.vander(x, order + 1, increasing=True)
+    # 所有样品共用同一个投影矩阵
+    projection = vander @ np.linalg.pinv(vander)
+    for _ in range(iterations):
+        y = np.minimum(y, projection @ y)
+    return projection @ y
+
+
+def als_baseline(intensity, lam=1e5, p=0.01, iterations=10):
+    """
+    :description: 非对称最小二乘基线(Eilers & Boelens): 最小化Σw(y - z)² + λΣ(Δ²z)², 高于基线的点权重为p, 其余为1 - p;
+                  对称五对角方程组以scipy.linalg.solveh_banded(带状Cholesky分解)求解, 全部样品一次批量求解
+    :param intensity: 荧光强度矩阵(波长 × 样品)或一维光谱
+    :param lam: 平滑参数λ
+    :param p: 非对称权重
+    :param iterations: 重新计算权重的次数
+    :return: 基线, 与intensity形状相同
+    """
+    y = np.asarray(intensity, dtype=np.double)
+    flat = y.ndim == 1
+    if flat:
+        y = y[:, np.newaxis]
+    n = y.shape[0]
+    if n < 3:
+        raise ValueError("数据点数至少为3")
+    # λD'D的上三角带状存储(D为二阶差分矩阵): 第0行为第2条上对角线, 第1行为第1条上对角线, 第2行为主对角线
+    bands = np.zeros((3, n))
+    bands[2] = 6.0
+    bands[2, [0, -1]] = 1.0
+    bands[2, [1, -2]] = 5.0
+    bands[1, 1:] = -4.0
+    bands[1, [1, -1]] = -2.0
+    bands[0, 2:] = 1.0
+    if n == 3:
+        bands[2, 1], bands[1, 1:] = 4.0, -2.0
+    bands *= lam
+
+    # 每个样品的权重不同, 各自一个(3 × n)的带状矩阵, 以(样品 × 3 × n)批量传给solveh_banded
+    ab = np.repeat(bands[np.newaxis], y.shape[1], axis=0)
+    w = np.ones_like(y)
+    z = y
+    for _ in range(iterations):
+        ab[:, 2] = bands[2] + w.T
+        z = _solve_banded(ab, (w * y).T).T
+        w = np.where(y > z, p, 1 - p)
+    return z[:, 0] if flat else z
+
+
+def _solve_banded(ab, rhs):
+    # ab为(样品 × 3 × n), rhs为(样品 × n); 旧版本scipy逐个样品求解
+    if _BATCHED_BANDED:
+        return solveh_banded(ab, rhs[..., np.newaxis])[..., 0]
+    return np.stack([solveh_banded(ab[i], rhs[i]) for i in range(len(rhs))])
+
+
+def normalise(wave_length, intensity, method):
+    """
+    :description: 散射/强度归一化
+    :param method: "max"(除以最大值)、"area"(除以曲线下面积)、"vector"(除以L2范数)或"snv"(标准正态变换)
+    :return: 与intensity形状相同的数组
+    """
+    intensity = np.asarray(intensity, dtype=np.double)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if method == "max":
+            return intensity / np.max(intensity, axis=0)
+        if method == "area":
+            return intensity / _trapezoid(intensity, np.asarray(wave_length, dtype=np.double), axis=0)
+        if method == "vector":
+            return intensity / np.linalg.norm(intensity, axis=0)
+        if method == "snv":
+            return (intensity - intensity.mean(axis=0)) / intensity.std(axis=0, ddof=1)
+    raise ValueError("method只能为\"max\"、\"area\"、\"vector\"或\"snv\"")
+
+
+class Preprocessing(NamedTuple):
+    """
+    :description: 预处理流程: 平滑 --> 基线扣除 --> 归一化, 各步骤未设置时跳过;
+                  归一化改变了荧光强度的量纲, 标准曲线与吸附实验的数据必须使用同一个流程
+    """
+    smooth_window: int = 0
+    smooth_order: int = 2
+    # None、"poly"或"als"
+    baseline: str = None
+    baseline_order: int = 2
+    baseline_iterations: int = 20
+    als_lambda: float = 1e5
+    als_p: float = 0.01
+    als_iterations: int = 10
+    # None、"max"、"area"、"vector"或"snv"
+    normalise: str = None
+
+    def apply(self, wave_length, intensity):
+        """
+        :param wave_length: 波长
+        :param intensity: 扣除空白后的荧光强度矩阵(波长 × 样品)
+        :return: 预处理后的新数组
+        """
+        y = np.array(intensity, dtype=np.double)
+        if self.smooth_window:
+            y = savgol(y, self.smooth_window, self.smooth_order)
+        if self.baseline == "poly":
+            y = y - poly_baseline(wave_length, y, self.baseline_order, self.baseline_iterations)
+        elif self.baseline == "als":
+            y = y - als_baseline(y, self.als_lambda, self.als_p, self.als_iterations)
+        elif self.baseline is not None:
+            raise ValueError("baseline只能为None、\"poly\"或\"als\"")
+        if self.normalise is not None:
+            y = normalise(wave_length, y, self.normalise)
+        return y
@@ -0,0 +1,279 @@
+# This Python file uses the following encoding: utf-8
+import atexit
+import glob
+import logging
+import os
+import queue
+import re
+import threading
+import time
+
+import pandas as pd
+
+from timing import Timing
+
+logger = logging.getLogger(__name__)
+
+# 长表的列: 表名, 行号, 列名, 数值, 文本(非数值的单元格, 如模型名), 写入批次(同名的表以最后一批为准)
+COLUMNS = ["table", "row", "column", "value", "text", "part"]
+
+
+def _long(table):
+    # 宽表 --> 长表, 不同形状的表可以存放在同一个列式文件中; 数值放在value列, 非数值原样保存在text列
+    frame = pd.DataFrame(table)
+    frame.columns = [str(c) for c in frame.columns]
+    frame = frame.reset_index(names="row").melt(id_vars="row", var_name="column", value_name="value")
+    value = frame["value"].astype(object)
+    number = pd.to_numeric(value, errors="coerce").astype(float)
+    text = value.where(number.isna() & value.notna())
+    frame["value"] = number
+    frame["text"] = [None if pd.isna(t) else str(t) for t in text]
+    return frame
+
+
+def _wide(frame):
+    # 长表 --> 宽表, 列保持写入时的顺序, 文本单元格还原为字符串
+    frame = frame.assign(cell=frame["value"].astype(object).where(frame["text"].isna(), frame["text"]))
+    wide = frame.pivot(index="row", columns="column", values="cell")
+    wide = wide[list(pd.unique(frame["column"]))].infer_objects()
+    wide.index.name = None
+    wide.columns.name = None
+    return wide
+
+
+def _has_module(name):
+    try:
+        __import__(name)
+        return True
+    except ImportError:
+        return False
+
+
+def sheet_names(names):
+    """
+    :description: 表名 --> Excel工作表名; 工作表名最长31个字符、不能含有[]:*?/\\且不区分大小写,
+                  截断后重复的名称加上"~2"、"~3"...的后缀
+    :param names: 表名列表
+    :return: 工作表名列表, 与names一一对应
+    """
+    used = set()
+    result = []
+    for name in names:
+        base = re.sub(r"[\[\]:*?/\\]", "_", str(name)) or "_"
+        sheet = base[-31:]
+        number = 1
+        while sheet.lower() in used:
+            number += 1
+            suffix = "~%d" % number
+            sheet = base[-(31 - len(suffix)):] + suffix
+        used.add(sheet.lower())
+        result.append(sheet)
+    return result
+
+
+class ResultSink(object):
+    """
+    :description: 一次运行的全部中间/最终数据表汇总写入一个列式数据集(<root>/<run>/results.parquet或.h5);
+                  put与flush只把表放入队列后立即返回, 写盘在后台线程中完成, 每次flush追加一批分片/行,
+                  不读回已写入的内容; 只有close与read会等待写盘结束
+    """
+    # 保存根目录, 替代原来写死的D:\ZGJ\SR_DATA\
+    root = os.environ.get("SR_RESULT_ROOT", "results")
+    # "parquet"(需要pyarrow或fastparquet)或"hdf5"(需要tables); 依赖不可用时退回为csv.gz分片
+    format = os.environ.get("SR_RESULT_FORMAT", "parquet")
+    # 为True时close时另外导出一个Excel文件(需要openpyxl), 每张表一个工作表
+    excel = os.environ.get("SR_RESULT_EXCEL", "") not in ("", "0")
+
+    _queue = None
+    _thread = None
+    _pid = None
+    # 运行目录 --> {表名: DataFrame}, 尚未写盘的表, 只在后台线程中访问
+    _tables = {}
+    # 本进程写入过的运行目录, close时导出Excel
+    _written = set()
+    _errors = []
+
+    @classmethod
+    def _start(cls):
+        # fork出的子进程不会继承后台线程, 以进程号判断是否需要新建
+        if cls._thread is None or cls._pid != os.getpid():
+            if cls._pid != os.getpid():
+                atexit.register(cls.close)
+            cls._queue = queue.Queue()
+            cls._tables = {}
+            cls._written = set()
+            cls._errors = []
+            cls._pid = os.getpid()
+            cls._thread = threading.Thread(target=cls._run, name="ResultSink", daemon=True)
+            cls._thread.start()
+
+    @classmethod
+    def _run(cls):
+        while True:
+            item = cls._queue.get()
+            try:
+                if item is None:
+                    cls._write_all()
+                    if cls.excel:
+                        for directory in sorted(cls._written):
+                            cls._export_excel(directory)
+                    return
+                if item == "flush":
+                    cls._write_all()
+                else:
+                    directory, name, table = item
+                    cls._tables.setdefault(directory, {})[name] = table
+            except Exception as error:
+                cls._errors.append(error)
+            finally:
+                cls._queue.task_done()
+
+    @staticmethod
+    def run_name(save):
+        # 原来的save参数形如"M_1\\2st\\adsorption\\20220702", 统一为当前系统的路径分隔符
+        return os.path.join(*[p for p in str(save).replace("\\", "/").split("/") if p])
+
+    @classmethod
+    def directory(cls, save, root=None):
+        # 运行的结果目录
+        return os.path.join(cls.root if root is None else root, cls.run_name(save))
+
+    @classmethod
+    def path(cls, save, root=None):
+        # 运行的结果文件(不含扩展名)
+        return os.path.join(cls.directory(save, root), "results")
+
+    @classmethod
+    def put(cls, save, name, table, root=None):
+        """
+        :description: 登记一张数据表, 立即返回; 同一运行中同名的表以最后一次为准
+        :param save: 运行名(原excel保存路径中D:\\ZGJ\\SR_DATA\\之后的部分)
+        :param name: 表名, 如"amino/70_quantity"
+        :param table: DataFrame、数组或列表
+        :param root: 保存根目录, 为None时使用ResultSink.root
+        """
+        cls._start()
+        # 复制一份, 调用方之后修改原数据不影响保存的内容
+        cls._queue.put((cls.directory(save, root), name, pd.DataFrame(table).copy()))
+
+    @classmethod
+    def flush(cls):
+        """
+        :description: 把已登记的表交给后台线程写盘, 立即返回, 不等待写盘结束
+        """
+        if cls._thread is not None and cls._pid == os.getpid():
+            cls._queue.put("flush")
+
+    @classmethod
+    def close(cls):
+        """
+        :description: 写出全部已登记的表(excel为True时再导出Excel)并等待写盘结束, 有写入失败时抛出第一个异常;
+                      之后再次put时重新启动后台线程
+        """
+        if cls._thread is None or cls._pid != os.getpid():
+            return
+        cls._queue.put(None)
+        cls._thread.join()
+        cls._thread = None
+        errors, cls._errors = cls._errors, []
+        if errors:
+            raise errors[0]
+
+    @classmethod
+    def _write_all(cls):
+        for directory, tables in cls._tables.items():
+            if tables:
+                with Timing.span("save/results", "io", tables=len(tables)):
+                    cls._write(directory, tables)
+                cls._written.add(directory)
+        cls._tables = {}
+
+    @classmethod
+    def _format(cls, base):
+        fmt = cls.format
+        if fmt == "parquet" and not (_has_module("pyarrow") or _has_module("fastparquet")):
+            logger.warning("pyarrow/fastparquet not installed, writing %s.csv instead", base)
+            fmt = "csv"
+        elif fmt == "hdf5" and not _has_module("tables"):
+            logger.warning("tables not installed, writing %s.csv instead", base)
+            fmt = "csv"
+        elif fmt not in ("parquet", "hdf5", "csv"):
+            raise ValueError("format只能为\"parquet\"、\"hdf5\"或\"csv\"")
+        return fmt
+
+    @classmethod
+    def _write(cls, directory, tables):
+        # 本批次的表追加为一个新分片(hdf5为追加行), 已写入的内容不读回、不重写
+        base = os.path.join(directory, "results")
+        part = time.time_ns()
+        frame = pd.concat([_long(t).assign(table=name) for name, t in tables.items()], ignore_index=True)
+        frame = frame.assign(part=part)[COLUMNS]
+        fmt = cls._format(base)
+        if fmt == "hdf5":
+            os.makedirs(directory, exist_ok=True)
+            frame = frame.assign(text=frame["text"].fillna(""))
+            with pd.HDFStore(base + ".h5", mode="a") as store:
+                store.append("results", frame, format="table", data_columns=["table"], index=False,
+                             min_itemsize={"table": 128, "column": 128, "text": 256})
+        else:
+            folder = base + (".parquet" if fmt == "parquet" else ".csv")
+            os.makedirs(folder, exist_ok=True)
+            name = os.path.join(folder, "part-%d-%d" % (part, os.getpid()))
+            tmp = name + ".tmp"
+            try:
+                if fmt == "parquet":
+                    frame.to_parquet(tmp, index=False)
+                    os.replace(tmp, name + ".parquet")
+                else:
+                    frame.to_csv(tmp, index=False, compression="gzip")
+                    os.replace(tmp, name + ".csv.gz")
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        logger.info("appended %d tables to %s", len(tables), base)
+
+    @classmethod
+    def _export_excel(cls, directory):
+        base = os.path.join(directory, "results")
+        if not _has_module("openpyxl"):
+            logger.warning("openpyxl not installed, skipping %s.xlsx", base)
+            return
+        frame = cls._read_existing(base)
+        groups = list(frame.groupby("table", sort=False))
+        with pd.ExcelWriter(base + ".xlsx") as writer:
+            for (name, t), sheet in zip(groups, sheet_names([name for name, _ in groups])):
+                _wide(t).to_excel(writer, sheet_name=sheet)
+
+    @classmethod
+    def _read_existing(cls, base):
+        # 读出全部批次, 每张表只保留最后一次写入的批次
+        frames = []
+        parts = sorted(glob.glob(os.path.join(base + ".parquet", "part-*.parquet")))
+        frames += [pd.read_parquet(p) for p in parts]
+        parts = sorted(glob.glob(os.path.join(base + ".csv", "part-*.csv.gz")))
+        frames += [pd.read_csv(p, dtype={"table": str, "column": str, "text": str}, keep_default_na=False,
+                               na_values={"value": [""], "text": [""]}) for p in parts]
+        if os.path.exists(base + ".h5"):
+            frame = pd.read_hdf(base + ".h5", "results")
+            frames.append(frame.assign(text=frame["text"].where(frame["text"] != "")))
+        if not frames:
+            return pd.DataFrame(columns=COLUMNS)
+        frame = pd.concat(frames, ignore_index=True)
+        frame["text"] = frame["text"].astype(object).where(frame["text"].notna(), None)
+        latest = frame.groupby("table")["part"].transform("max")
+        return frame[frame["part"] == latest].reset_index(drop=True)
+
+    @classmethod
+    def read(cls, save, name=None, root=None):
+        """
+        :description: 读回一次运行保存的数据表, 先等待已登记的表写盘结束
+        :param save: 运行名
+        :param name: 表名, 为None时返回全部表的长表
+        :param root: 保存根目录, 为None时使用ResultSink.root
+        :return: DataFrame, 给出name时还原为宽表
+        """
+        cls.close()
+        frame = cls._read_existing(cls.path(save, root))
+        if name is None:
+            return frame
+        return _wide(frame[frame["table"] == name])
@@ -0,0 +1,382 @@
+# This Python file uses the following encoding: utf-8
+"""
+根据实验清单(manifest, .json/.toml)批量处理多种MPs/NPs材料:
+标准曲线 --> 各初始浓度的吸附量q(t) --> 动力学/等温线 --> 图片
+
+    python runner.py manifest.json --workers 8
+"""
+import argparse
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from data_treatment import Blank, Plastic, Adsorption, KineticsData, IsothermData
+from fitting import linear_fit, bootstrap, MIN_LINEAR_POINTS
+from preprocess import Preprocessing
+from results import ResultSink
+from timing import Timing
+
+logger = logging.getLogger(__name__)
+
+# 每种材料未在清单中给出时使用的默认实验参数(与plot.py一致)
+MATERIAL_DEFAULTS = {
+    "calibration_path": "{type}/{c}.csv",
+    "adsorption_path": "{type}_adsorption/{c0}-{t}.csv",
+    "mass": 0.02,
+    "init_volume": 0.1,
+    "sample": 0.004,
+    "language": "English",
+    # 等温线拟合的初始参数, 为None时由线性化形式自动估计
+    "qm": None,
+    "K_Langmuir": None,
+    "n": None,
+    "K_Freundlich": None,
+}
+
+
+class Stage(NamedTuple):
+    """
+    :description: 阶段图中的一个阶段, func以deps中各阶段的结果为参数
+    """
+    name: str
+    func: object
+    deps: tuple = ()
+    # matplotlib不是线程安全的, 绘图阶段在主线程中执行
+    main_thread: bool = False
+
+
+class StageFailed(object):
+    # 失败阶段的结果, 依赖它的阶段会被跳过
+    def __init__(self, name, error):
+        self.name = name
+        self.error = error
+
+    def __repr__(self):
+        return "StageFailed(%s: %s)" % (self.name, self.error)
+
+
+def execute(stages, workers=None):
+    """
+    :description: 执行阶段图, 依赖已完成的阶段并发执行; 某阶段失败时只跳过依赖它的阶段
+    :param stages: Stage列表
+    :param workers: 线程池大小
+    :return: {阶段名: 结果}
+    """
+    pending = {s.name: s for s in stages}
+    for s in stages:
+        for d in s.deps:
+            if d not in pending:
+                raise ValueError("阶段%s依赖不存在的阶段%s" % (s.name, d))
+    results = {}
+    running = {}
+
+    def finish(name, func, args):
+        try:
+            with Timing.span(name, "stage"):
+                return func(*args)
+        except Exception as error:
+            logger.exception("stage %s failed", name)
+            return StageFailed(name, error)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            ready = [s for s in pending.values() if all(d in results for d in s.deps)]
+            for s in ready:
+                del pending[s.name]
+                args = [results[d] for d in s.deps]
+                failed = [a for a in args if isinstance(a, StageFailed)]
+                if failed:
+                    logger.warning("stage %s skipped, %s failed", s.name, failed[0].name)
+                    results[s.name] = failed[0]
+                elif s.main_thread:
+                    results[s.name] = finish(s.name, s.func, args)
+                else:
+                    running[pool.submit(finish, s.name, s.func, args)] = s.name
+            if not running:
+                if pending and not ready:
+                    raise ValueError("阶段图中存在循环依赖: %s" % ", ".join(pending))
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+    return results
+
+
+def load_manifest(path):
+    """
+    :description: 读取实验清单, 支持.json与.toml
+    :param path: 清单文件路径
+    :return: dict
+    """
+    if path.endswith(".toml"):
+        import tomllib
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def build_stages(manifest, base=".", figures=True, output=None):
+    """
+    :description: 由实验清单生成阶段图
+    :param manifest: load_manifest的返回值
+    :param base: 清单中相对路径的根目录
+    :param figures: 是否生成绘图阶段
+    :param output: 图片保存目录, 为None时不保存
+    :return: Stage列表
+    """
+    from operation_model import Microplastic, Kinetics, Isotherm, axis_limits
+
+    def resolve(p):
+        return p if os.path.isabs(p) else os.path.join(base, p)
+
+    wave_length = manifest["excitation_wave_length"]
+    blank = resolve(manifest["blank"]) if manifest.get("blank") else None
+    # 可选的光谱预处理, 如{"smooth_window": 11, "baseline": "als", "normalise": "area"}, 所有阶段使用同一个流程
+    pre = Preprocessing(**manifest["preprocess"]) if manifest.get("preprocess") else None
+    # 标准曲线、动力学与等温线拟合的bootstrap置信区间: 默认计算, 整数为重抽样次数, 为false时不计算
+    ci = manifest.get("bootstrap", True)
+    stages = [Stage("blank", lambda: Blank.get(blank))]
+    isotherms = []
+
+    for material in manifest["materials"]:
+        m = dict(MATERIAL_DEFAULTS)
+        m.update(manifest.get("defaults", {}))
+        m.update(material)
+        kind = m["type"]
+        key = m["language"]
+        wl = m.get("excitation_wave_length", wave_length)
+
+        def save_to(name, kind=kind):
+            if output is None:
+                return None
+            os.makedirs(os.path.join(output, kind), exist_ok=True)
+            return os.path.join(output, kind, name + ".png")
+
+        # 标准曲线: 激发波长处的荧光强度与浓度线性拟合
+        c = list(m["calibration"]["concentrations"])
+        c_path = [resolve(m["calibration_path"].format(type=kind, c=v)) for v in c]
+
+        def calibration(water, c=c, c_path=c_path, wl=wl):
+            y = Plastic.intensity_at(c_path, wl, water, preprocessing=pre)
+            with Timing.span("calibration_fit", "fit", points=len(c)):
+                fit = linear_fit(c, y)
+            return {"a": float(fit.slope), "b": float(fit.intercept), "r2": float(fit.r2), "intensity": y.tolist()}
+
+        def calibration_ci(cal, c=c):
+            # 斜率与截距的95%置信区间, 单独作为一个阶段, 不阻塞依赖标准曲线的q(t)等阶段
+            with Timing.span("bootstrap", "fit", points=len(c)):
+                interval = bootstrap(None, c, cal["intensity"], replicates=None if ci is True else ci)
+            return {"a_ci": [float(interval.low[0]), float(interval.high[0])],
+                    "b_ci": [float(interval.low[1]), float(interval.high[1])]}
+
+        stages.append(Stage("%s/calibration" % kind, calibration, ("blank",)))
+        if ci is not False and ci is not None:
+            stages.append(Stage("%s/calibration_ci" % kind, calibration_ci, ("%s/calibration" % kind,)))
+        if figures:
+            def calibration_figure(water, cal, kind=kind, key=key, c=c, c_path=c_path, wl=wl):
+                data = Plastic.plastic_data(path=c_path, blank=water, preprocessing=pre)
+                y_limit = [0, max(cal["intensity"]) / 10000 * 1.1]
+                Microplastic.plot_fic_sc(data, len(c) + 1, kind, key, ["%smg/L" % v for v in c], y_limit,
+                                         save_to("fic_sc"))
+                Microplastic.plot_fic_lc(data, wl, len(c) + 1, c, kind, key, [0, max(c) + 2], y_limit,
+                                         save_to("fic_lc"))
+
+            stages.append(Stage("%s/figures/calibration" % kind, calibration_figure,
+                                ("blank", "%s/calibration" % kind), main_thread=True))
+
+        # 各初始浓度的吸附量q(t)
+        adsorption = m.get("adsorption")
+        if not adsorption:
+            continue
+        times = list(adsorption["times"])
+        series = []
+        for c0 in adsorption["init_concentrations"]:
+            q_path = [resolve(m["adsorption_path"].format(type=kind, c0=c0, t=t)) for t in times]
+
+            def quantity(water, cal, c0=c0, q_path=q_path, m=m, wl=wl):
+                qt = Adsorption.adsorption_quantity(c0, q_path, wl, cal["a"], cal["b"], m["mass"],
+                                                    m["init_volume"], m["sample"], blank=water, preprocessing=pre)
+                cnc = Adsorption.concentration(c0, q_path, wl, cal["a"], cal["b"], water, preprocessing=pre)
+                return {"c0": c0, "qt": qt, "ce": float(cnc[-1])}
+
+            name = "%s/q/%s" % (kind, c0)
+            stages.append(Stage(name, quantity, ("blank", "%s/calibration" % kind)))
+            series.append(c0)
+
+        # 动力学: 非线性模型直接拟合q(t), 每个模型对所有初始浓度一次批量拟合;
+        # PFO/PSO/IPD的线性化数据由同一次PFO拟合的qe一次得到, 再各自一次批量线性拟合
+        q_names = tuple("%s/q/%s" % (kind, c0) for c0 in series)
+
+        def kinetics_fit(*qs, series=series, times=times, m=m):
+            t = [0] + times
+            qt = [q["qt"] for q in qs]
+            models = KineticsData.fit_kinetics(t, qt, labels=series, ci=ci)
+            # 未收敛的PFO拟合(见models的converged列)不可信, qe记为NaN, 之后的线性化与等温线跳过该点
+            pfo = models[models["model"] == "pfo"]
+            pfo_qe = pfo["qe"].where(pfo["converged"].astype(bool)).to_numpy(dtype=np.double)
+            # 清单中给出pfo_qe时线性化使用该值, 否则使用非线性PFO拟合的qe
+            linear = KineticsData.linearize(t, qt, m.get("pfo_qe", pfo_qe), label=kind)
+            x = {"pfo": times, "pso": times, "ipd": np.around(np.sqrt(times), 1)}
+            table = {"models": models.to_dict("records"), "qe": pfo_qe.tolist(),
+                     "linearized": {"c0": list(series), "qe": linear["qe"].tolist()}}
+            for model in ("pfo", "pso", "ipd"):
+                table["linearized"][model] = linear[model].tolist()
+                fit = linear_fit(x[model], linear[model])
+                # 有效数据点过少的直线没有意义(PFO中qt >= qe的点被跳过), 记为NaN
+                few = fit.n < MIN_LINEAR_POINTS
+                table[model] = {"c0": list(series), "n": fit.n.tolist()}
+                for field in ("slope", "intercept", "r2", "slope_se", "intercept_se"):
+                    table[model][field] = np.where(few, np.nan, getattr(fit, field)).tolist()
+            return table
+
+        stages.append(Stage("%s/kinetics" % kind, kinetics_fit, q_names))
+        if figures:
+            for i, c0 in enumerate(series):
+                def kinetics_figure(k, i=i, c0=c0, kind=kind, key=key, times=times):
+                    y = {model: k["linearized"][model][i] for model in ("pfo", "pso", "ipd")}
+                    t_ipd = np.around(np.sqrt(times), 1)
+                    x_limit = [0, times[-1] + 10]
+                    Kinetics.kinetics_pfo(times, y["pfo"], kind, 1, key, x_limit, axis_limits(y["pfo"]),
+                                          save_to("pfo_%s" % c0))
+                    Kinetics.kinetics_pso(times, y["pso"], kind, 2, key, x_limit, axis_limits(y["pso"]),
+                                          save_to("pso_%s" % c0))
+                    Kinetics.kinetics_ipd(t_ipd, y["ipd"], kind, key, [0, t_ipd[-1] + 2], axis_limits(y["ipd"]),
+                                          save_to("ipd_%s" % c0))
+
+                stages.append(Stage("%s/figures/kinetics/%s" % (kind, c0), kinetics_figure,
+                                    ("%s/kinetics" % kind,), main_thread=True))
+
+        # 等温线: 每个初始浓度的平衡浓度与饱和吸附量(非线性PFO拟合的qe)
+
+        def isotherm(k, *qs, m=m):
+            ce = m.get("ce") or [q["ce"] for q in qs]
+            return {"ce": list(ce), "qe": list(k["qe"])}
+
+        stages.append(Stage("%s/isotherm" % kind, isotherm, ("%s/kinetics" % kind,) + q_names))
+        isotherms.append((kind, m))
+        if figures:
+            def isotherm_figure(iso, m=m, kind=kind, key=key):
+                x_limit, y_limit = axis_limits(iso["ce"]), axis_limits(iso["qe"])
+                Isotherm.isotherm_l(iso["ce"], iso["qe"], m["qm"], m["K_Langmuir"], kind, key, x_limit, y_limit,
+                                    save_to("langmuir"))
+                Isotherm.isotherm_f(iso["ce"], iso["qe"], m["n"], m["K_Freundlich"], kind, key, x_limit, y_limit,
+                                    save_to("freundlich"))
+
+            stages.append(Stage("%s/figures/isotherm" % kind, isotherm_figure, ("%s/isotherm" % kind,),
+                                main_thread=True))
+
+    if isotherms:
+        temperature = manifest.get("temperature", 298.15)
+        stages.append(Stage("isotherms", lambda *isos: fit_isotherms(isotherms, isos, temperature, ci),
+                            tuple("%s/isotherm" % kind for kind, _ in isotherms)))
+    return stages
+
+
+def fit_isotherms(materials, isos, temperature=298.15, ci=True):
+    """
+    :description: 所有材料的等温线以全部等温线模型拟合, 按AICc(小样本修正的AIC)排序
+    :param materials: [(材料类型, 材料参数)]
+    :param isos: 各材料isotherm阶段的结果
+    :param temperature: 吸附温度(K)
+    :param ci: 默认增加各参数的bootstrap置信区间(整数为重抽样次数), 为False时不计算
+    :return: [{dataset: 材料类型, model: 模型名, 参数..., r2, aic, aicc, bic, rank, ...}]
+    """
+    table = IsothermData.select_models([iso["ce"] for iso in isos], [iso["qe"] for iso in isos],
+                                       labels=[kind for kind, _ in materials], temperature=temperature, ci=ci)
+    return table.to_dict("records")
+
+
+def _is_column(value):
+    # 一维且不含字典的列表/数组
+    if not isinstance(value, (list, tuple, np.ndarray)) or any(isinstance(v, dict) for v in value):
+        return False
+    try:
+        return np.ndim(value) == 1
+    except ValueError:
+        return False
+
+
+def _tables(name, result):
+    """
+    :description: 阶段结果(嵌套的字典/列表)拆成数据表: 等长的列合成一张表, 标量合成一行, 其余按键名展开为子表
+    :return: [(表名, DataFrame)]
+    """
+    if isinstance(result, pd.DataFrame):
+        return [(name, result)]
+    if not isinstance(result, dict):
+        return [(name, pd.DataFrame(result))]
+    columns = {k: v for k, v in result.items() if _is_column(v)}
+    if len(columns) == len(result) and len({len(v) for v in columns.values()}) == 1:
+        return [(name, pd.DataFrame(columns))]
+    tables = []
+    scalars = {k: v for k, v in result.items() if not isinstance(v, (dict, list, tuple, np.ndarray))}
+    if scalars:
+        tables.append((name, pd.DataFrame([scalars])))
+    for key, value in result.items():
+        if key not in scalars:
+            tables += _tables("%s/%s" % (name, key), value)
+    return tables
+
+
+def run(manifest_path, workers=None, figures=True, output=None, show=False):
+    """
+    :description: 读取实验清单并执行全部阶段
+    :param show: 为False时以headless模式绘图(Agg后端, 不弹出窗口, 图片在后台保存)
+    :return: {阶段名: 结果}
+    """
+    from operation_model import Render
+
+    if figures and not show:
+        Render.use_headless()
+    manifest = load_manifest(manifest_path)
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    if output is None and manifest.get("output"):
+        output = os.path.join(base, manifest["output"])
+    stages = build_stages(manifest, base, figures, output)
+    results = execute(stages, workers or manifest.get("workers"))
+    # 等待后台保存的图片全部写完, 并释放各线程的模板图片
+    Render.close()
+    failed = [r for r in results.values() if isinstance(r, StageFailed)]
+    logger.info("%d stages finished, %d failed or skipped", len(results), len(failed))
+    if output is not None:
+        # 各阶段的数值结果汇总写入一个列式文件: <output>/<清单名>/results.parquet
+        save = os.path.splitext(os.path.basename(manifest_path))[0]
+        for name, r in results.items():
+            if isinstance(r, (dict, list)) and "/figures/" not in name:
+                for table_name, table in _tables(name, r):
+                    ResultSink.put(save, table_name, table, root=output)
+        ResultSink.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="按实验清单批量处理MPs/NPs吸附数据")
+    parser.add_argument("manifest", help="实验清单(.json/.toml)")
+    parser.add_argument("--workers", type=int, default=None, help="并发执行的阶段数")
+    parser.add_argument("--output", default=None, help="图片与结果文件(<清单名>/results.parquet)的保存目录")
+    parser.add_argument("--no-figures", action="store_true", help="只计算, 不绘图")
+    parser.add_argument("--show", action="store_true", help="弹出窗口显示图片(默认headless)")
+    parser.add_argument("--timing", default=None, help="各环节耗时的JSON保存路径")
+    parser.add_argument("--trace", default=None, help="Chrome trace文件保存路径(chrome://tracing或Perfetto中查看)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    if args.timing or args.trace:
+        Timing.enable()
+    results = run(args.manifest, args.workers, not args.no_figures, args.output, args.show)
+    if args.timing:
+        Timing.to_json(args.timing)
+    if args.trace:
+        Timing.to_chrome_trace(args.trace)
+    if Timing.enabled:
+        Timing.report()
+    return 1 if any(isinstance(r, StageFailed) for r in results.values()) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,177 @@
+# This Python file uses the following encoding: utf-8
+"""
+按荧光仪EmScan数据文件的格式生成合成数据: 元数据头 + 高斯发射峰 + 噪声,
+浓度/时间梯度可配置, 供基准测试和大规模数据的验证使用
+
+    python synthetic.py bench_data --concentrations 5 10 25 50 --init-concentrations 40 70 --times 5 10 20 40 90
+"""
+import argparse
+import json
+import os
+import re
+
+import numpy as np
+
+from emscan import ScanHeader
+
+# 与实测数据文件一致的元数据头
+DEFAULT_HEADER = ScanHeader(label="EmScan25", scan_type="Emission Scan", comment="", start=470.0, stop=700.0, step=1.0,
+                            fixed_offset=455.0, x_axis="Wavelength", y_axis="Counts", scan_corr_by_file=True,
+                            corr_by_ref_det=True, fixed_offset_corr_by_file=False, repeats=1, dwell_time=0.25,
+                            lamp="Xenon", temp=0.0, scan_polariser="None", scan_slit=1.4995272,
+                            fixed_offset_polariser="None", fixed_offset_slit=1.4995272, detector="Detector 1")
+
+# 仪器写出的指数部分不补0, 如2.27661157E+3
+_EXPONENT = re.compile(r"E([+-])0+(\d)")
+
+
+def _bool(value):
+    return "True" if value else "False"
+
+
+def format_header(header):
+    """
+    :description: 按仪器格式写出元数据头(以空行结束)
+    :param header: ScanHeader
+    :return: 字符串
+    """
+    rows = [("Labels", header.label), ("Type", header.scan_type), ("Comment", header.comment),
+            ("Start", "%.2f" % header.start), ("Stop", "%.2f" % header.stop), ("Step", "%.2f" % header.step),
+            ("Fixed/Offset", "%.2f" % header.fixed_offset), ("Xaxis", header.x_axis), ("Yaxis", header.y_axis),
+            ("Scan Corr. by File", _bool(header.scan_corr_by_file)),
+            ("Corr. by Ref. Det.", _bool(header.corr_by_ref_det)),
+            ("Fixed/Offset Corr. by File", _bool(header.fixed_offset_corr_by_file)),
+            ("Repeats", "%d" % header.repeats), ("Dwell Time", "%.2f" % header.dwell_time), ("Lamp", header.lamp),
+            ("Temp", "%.2f" % header.temp), ("Scan Polariser", header.scan_polariser),
+            ("Scan Slit", "%s" % header.scan_slit), ("Fixed/Offset Polariser", header.fixed_offset_polariser),
+            ("Fixed/Offset Slit", "%s" % header.fixed_offset_slit), ("Detector", header.detector)]
+    return "".join("%s,%s,\n" % row for row in rows) + "\n"
+
+
+def format_scan(intensity, header=DEFAULT_HEADER):
+    """
+    :description: 按仪器格式写出完整的数据文件内容
+    :param intensity: 荧光强度, 长度与header.points相同
+    :param header: ScanHeader
+    :return: 字符串
+    """
+    intensity = np.asarray(intensity, dtype=np.double)
+    if intensity.shape != (header.points,):
+        raise ValueError("荧光强度的长度%d与元数据头的数据点数%d不一致" % (len(intensity), header.points))
+    values = _EXPONENT.sub(r"E\1\2", "\n".join("%.8E" % v for v in intensity)).split("\n")
+    body = "".join("%.2f,%s,\n" % (wl, v) for wl, v in zip(header.wavelength, values))
+    return format_header(header) + body
+
+
+def write_scan(path, intensity, header=DEFAULT_HEADER):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(format_scan(intensity, header))
+
+
+class Spectrum(object):
+    """
+    :description: 合成光谱的参数: 空白(水)为随波长衰减的背景, 样品在背景上叠加一个高斯发射峰,
+                  峰值(扣除空白后激发波长处的荧光强度)与浓度满足标准曲线y = a·c + b
+    """
+    def __init__(self, a=6616.0355, b=40394.1147, center=526.0, width=18.0, background=2000.0, noise=0.005,
+                 header=DEFAULT_HEADER):
+        self.a = a
+        self.b = b
+        self.center = center
+        self.width = width
+        self.background = background
+        # 相对噪声的标准差
+        self.noise = noise
+        self.header = header
+
+    def blank(self):
+        wl = self.header.wavelength
+        return self.background * np.exp(-(wl - wl[0]) / 150.0)
+
+    def peak(self, height):
+        """
+        :param height: 峰值, 标量或数组
+        :return: 扣除空白后的光谱, 形状为(height的个数, 波长)
+        """
+        wl = self.header.wavelength
+        shape = np.exp(-0.5 * ((wl - self.center) / self.width) ** 2)
+        return np.multiply.outer(np.atleast_1d(np.asarray(height, dtype=np.double)), shape)
+
+    def sample(self, concentration, rng):
+        # 浓度 --> 含空白与噪声的光谱
+        clean = self.blank() + self.peak(self.a * np.atleast_1d(concentration) + self.b)
+        return clean * (1 + self.noise * rng.standard_normal(clean.shape))
+
+
+def pfo_concentrations(init_concentration, times, qe, k1, mass, init_volume, sample):
+    """
+    :description: 按PFO动力学qt = qe·(1 - exp(-k1·t))反推每个时间点测得的浓度,
+                  与Adsorption.quantity_matrix的取样体积修正互为逆运算
+    :return: 浓度数组, 与times对应
+    """
+    ct = np.empty(len(times))
+    withdrawn = 0.0
+    for k, t in enumerate(times):
+        qt = qe * (1 - np.exp(-k1 * t))
+        ct[k] = (init_volume * init_concentration - mass * qt - sample * withdrawn) / (init_volume - k * sample)
+        withdrawn += ct[k]
+    return ct
+
+
+def generate(root, concentrations, init_concentrations, times, kind="amino", spectrum=None, qe=None, k1=0.05,
+             mass=0.02, init_volume=0.1, sample=0.004, seed=0):
+    """
+    :description: 写出一套完整的合成实验数据: 空白、标准曲线与各初始浓度的时间梯度, 以及对应的实验清单
+    :param root: 输出目录
+    :param concentrations: 标准曲线的浓度梯度
+    :param init_concentrations: 吸附实验的初始浓度
+    :param times: 时间梯度(min)
+    :param qe: 每个初始浓度的饱和吸附量, 为None时取c0·V0/m的10%(平衡时去除10%)
+    :param k1: PFO速率常数
+    :return: 实验清单(dict), 同时保存为root/manifest.json, 可直接交给runner.py
+    """
+    spectrum = spectrum or Spectrum()
+    rng = np.random.default_rng(seed)
+    header = spectrum.header
+    write_scan(os.path.join(root, "water.csv"), spectrum.blank(), header)
+
+    for c, y in zip(concentrations, spectrum.sample(np.asarray(concentrations, dtype=np.double), rng)):
+        write_scan(os.path.join(root, kind, "%g.csv" % c), y, header)
+
+    for c0 in init_concentrations:
+        q = 0.1 * c0 * init_volume / mass if qe is None else qe
+        ct = pfo_concentrations(c0, times, q, k1, mass, init_volume, sample)
+        for t, y in zip(times, spectrum.sample(ct, rng)):
+            write_scan(os.path.join(root, "%s_adsorption" % kind, "%g-%g.csv" % (c0, t)), y, header)
+
+    manifest = {
+        "blank": "water.csv",
+        "excitation_wave_length": spectrum.center,
+        "defaults": {"mass": mass, "init_volume": init_volume, "sample": sample, "language": "English",
+                     "calibration_path": "{type}/{c:g}.csv", "adsorption_path": "{type}_adsorption/{c0:g}-{t:g}.csv"},
+        "materials": [{"type": kind, "calibration": {"concentrations": list(concentrations)},
+                       "adsorption": {"init_concentrations": list(init_concentrations), "times": list(times)}}],
+    }
+    with open(os.path.join(root, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成EmScan格式的合成荧光数据")
+    parser.add_argument("root", help="输出目录")
+    parser.add_argument("--kind", default="amino")
+    parser.add_argument("--concentrations", type=float, nargs="+", default=[5, 10, 25, 50, 80, 100, 120, 150])
+    parser.add_argument("--init-concentrations", type=float, nargs="+", default=[40, 50, 70])
+    parser.add_argument("--times", type=float, nargs="+", default=[5, 10, 15, 20, 30, 40, 50, 70, 90])
+    parser.add_argument("--noise", type=float, default=0.005, help="相对噪声的标准差")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    generate(args.root, args.concentrations, args.init_concentrations, args.times, args.kind,
+             Spectrum(noise=args.noise), seed=args.seed)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,7 @@
+# This Python file uses the following encoding: utf-8
+import os
+import sys
+
+# 各模块位于仓库根目录, 测试时直接导入; 绘图使用Agg后端, 不弹出窗口
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MPLBACKEND", "Agg")
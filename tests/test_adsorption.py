@@ -0,0 +1,70 @@
+# This Python file uses the following encoding: utf-8
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_treatment import Adsorption, Plastic, QuantityCache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WATER = os.path.join(ROOT, "water.csv")
+TIMES = [5, 10, 15, 20, 30, 40, 50, 70, 90]
+A, B, MASS, VOLUME, SAMPLE = 6616.0355, 40394.1147, 0.02, 0.1, 0.004
+
+
+def _paths(c0):
+    return [os.path.join(ROOT, "amino_adsorption", "%s-%s.csv" % (c0, t)) for t in TIMES]
+
+
+def _baseline_quantity(init_concentration, path, wave_length, a, b, mass, init_volume, sample):
+    # 原来逐个文件的实现: pandas读取, 与空白对照拼接后作差, 再逐个时间点累加
+    water = pd.read_csv(WATER).iloc[20:, 1]
+    wave = np.array(pd.read_csv(WATER).iloc[20:, 0], dtype=np.double)
+    row = list(wave).index(wave_length)
+    cnc = [init_concentration]
+    for temp in path:
+        data = pd.concat([water, pd.read_csv(temp).iloc[20:, 1]], axis=1, ignore_index=True)
+        cnc.append((np.diff(np.array(data, dtype=np.double))[row, 0] - b) / a)
+    amount = init_volume * cnc[0]
+    total = np.cumsum(cnc[1:])
+    quantity = [(amount - init_volume * cnc[0]) / mass]
+    for ind in range(1, len(cnc)):
+        withdrawn = sample * total[ind - 2] if ind >= 2 else 0.0
+        quantity.append((amount - init_volume * cnc[ind] - withdrawn) / mass)
+        init_volume -= sample
+    return quantity
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    QuantityCache.clear()
+    yield
+    QuantityCache.clear()
+
+
+@pytest.mark.parametrize("c0", [40, 50, 70])
+def test_adsorption_quantity_matches_baseline_loop(c0):
+    expected = _baseline_quantity(c0, _paths(c0), 526, A, B, MASS, VOLUME, SAMPLE)
+    result = Adsorption.adsorption_quantity(c0, _paths(c0), 526, A, B, MASS, VOLUME, SAMPLE, blank=WATER)
+    np.testing.assert_allclose(result, expected, rtol=1e-10, atol=1e-9)
+
+
+def test_quantity_grid_and_matrix_match_baseline_loop():
+    c0 = [40, 50, 70]
+    expected = np.array([_baseline_quantity(c, _paths(c), 526, A, B, MASS, VOLUME, SAMPLE) for c in c0])
+    grid = Adsorption.quantity_grid(c0, [_paths(c) for c in c0], 526, A, B, MASS, VOLUME, SAMPLE, blank=WATER)
+    np.testing.assert_allclose(grid, expected, rtol=1e-10, atol=1e-9)
+    intensity = np.stack([Plastic.intensity_at(_paths(c), 526, WATER) for c in c0])
+    matrix = Adsorption.quantity_matrix(intensity, c0, A, B, MASS, VOLUME, SAMPLE)
+    np.testing.assert_allclose(matrix, expected, rtol=1e-10, atol=1e-9)
+
+
+def test_quantity_matrix_per_row_parameters():
+    # 参数可以每行不同, 与逐行计算相同
+    intensity = np.array([[9e4, 8e4, 7.5e4], [1.2e5, 1.1e5, 1.0e5]])
+    mass = [0.02, 0.03]
+    rows = Adsorption.quantity_matrix(intensity, [40, 70], A, B, mass, VOLUME, SAMPLE)
+    for i in range(2):
+        single = Adsorption.quantity_matrix(intensity[i], [40, 70][i], A, B, mass[i], VOLUME, SAMPLE)
+        np.testing.assert_allclose(rows[i], single[0])
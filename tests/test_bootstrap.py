@@ -0,0 +1,45 @@
+# This Python file uses the following encoding: utf-8
+import numpy as np
+import pytest
+
+from fitting import linear_fit, bootstrap, LANGMUIR
+
+
+def _data(model, x, p, noise, seed=0):
+    rng = np.random.default_rng(seed)
+    y = model(x, p)
+    return y + noise * np.abs(y).max() * rng.standard_normal(y.shape)
+
+def test_bootstrap_reproducible():
+    x = np.array([5, 10, 25, 50, 80, 100, 120, 150.0])
+    y = _data(LANGMUIR, x, np.array([180.0, 0.02]), 0.03)
+    serial = bootstrap(LANGMUIR, x, y, replicates=600, seed=7, chunk_size=100)
+    again = bootstrap(LANGMUIR, x, y, replicates=600, seed=7, chunk_size=100)
+    np.testing.assert_array_equal(serial.low, again.low)
+    np.testing.assert_array_equal(serial.high, again.high)
+    other = bootstrap(LANGMUIR, x, y, replicates=600, seed=8, chunk_size=100)
+    assert not np.array_equal(serial.low, other.low)
+
+
+def test_bootstrap_interval_covers_estimate():
+    # 线性模型的残差bootstrap区间应包含估计值, 宽度与t分布区间相近
+    rng = np.random.default_rng(4)
+    x = np.linspace(0, 20, 30)
+    y = 1.5 * x + 4 + rng.standard_normal(30)
+    result = bootstrap(None, x, y, replicates=4000, seed=0, method="residual")
+    fit = linear_fit(x, y)
+    assert result.params == ("slope", "intercept")
+    assert np.all(result.low < result.estimate) and np.all(result.estimate < result.high)
+    half = (result.high - result.low) / 2
+    np.testing.assert_allclose(half, 1.96 * np.array([fit.slope_se, fit.intercept_se]), rtol=0.15)
+    assert result.low[0] < 1.5 < result.high[0]
+    assert result.failed == 0
+
+
+def test_bootstrap_zero_replicates_and_bad_method():
+    x = np.arange(6, dtype=float)
+    result = bootstrap(None, x, 2 * x + 1, replicates=0)
+    np.testing.assert_allclose(result.estimate, [2, 1])
+    assert np.all(np.isnan(result.low))
+    with pytest.raises(ValueError):
+        bootstrap(None, x, 2 * x, method="wild")
@@ -0,0 +1,94 @@
+# This Python file uses the following encoding: utf-8
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from data_treatment import Adsorption, Plastic, QuantityCache, SpectrumCache
+from dataset import SpectralDataset
+from preprocess import Preprocessing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TIMES = [5, 10, 15, 20, 30, 40, 50, 70, 90]
+A, B, MASS, VOLUME, SAMPLE = 6616.0355, 40394.1147, 0.02, 0.1, 0.004
+
+
+@pytest.fixture
+def data_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(SpectrumCache, "root", None)
+    monkeypatch.setattr(SpectrumCache, "enabled", True)
+    SpectrumCache.clear()
+    QuantityCache.clear()
+    for folder in ("amino", "amino_adsorption"):
+        shutil.copytree(os.path.join(ROOT, folder), tmp_path / folder,
+                        ignore=shutil.ignore_patterns(".spectrum_cache"))
+    shutil.copy(os.path.join(ROOT, "water.csv"), tmp_path / "water.csv")
+    yield tmp_path
+    SpectrumCache.clear()
+    QuantityCache.clear()
+
+
+def _paths(root, c0):
+    return [str(root / "amino_adsorption" / ("%s-%s.csv" % (c0, t))) for t in TIMES]
+
+
+def _cache_files(root):
+    # 两个数据目录的磁盘缓存中的文件
+    files = []
+    for folder in ("amino", "amino_adsorption"):
+        cache = SpectrumCache.cache_dir(str(root / folder))
+        files += os.listdir(cache) if os.path.isdir(cache) else []
+    return files
+
+
+def test_scan_matches_per_file_reading(data_root):
+    water = str(data_root / "water.csv")
+    dataset = SpectralDataset.scan(str(data_root), blank=water)
+    assert dataset.init_concentrations("amino") == [40.0, 50.0, 70.0]
+    for c0 in (40, 50, 70):
+        paths = _paths(data_root, c0)
+        np.testing.assert_array_equal(dataset.times("amino", c0), TIMES)
+        np.testing.assert_allclose(dataset.intensity_at("amino", c0, 526), Plastic.intensity_at(paths, 526, water))
+        np.testing.assert_allclose(dataset.quantity("amino", c0, 526, A, B, MASS, VOLUME, SAMPLE),
+                                   Adsorption.adsorption_quantity(c0, paths, 526, A, B, MASS, VOLUME, SAMPLE,
+                                                                  blank=water))
+
+
+def test_store_round_trip_writes_no_disk_cache(data_root):
+    water = str(data_root / "water.csv")
+    store = str(data_root / "dataset.npy")
+    preprocessing = Preprocessing(smooth_window=11)
+    dataset = SpectralDataset.scan(str(data_root), blank=water, store=store, preprocessing=preprocessing)
+    # 荧光强度只写入store, 不另外写每个文件的磁盘缓存
+    assert _cache_files(data_root) == []
+    opened = SpectralDataset.open(store)
+    assert isinstance(opened.intensity, np.memmap)
+    assert not opened.intensity.flags.writeable
+    assert opened.preprocessing == preprocessing
+    assert opened.keys == dataset.keys
+    np.testing.assert_array_equal(opened.intensity, dataset.intensity)
+    paths = _paths(data_root, 70)
+    np.testing.assert_allclose(opened.intensity_at("amino", 70, 526),
+                               Plastic.intensity_at(paths, 526, water, preprocessing=preprocessing))
+
+
+def test_scan_without_store_uses_disk_cache(data_root):
+    SpectralDataset.scan(str(data_root), blank=str(data_root / "water.csv"))
+    assert _cache_files(data_root)
+
+
+def test_duplicate_keys_are_rejected(data_root):
+    shutil.copy(data_root / "amino_adsorption" / "70-5.csv", data_root / "amino_adsorption" / "70.0-5.csv")
+    with pytest.raises(ValueError, match="数据重复"):
+        SpectralDataset.scan(str(data_root), blank=str(data_root / "water.csv"))
+
+
+def test_wavelength_axis_must_match_blank(data_root):
+    path = data_root / "amino" / "50.csv"
+    lines = path.read_text(encoding="utf-8").splitlines(keepends=True)
+    # 去掉最后一个波长并相应修改元数据头, 扫描范围与空白对照不再一致
+    lines = [line.replace("Stop,700.00", "Stop,699.00") for line in lines[:-1]]
+    path.write_text("".join(lines), encoding="utf-8")
+    with pytest.raises(ValueError, match="波长范围"):
+        SpectralDataset.scan(str(data_root), blank=str(data_root / "water.csv"))
@@ -0,0 +1,64 @@
+# This Python file uses the following encoding: utf-8
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from emscan import read_scan, read_at, read_header, pick
+
+WATER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "water.csv")
+
+
+def _pandas(path):
+    # 以pandas读取: 跳过元数据头与空行, 取波长与荧光强度两列
+    with open(path, encoding="utf-8") as f:
+        skip = next(i for i, line in enumerate(f) if not line.strip()) + 1
+    return pd.read_csv(path, skiprows=skip, header=None, usecols=[0, 1])
+
+
+def test_read_scan_matches_pandas():
+    scan = read_scan(WATER)
+    frame = _pandas(WATER)
+    np.testing.assert_array_equal(scan.intensity, frame[1].to_numpy())
+    np.testing.assert_allclose(scan.wavelength, frame[0].to_numpy())
+    assert scan.header == read_header(WATER)
+    assert scan.header.points == len(frame)
+
+
+def test_read_at_matches_pandas():
+    frame = _pandas(WATER).set_index(0)[1]
+    scan = read_scan(WATER)
+    for wave_length in (scan.header.start, 526, scan.header.stop):
+        assert read_at(WATER, wave_length) == frame.loc[wave_length]
+        assert pick(scan.header, scan.intensity, wave_length) == frame.loc[wave_length]
+    middle = scan.header.start + 10.5 * scan.header.step
+    expected = (frame.iloc[10] + frame.iloc[11]) / 2
+    assert read_at(WATER, middle, interpolate=True) == pytest.approx(expected)
+    with pytest.raises(ValueError):
+        read_at(WATER, middle)
+    with pytest.raises(ValueError):
+        read_at(WATER, scan.header.stop + 1)
+
+
+def _truncated(tmp_path, text):
+    path = tmp_path / "scan.csv"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_read_scan_rejects_truncated_files(tmp_path):
+    with open(WATER, encoding="utf-8") as f:
+        text = f.read()
+    # 最后一个数字被截断(点数仍与元数据头一致)
+    with pytest.raises(ValueError):
+        read_scan(_truncated(tmp_path, text.rstrip()[:-4]))
+    # 缺少最后几行
+    lines = text.rstrip("\n").split("\n")
+    with pytest.raises(ValueError):
+        read_scan(_truncated(tmp_path, "\n".join(lines[:-3]) + "\n"))
+    # 只有元数据头
+    with pytest.raises(ValueError):
+        read_scan(_truncated(tmp_path, text[:text.index("\n\n") + 2]))
+    # 完整的文件正常读取
+    assert read_scan(_truncated(tmp_path, text)).intensity.shape == (read_header(WATER).points,)
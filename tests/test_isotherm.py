@@ -0,0 +1,38 @@
+# This Python file uses the following encoding: utf-8
+import numpy as np
+import pytest
+
+from data_treatment import IsothermData
+from fitting import LANGMUIR, FREUNDLICH
+
+CE = np.array([5, 10, 25, 50, 80, 100, 120, 150.0])
+
+
+def _data():
+    rng = np.random.default_rng(3)
+    langmuir = LANGMUIR(CE, np.array([180.0, 0.02]))
+    freundlich = FREUNDLICH(CE, np.array([0.6, 8.0]))
+    return [langmuir + 2 * rng.standard_normal(8), freundlich + 2 * rng.standard_normal(8)]
+
+
+@pytest.mark.parametrize("criterion", ["aic", "aicc", "bic"])
+def test_select_models_ranks_by_criterion(criterion):
+    table = IsothermData.select_models([CE, CE], _data(), labels=["l", "f"], ci=False, criterion=criterion)
+    assert {"aic", "aicc", "bic", "delta_" + criterion, criterion + "_weight"} <= set(table.columns)
+    for label, group in table.groupby("dataset"):
+        ranked = group[group["converged"]]
+        best = ranked.loc[ranked[criterion].idxmin()]
+        assert best["rank"] == 1 and best["delta_" + criterion] == 0
+        np.testing.assert_allclose(ranked[criterion + "_weight"].sum(), 1)
+        # 表按排名排序, 未参与排名的模型在最后
+        assert group["rank"].dropna().is_monotonic_increasing
+        assert group["rank"].isna().to_numpy().tolist() == sorted(group["rank"].isna())
+    best = table[table["rank"] == 1].set_index("dataset")["model"]
+    assert best["l"] == "langmuir" and best["f"] == "freundlich"
+
+
+def test_select_models_default_is_aicc_and_rejects_unknown_criterion():
+    table = IsothermData.select_models([CE], _data()[:1], models=["langmuir", "freundlich"], ci=False)
+    assert "delta_aicc" in table.columns and "delta_aic" not in table.columns
+    with pytest.raises(ValueError):
+        IsothermData.select_models([CE], _data()[:1], ci=False, criterion="r2")
@@ -0,0 +1,56 @@
+# This Python file uses the following encoding: utf-8
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from data_treatment import KineticsData, Adsorption, QuantityCache
+from fitting import nonlinear_fit, PFO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TIMES = [5, 10, 15, 20, 30, 40, 50, 70, 90]
+A, B = 6616.0355, 40394.1147
+
+
+def _paths(c0=40):
+    return [os.path.join(ROOT, "amino_adsorption", "%s-%s.csv" % (c0, t)) for t in TIMES]
+
+
+def test_linearize_matches_definitions():
+    t = [0] + TIMES
+    qt = np.array([0, 8, 13, 17, 20, 24, 26, 27, 28, 28.5])
+    result = KineticsData.linearize(t, qt, qe=30)
+    np.testing.assert_allclose(result["pfo"][0], np.log(30 - qt[1:]))
+    np.testing.assert_allclose(result["pso"][0], np.array(TIMES) / qt[1:])
+    np.testing.assert_allclose(result["ipd"][0], qt[1:])
+    # qt >= qe的点记为NaN
+    assert np.isnan(KineticsData.linearize(t, qt, qe=25)["pfo"][0][5:]).all()
+
+
+def test_linearize_fits_qe_when_missing():
+    t = np.array([0] + TIMES, dtype=float)
+    qt = PFO(t, np.array([30.0, 0.05]))
+    result = KineticsData.linearize(t, np.stack([qt, qt * 2]))
+    np.testing.assert_allclose(result["qe"], [30, 60], rtol=1e-6)
+    with pytest.raises(ValueError):
+        KineticsData.linearize(None, qt)
+
+
+def test_kinetics_pfo_y_does_not_parse_names_when_qe_given(tmp_path):
+    # 文件名不是"初始浓度-时间.csv"时, 给出qe即可计算
+    odd = []
+    for name, path in zip("abcdefghi", _paths()):
+        odd.append(str(tmp_path / (name + ".csv")))
+        shutil.copy(path, odd[-1])
+    QuantityCache.clear()
+    qt = Adsorption.adsorption_quantity(40, odd, 526, A, B, 0.02, 0.1, 0.004)
+    y = KineticsData.kinetics_pfo_y(40, odd, 526, A, B, 0.02, 0.1, 0.004, 100)
+    np.testing.assert_allclose(y, np.log(100 - np.asarray(qt[1:])))
+    # qe为None时使用给出的t, 不解析文件名
+    y = KineticsData.kinetics_pfo_y(40, odd, 526, A, B, 0.02, 0.1, 0.004, None, t=[0] + TIMES)
+    fit = nonlinear_fit(PFO, [0] + TIMES, qt)
+    qe = fit.params[0] if fit.converged else np.nan
+    expected = np.where(qe > np.asarray(qt[1:]), np.log(np.abs(qe - np.asarray(qt[1:]))), np.nan)
+    np.testing.assert_allclose(y, expected)
+    assert KineticsData.times(_paths()) == [0.0] + [float(t) for t in TIMES]
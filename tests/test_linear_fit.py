@@ -0,0 +1,55 @@
+# This Python file uses the following encoding: utf-8
+import numpy as np
+import pytest
+from scipy.stats import linregress
+
+from fitting import linear_fit, LinearStats
+
+
+def test_linear_fit_matches_linregress():
+    rng = np.random.default_rng(1)
+    x = np.linspace(0, 10, 12)
+    y = 3.2 * x - 1.5 + rng.standard_normal(12)
+    fit = linear_fit(x, y)
+    ref = linregress(x, y)
+    assert fit.slope == pytest.approx(ref.slope, rel=1e-12)
+    assert fit.intercept == pytest.approx(ref.intercept, rel=1e-12)
+    assert fit.r2 == pytest.approx(ref.rvalue ** 2, rel=1e-12)
+    assert fit.slope_se == pytest.approx(ref.stderr, rel=1e-10)
+    assert fit.intercept_se == pytest.approx(ref.intercept_stderr, rel=1e-10)
+
+
+def test_linear_fit_batch_skips_nan():
+    # 批量拟合时每一行独立, NaN的数据点不参与
+    rng = np.random.default_rng(2)
+    x = np.linspace(1, 9, 9)
+    y = np.stack([2 * x + 1, -x + 4, 0.5 * x]) + 0.1 * rng.standard_normal((3, 9))
+    y[1, [2, 7]] = np.nan
+    fit = linear_fit(x, y)
+    for i in range(3):
+        ok = np.isfinite(y[i])
+        ref = linregress(x[ok], y[i, ok])
+        assert fit.slope[i] == pytest.approx(ref.slope, rel=1e-12)
+        assert fit.intercept[i] == pytest.approx(ref.intercept, rel=1e-12)
+        assert fit.n[i] == ok.sum()
+
+
+def test_linear_stats_matches_linear_fit():
+    rng = np.random.default_rng(3)
+    x = np.arange(10, dtype=float)
+    y = 0.7 * x + 2 + rng.standard_normal(10)
+    stats = LinearStats()
+    for xi, yi in zip(x, y):
+        stats.add(xi, yi)
+    stats.add(11.0, float("nan"))
+    incremental, fit = stats.fit(), linear_fit(x, y)
+    for name in ("slope", "intercept", "r2", "slope_se", "intercept_se"):
+        assert getattr(incremental, name) == pytest.approx(getattr(fit, name), rel=1e-9)
+
+
+def test_linear_fit_undetermined_line_has_nan_r2():
+    # 少于2个有效点时直线无法确定, R²为NaN而不是1
+    fit = linear_fit([1.0, 2.0, 3.0], [np.nan, 2.0, np.nan])
+    assert np.isnan(fit.slope) and np.isnan(fit.r2)
+    fit = linear_fit([1.0, 2.0], [3.0, 5.0])
+    assert fit.r2 == 1.0
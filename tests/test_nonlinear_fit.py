@@ -0,0 +1,68 @@
+# This Python file uses the following encoding: utf-8
+import numpy as np
+import pytest
+from scipy.optimize import curve_fit
+
+from fitting import nonlinear_fit, LANGMUIR, FREUNDLICH, PFO, PSO
+
+
+def _data(model, x, p, noise, seed=0):
+    rng = np.random.default_rng(seed)
+    y = model(x, p)
+    return y + noise * np.abs(y).max() * rng.standard_normal(y.shape)
+
+@pytest.mark.parametrize("model, x, p", [
+    (LANGMUIR, np.array([5, 10, 25, 50, 80, 100, 120, 150.0]), np.array([180.0, 0.02])),
+    (FREUNDLICH, np.array([5, 10, 25, 50, 80, 100, 120, 150.0]), np.array([0.6, 8.0])),
+    (PFO, np.array([5, 10, 15, 20, 30, 40, 50, 70, 90.0]), np.array([35.0, 0.05])),
+    (PSO, np.array([5, 10, 15, 20, 30, 40, 50, 70, 90.0]), np.array([40.0, 0.002])),
+])
+def test_nonlinear_fit_matches_curve_fit(model, x, p):
+    y = _data(model, x, p, 0.02)
+    fit = nonlinear_fit(model, x, y)
+    ref, cov = curve_fit(lambda t, *q: model(t, np.array(q)), x, y, p0=fit.params * 1.1)
+    assert fit.converged
+    np.testing.assert_allclose(fit.params, ref, rtol=1e-5)
+    np.testing.assert_allclose(fit.se, np.sqrt(np.diag(cov)), rtol=1e-3)
+
+
+def test_nonlinear_fit_batch_with_padding():
+    # 长度不同的数据集以NaN补齐, 结果与逐个拟合相同
+    t = np.array([5, 10, 15, 20, 30, 40, 50, 70, 90.0])
+    y = np.stack([_data(PFO, t, np.array(p), 0.02, seed) for seed, p in enumerate([(20, 0.05), (35, 0.08), (50, 0.03)])])
+    y[2, -2:] = np.nan
+    fit = nonlinear_fit(PFO, t, y)
+    for i in range(3):
+        ok = np.isfinite(y[i])
+        single = nonlinear_fit(PFO, t[ok], y[i, ok])
+        np.testing.assert_allclose(fit.params[i], single.params, rtol=1e-6)
+        assert fit.n[i] == ok.sum()
+
+
+def test_nonlinear_fit_divergence_is_not_converged():
+    # amino 40 mg/L的q(t)没有上升趋势, PFO的k1发散到无穷大, 不能报告为收敛
+    t = np.array([0, 5, 10, 15, 20, 30, 40, 50, 70, 90.0])
+    qt = np.array([0, -8.16, -7.96, -1.78, -5.62, -5.34, -3.87, -1.94, -5.89, -5.01])
+    assert not nonlinear_fit(PFO, t, qt).converged
+    good = PFO(t, np.array([30.0, 0.05]))
+    fit = nonlinear_fit(PFO, t, np.stack([qt, good]))
+    assert fit.converged.tolist() == [False, True]
+
+
+def test_callers_report_non_convergence():
+    from data_treatment import KineticsData
+
+    t = np.array([0, 5, 10, 15, 20, 30, 40, 50, 70, 90.0])
+    qt = np.stack([[0, -8.16, -7.96, -1.78, -5.62, -5.34, -3.87, -1.94, -5.89, -5.01], PFO(t, np.array([30.0, 0.05]))])
+    table = KineticsData.fit_kinetics(t, qt, models=["pfo"])
+    assert table["converged"].tolist() == [False, True]
+    qe = KineticsData.linearize(t, qt)["qe"]
+    assert np.isnan(qe[0]) and qe[1] == pytest.approx(30)
+
+
+def test_aicc_adds_small_sample_correction():
+    x = np.array([5, 10, 25, 50, 80, 100, 120, 150.0])
+    fit = nonlinear_fit(LANGMUIR, x, _data(LANGMUIR, x, np.array([180.0, 0.02]), 0.02))
+    np.testing.assert_allclose(fit.aicc, fit.aic + 2 * 2 * 3 / (8 - 2 - 1))
+    # 数据点数不多于参数个数+1时没有定义
+    assert np.isnan(nonlinear_fit(LANGMUIR, x[:3], fit.predict(x[:3])).aicc)
@@ -0,0 +1,86 @@
+# This Python file uses the following encoding: utf-8
+import numpy as np
+import pytest
+from scipy import sparse
+from scipy.signal import savgol_filter
+from scipy.sparse.linalg import spsolve
+
+import preprocess
+from preprocess import als_baseline, savgol, poly_baseline, normalise, Preprocessing
+
+
+def _spectra(n=231, samples=4, seed=0):
+    rng = np.random.default_rng(seed)
+    wave_length = np.linspace(470, 700, n)
+    peaks = np.stack([a * np.exp(-((wave_length - c) / 12) ** 2) for a, c in zip(
+        rng.uniform(1e4, 5e4, samples), rng.uniform(500, 650, samples))], axis=1)
+    baseline = (2e3 + 5 * (wave_length - 470))[:, None] * rng.uniform(0.5, 1.5, samples)
+    return wave_length, peaks + baseline + 100 * rng.standard_normal((n, samples))
+
+
+def _als_reference(y, lam, p, iterations):
+    # Eilers & Boelens的稀疏矩阵实现
+    n = len(y)
+    d = sparse.diags([1.0, -2.0, 1.0], [0, 1, 2], shape=(n - 2, n))
+    h = lam * (d.T @ d)
+    w = np.ones(n)
+    for _ in range(iterations):
+        z = spsolve((sparse.diags(w) + h).tocsc(), w * y)
+        w = np.where(y > z, p, 1 - p)
+    return z
+
+
+@pytest.mark.parametrize("batched", [True, False])
+def test_als_baseline_matches_sparse_reference(monkeypatch, batched):
+    monkeypatch.setattr(preprocess, "_BATCHED_BANDED", batched and preprocess._BATCHED_BANDED)
+    _, y = _spectra()
+    z = als_baseline(y, lam=1e5, p=0.01, iterations=10)
+    for i in range(y.shape[1]):
+        ref = _als_reference(y[:, i], 1e5, 0.01, 10)
+        np.testing.assert_allclose(z[:, i], ref, rtol=1e-7, atol=1e-6 * np.abs(ref).max())
+    np.testing.assert_allclose(als_baseline(y[:, 0]), z[:, 0])
+
+
+def test_als_baseline_short_input():
+    np.testing.assert_allclose(als_baseline(np.array([1.0, 2.0, 3.0]), iterations=1),
+                               _als_reference(np.array([1.0, 2.0, 3.0]), 1e5, 0.01, 1), rtol=1e-8)
+    with pytest.raises(ValueError):
+        als_baseline(np.array([1.0, 2.0]))
+
+
+@pytest.mark.parametrize("window, order", [(5, 2), (11, 2), (11, 3), (21, 4)])
+def test_savgol_matches_scipy(window, order):
+    _, y = _spectra()
+    np.testing.assert_allclose(savgol(y, window, order), savgol_filter(y, window, order, axis=0, mode="interp"),
+                               rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(savgol(y[:, 1], window, order),
+                               savgol_filter(y[:, 1], window, order, mode="interp"), rtol=1e-9, atol=1e-6)
+
+
+def test_savgol_rejects_bad_window():
+    with pytest.raises(ValueError):
+        savgol(np.ones(20), 10, 2)
+    with pytest.raises(ValueError):
+        savgol(np.ones(5), 11, 2)
+
+
+def test_poly_baseline_without_iterations_is_least_squares():
+    wave_length, y = _spectra(samples=2)
+    fit = poly_baseline(wave_length, y, order=3, iterations=0)
+    for i in range(2):
+        ref = np.polyval(np.polyfit(wave_length, y[:, i], 3), wave_length)
+        np.testing.assert_allclose(fit[:, i], ref, rtol=1e-8)
+
+
+def test_normalise_and_pipeline():
+    wave_length, y = _spectra()
+    np.testing.assert_allclose(normalise(wave_length, y, "max").max(axis=0), 1.0)
+    np.testing.assert_allclose(np.linalg.norm(normalise(wave_length, y, "vector"), axis=0), 1.0)
+    snv = normalise(wave_length, y, "snv")
+    np.testing.assert_allclose(snv.mean(axis=0), 0.0, atol=1e-12)
+    with pytest.raises(ValueError):
+        normalise(wave_length, y, "median")
+    result = Preprocessing(smooth_window=11, baseline="als", normalise="area").apply(wave_length, y)
+    assert result.shape == y.shape and np.all(np.isfinite(result))
+    with pytest.raises(ValueError):
+        Preprocessing(baseline="rubberband").apply(wave_length, y)
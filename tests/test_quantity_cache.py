@@ -0,0 +1,87 @@
+# This Python file uses the following encoding: utf-8
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from data_treatment import Adsorption, KineticsData, QuantityCache, SpectrumCache
+from preprocess import Preprocessing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WATER = os.path.join(ROOT, "water.csv")
+TIMES = [5, 10, 15, 20, 30, 40, 50, 70, 90]
+ARGS = (526, 6616.0355, 40394.1147, 0.02, 0.1, 0.004)
+
+
+@pytest.fixture
+def paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(SpectrumCache, "root", None)
+    QuantityCache.clear()
+    SpectrumCache.clear()
+    result = []
+    for t in TIMES:
+        result.append(str(tmp_path / ("70-%s.csv" % t)))
+        shutil.copy(os.path.join(ROOT, "amino_adsorption", "70-%s.csv" % t), result[-1])
+    yield result
+    QuantityCache.clear()
+    SpectrumCache.clear()
+
+
+def _quantity(paths, *args, **kwargs):
+    return Adsorption.adsorption_quantity(70, paths, *(args or ARGS), **kwargs)
+
+
+def test_pfo_pso_ipd_share_one_computation(paths):
+    qt = _quantity(paths, blank=WATER)
+    KineticsData.kinetics_pfo_y(70, paths, *ARGS, qe=100, blank=WATER)
+    KineticsData.kinetics_pso_y(70, paths, *ARGS, t=[0] + TIMES, blank=WATER)
+    assert (QuantityCache.hits, QuantityCache.misses) == (2, 1)
+    assert _quantity(paths, blank=WATER) == qt
+
+
+def test_changed_inputs_miss(paths):
+    _quantity(paths, blank=WATER)
+    _quantity(paths, 526, 6616.0355, 40394.1147, 0.03, 0.1, 0.004, blank=WATER)
+    _quantity(paths, blank=WATER, preprocessing=Preprocessing(smooth_window=11))
+    _quantity(paths, blank=paths[0])
+    assert (QuantityCache.hits, QuantityCache.misses) == (0, 4)
+
+
+def test_rewritten_file_invalidates(paths):
+    before = _quantity(paths, blank=WATER)
+    stat = os.stat(paths[3])
+    shutil.copy(paths[-1], paths[3])
+    os.utime(paths[3], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    after = _quantity(paths, blank=WATER)
+    assert QuantityCache.misses == 2
+    assert after[3 + 1] != before[3 + 1]
+    assert after[:4] == before[:4]
+
+
+def test_cached_result_is_read_only_and_disabled_cache_recomputes(paths, monkeypatch):
+    key = QuantityCache.key(70, paths, *ARGS, WATER)
+    quantity = QuantityCache.get(key, lambda: np.arange(3.0))
+    assert not quantity.flags.writeable
+    assert QuantityCache.get(key, lambda: np.zeros(3)) is quantity
+    monkeypatch.setattr(QuantityCache, "enabled", False)
+    assert QuantityCache.get(key, lambda: np.zeros(3)).tolist() == [0, 0, 0]
+
+
+def test_cache_is_bounded(paths, monkeypatch):
+    monkeypatch.setattr(QuantityCache, "limit", 2)
+    first = QuantityCache.get("a", lambda: np.zeros(1))
+    QuantityCache.get("b", lambda: np.ones(1))
+    # 命中后"a"成为最近使用的, 超出上限时丢弃"b"
+    QuantityCache.get("a", lambda: np.ones(1))
+    QuantityCache.get("c", lambda: np.ones(1))
+    assert list(QuantityCache._results) == ["a", "c"]
+    assert QuantityCache.get("a", lambda: np.ones(1)) is first
+
+
+def test_concurrent_callers_share_one_result(paths):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda i: QuantityCache.get("k", lambda: np.full(3, i)), range(32)))
+    assert all(r is results[0] for r in results)
+    assert QuantityCache.hits + QuantityCache.misses == 32
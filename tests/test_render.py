@@ -0,0 +1,41 @@
+# This Python file uses the following encoding: utf-8
+import os
+import threading
+
+import pytest
+
+from operation_model import Kinetics, Render
+
+
+@pytest.fixture
+def headless(monkeypatch):
+    monkeypatch.setattr(Render, "headless", True)
+    Render.close()
+    yield
+    Render.close()
+
+
+def _plot(path):
+    t = [5, 10, 20, 40, 60]
+    Kinetics.kinetics_ipd(t, [1.0, 2.0, 2.5, 3.1, 3.3], "amino", "English", [0, 70], [0, 4], path)
+
+
+def test_close_saves_figures_and_releases_templates(headless, tmp_path):
+    paths = [str(tmp_path / ("ipd_%d.png" % i)) for i in range(4)]
+    _plot(paths[0])
+    # 每个线程各自构建一份模板
+    threads = [threading.Thread(target=_plot, args=(p,)) for p in paths[1:]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(Render._all_templates) == 4
+    templates = list(Render._all_templates)
+    Render.close()
+    assert all(os.path.getsize(p) > 0 for p in paths)
+    assert Render._writer is None and Render._all_templates == []
+    assert all(t == {} for t in templates)
+    # close之后可以继续绘图
+    _plot(paths[0])
+    Render.flush()
+    assert len(Render._all_templates) == 1
@@ -0,0 +1,74 @@
+# This Python file uses the following encoding: utf-8
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from results import ResultSink, sheet_names, _long, _wide
+
+
+@pytest.fixture(params=["parquet", "csv"])
+def sink(request, tmp_path, monkeypatch):
+    if request.param == "parquet":
+        pytest.importorskip("pyarrow")
+    monkeypatch.setattr(ResultSink, "root", str(tmp_path))
+    monkeypatch.setattr(ResultSink, "format", request.param)
+    monkeypatch.setattr(ResultSink, "excel", False)
+    yield request.param
+    ResultSink.close()
+
+
+def test_long_keeps_text_cells():
+    table = pd.DataFrame({"model": ["pfo", "pso"], "qe": [1.5, np.nan], "flag": [True, False]})
+    frame = _long(table)
+    assert frame.loc[frame["column"] == "model", "text"].tolist() == ["pfo", "pso"]
+    assert frame.loc[frame["column"] == "qe", "text"].isna().all()
+    wide = _wide(frame)
+    assert wide["model"].tolist() == ["pfo", "pso"]
+    np.testing.assert_allclose(wide["qe"], [1.5, np.nan])
+
+
+def test_round_trip_and_last_write_wins(sink, tmp_path):
+    models = pd.DataFrame({"series": [40, 70], "model": ["pfo", "pso"], "r2": [0.98, 0.99]})
+    ResultSink.put("M_1\\2st\\20220702", "amino/models", models)
+    ResultSink.put("M_1\\2st\\20220702", "amino/70_quantity", [0.0, 1.5, 2.5])
+    ResultSink.flush()
+    # 之后的批次追加为新的分片, 同名的表以最后一次为准
+    ResultSink.put("M_1\\2st\\20220702", "amino/70_quantity", [0.0, 3.0])
+    result = ResultSink.read("M_1/2st/20220702", "amino/models")
+    assert result["model"].tolist() == ["pfo", "pso"]
+    np.testing.assert_allclose(result["r2"], [0.98, 0.99])
+    assert ResultSink.read("M_1/2st/20220702", "amino/70_quantity").iloc[:, 0].tolist() == [0.0, 3.0]
+    folder = ResultSink.path("M_1/2st/20220702") + "." + sink
+    assert len(os.listdir(folder)) == 2
+    assert set(ResultSink.read("M_1/2st/20220702")["table"]) == {"amino/models", "amino/70_quantity"}
+
+
+def test_root_argument_overrides_default(sink, tmp_path):
+    ResultSink.put("run", "t", [[1, 2]], root=str(tmp_path / "elsewhere"))
+    assert ResultSink.read("run", "t", root=str(tmp_path / "elsewhere")).values.tolist() == [[1, 2]]
+    assert not os.path.exists(ResultSink.directory("run"))
+
+
+def test_sheet_names_are_unique():
+    names = sheet_names(["amino/" + "x" * 40, "carboxyl/" + "x" * 40, "a/b", "A_b", "p[1]:q"])
+    assert all(len(n) <= 31 for n in names)
+    assert len({n.lower() for n in names}) == len(names)
+    assert names[2] == "a_b" and names[3] == "A_b~2" and names[4] == "p_1__q"
+
+
+def test_excel_export(tmp_path, monkeypatch):
+    pytest.importorskip("openpyxl")
+    monkeypatch.setattr(ResultSink, "root", str(tmp_path))
+    monkeypatch.setattr(ResultSink, "format", "csv")
+    monkeypatch.setattr(ResultSink, "excel", True)
+    long_name = "amino/" + "q" * 40
+    ResultSink.put("run", long_name + "/a", [1.0, 2.0])
+    ResultSink.put("run", long_name + "/b", pd.DataFrame({"model": ["langmuir"]}))
+    ResultSink.close()
+    sheets = pd.read_excel(ResultSink.path("run") + ".xlsx", sheet_name=None, index_col=0)
+    assert len(sheets) == 2
+    a, b = sheets.values()
+    assert a.iloc[:, 0].tolist() == [1.0, 2.0]
+    assert b["model"].tolist() == ["langmuir"]
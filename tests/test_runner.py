@@ -0,0 +1,75 @@
+# This Python file uses the following encoding: utf-8
+import os
+import threading
+
+import pytest
+
+import runner
+from runner import Stage, StageFailed, execute
+from synthetic import generate
+
+
+def test_failure_skips_only_dependents():
+    calls = []
+
+    def fail():
+        raise RuntimeError("boom")
+
+    def record(name):
+        def func(*args):
+            calls.append(name)
+            return name
+        return func
+
+    stages = [Stage("a", fail), Stage("b", record("b"), ("a",)), Stage("c", record("c"), ("b",)),
+              Stage("d", record("d")), Stage("e", record("e"), ("d",))]
+    results = execute(stages, workers=2)
+    assert isinstance(results["a"], StageFailed) and isinstance(results["a"].error, RuntimeError)
+    # 失败沿依赖传递, 结果中指向最初失败的阶段
+    assert results["b"] is results["a"] and results["c"] is results["a"]
+    assert results["d"] == "d" and results["e"] == "e"
+    assert sorted(calls) == ["d", "e"]
+
+
+def test_results_flow_to_dependents_and_main_thread_stages():
+    main = threading.current_thread()
+    stages = [Stage("x", lambda: 2), Stage("y", lambda: 3), Stage("sum", lambda x, y: x + y, ("x", "y")),
+              Stage("plot", lambda s: threading.current_thread() is main and s, ("sum",), main_thread=True)]
+    results = execute(stages, workers=4)
+    assert results["sum"] == 5 and results["plot"] == 5
+
+
+def test_invalid_graphs_raise():
+    with pytest.raises(ValueError):
+        execute([Stage("a", lambda b: b, ("missing",))])
+    with pytest.raises(ValueError):
+        execute([Stage("a", lambda b: b, ("b",)), Stage("b", lambda a: a, ("a",))])
+
+
+def test_run_reports_failed_stages(tmp_path):
+    # 缺少一个标准曲线文件: 该材料的标准曲线及其下游阶段失败, 其余阶段与结果文件照常生成
+    generate(str(tmp_path), [5, 25, 50, 100], [40, 70], [5, 10, 20, 40])
+    manifest = str(tmp_path / "manifest.json")
+    results = runner.run(manifest, figures=False, output=str(tmp_path / "out"))
+    assert not any(isinstance(r, StageFailed) for r in results.values())
+    assert os.path.isdir(tmp_path / "out" / "manifest" / "results.parquet")
+
+    os.remove(tmp_path / "amino" / "25.csv")
+    results = runner.run(manifest, figures=False)
+    failed = {name for name, r in results.items() if isinstance(r, StageFailed)}
+    assert "amino/calibration" in failed and "amino/kinetics" in failed and "isotherms" in failed
+    assert "blank" not in failed
+    assert runner.main([manifest, "--no-figures"]) == 1
+
+
+def test_manifest_bootstrap_flag_controls_intervals(tmp_path):
+    generate(str(tmp_path), [5, 25, 50, 100], [40, 70], [5, 10, 20, 40])
+    manifest = runner.load_manifest(str(tmp_path / "manifest.json"))
+    # 默认计算置信区间; "bootstrap"为整数时为重抽样次数, 为false时不计算
+    results = runner.execute(runner.build_stages(dict(manifest, bootstrap=200), str(tmp_path), figures=False))
+    assert "a_ci" in results["amino/calibration_ci"]
+    assert "k1_low" in results["amino/kinetics"]["models"][0]
+    results = runner.execute(runner.build_stages(dict(manifest, bootstrap=False), str(tmp_path), figures=False))
+    assert "amino/calibration_ci" not in results
+    assert "k1_low" not in results["amino/kinetics"]["models"][0]
+    assert "amino/calibration_ci" in {s.name for s in runner.build_stages(manifest, str(tmp_path), figures=False)}
@@ -0,0 +1,41 @@
+# This Python file uses the following encoding: utf-8
+import numpy as np
+
+from operation_model import Render, sample_curve
+
+
+def _pixels():
+    return Render.figsize[0] * Render.dpi, Render.figsize[1] * Render.dpi
+
+
+def test_sample_curve_within_tolerance():
+    # 对二次曲线, 弦的最大偏差正好在区间中点, 折线与曲线的偏差不超过tolerance个像素
+    width, height = _pixels()
+    x_limit, y_limit = [0, 10], [0, 100]
+    x, y = sample_curve(lambda t: t ** 2, 0, 10, x_limit, y_limit, tolerance=0.25)
+    assert x[0] == 0 and x[-1] == 10 and np.all(np.diff(x) > 0)
+    np.testing.assert_allclose(y, x ** 2)
+    assert len(x) <= width
+    dense = np.linspace(0, 10, 20001)
+    deviation = np.abs(np.interp(dense, x, y) - dense ** 2) * height / (y_limit[1] - y_limit[0])
+    assert deviation.max() <= 0.25 + 1e-9
+    # 容差越小, 点数越多
+    assert len(sample_curve(lambda t: t ** 2, 0, 10, x_limit, y_limit, tolerance=0.05)[0]) > len(x)
+
+
+def test_sample_curve_straight_line_not_refined():
+    x, _ = sample_curve(lambda t: 2 * t + 1, 0, 10, initial=17)
+    assert len(x) == 17
+
+
+def test_sample_curve_nan_domain():
+    # 定义域之外为NaN(如ln(Ce)), 边界处加密到一个像素以内, 不抛出异常
+    width, _ = _pixels()
+    with np.errstate(invalid="ignore"):
+        x, y = sample_curve(np.sqrt, -1, 1, [-1, 1], [0, 1])
+    finite = np.isfinite(y)
+    assert np.all(x[finite] >= 0) and np.all(np.isnan(y[x < 0]))
+    # 最后一个NaN点与第一个有限点之间不超过一个像素
+    edge = np.flatnonzero(finite)[0]
+    assert (x[edge] - x[edge - 1]) * width / 2 <= 1.0
+    assert len(x) <= width
@@ -0,0 +1,151 @@
+# This Python file uses the following encoding: utf-8
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from data_treatment import Blank, SpectrumCache
+from emscan import read_scan
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE = os.path.join(ROOT, "amino", "50.csv")
+OTHER = os.path.join(ROOT, "amino", "80.csv")
+
+
+@pytest.fixture
+def scan_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(SpectrumCache, "root", None)
+    monkeypatch.setattr(SpectrumCache, "enabled", True)
+    monkeypatch.setattr(SpectrumCache, "by_content", False)
+    SpectrumCache.clear()
+    path = tmp_path / "50.csv"
+    shutil.copy(SOURCE, path)
+    yield str(path)
+    SpectrumCache.clear()
+
+
+def _cache_files(path):
+    return sorted(os.listdir(SpectrumCache.cache_dir(os.path.dirname(path))))
+
+
+def _rewrite(path, source):
+    # 改写文件内容并推后修改时间, 缓存键随之改变
+    stat = os.stat(path)
+    shutil.copy(source, path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_load_matches_parser_and_writes_disk_cache(scan_file):
+    scan = SpectrumCache.load(scan_file)
+    np.testing.assert_array_equal(scan.intensity, read_scan(scan_file).intensity)
+    assert not scan.intensity.flags.writeable
+    key = SpectrumCache.key(scan_file)
+    assert _cache_files(scan_file) == [key + ".json", key + ".npy"]
+    # 进程内缓存命中时返回同一个对象
+    assert SpectrumCache.load(scan_file) is scan
+
+
+def test_disk_cache_is_used_after_clearing_memory(scan_file, monkeypatch):
+    expected = SpectrumCache.load(scan_file).intensity.copy()
+    SpectrumCache.clear()
+
+    def fail(path):
+        raise AssertionError("parsed again")
+
+    monkeypatch.setattr(SpectrumCache, "parse", staticmethod(fail))
+    np.testing.assert_array_equal(SpectrumCache.load(scan_file).intensity, expected)
+
+
+def test_rewritten_file_invalidates_cache(scan_file):
+    old = SpectrumCache.load(scan_file).intensity.copy()
+    old_key = SpectrumCache.key(scan_file)
+    _rewrite(scan_file, OTHER)
+    assert SpectrumCache.key(scan_file) != old_key
+    new = SpectrumCache.load(scan_file).intensity
+    np.testing.assert_array_equal(new, read_scan(OTHER).intensity)
+    assert not np.array_equal(new, old)
+
+
+def test_content_key_ignores_mtime(scan_file, monkeypatch):
+    monkeypatch.setattr(SpectrumCache, "by_content", True)
+    key = SpectrumCache.key(scan_file)
+    stat = os.stat(scan_file)
+    os.utime(scan_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert SpectrumCache.key(scan_file) == key
+    _rewrite(scan_file, OTHER)
+    assert SpectrumCache.key(scan_file) != key
+
+
+def test_prune_removes_stale_entries(scan_file, monkeypatch):
+    SpectrumCache.load(scan_file)
+    old_key = SpectrumCache.key(scan_file)
+    _rewrite(scan_file, OTHER)
+    SpectrumCache.load(scan_file)
+    cache = SpectrumCache.cache_dir(os.path.dirname(scan_file))
+    # 写入失败留下的临时文件与没有.json的.npy
+    for name in ("x.npy.1.2.tmp", "orphan.npy"):
+        with open(os.path.join(cache, name), "wb") as f:
+            f.write(b"0")
+        os.utime(os.path.join(cache, name), (time.time() - 7200,) * 2)
+    assert SpectrumCache.prune(os.path.dirname(scan_file)) == 3
+    key = SpectrumCache.key(scan_file)
+    assert _cache_files(scan_file) == [key + ".json", key + ".npy"]
+    assert old_key + ".npy" not in _cache_files(scan_file)
+    # 数据文件删除后其缓存也被清理
+    os.remove(scan_file)
+    assert SpectrumCache.prune(os.path.dirname(scan_file)) == 1
+    assert _cache_files(scan_file) == []
+
+
+def test_failed_write_leaves_no_temporary_file(scan_file, monkeypatch):
+    def full(f, array):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(np, "save", full)
+    scan = SpectrumCache.load(scan_file)
+    np.testing.assert_array_equal(scan.intensity, read_scan(scan_file).intensity)
+    assert _cache_files(scan_file) == []
+
+
+def test_memory_cache_is_bounded(scan_file, tmp_path, monkeypatch):
+    monkeypatch.setattr(SpectrumCache, "memory_limit", 2)
+    paths = []
+    for name in ("a", "b", "c"):
+        paths.append(str(tmp_path / (name + ".csv")))
+        shutil.copy(SOURCE, paths[-1])
+    first = SpectrumCache.load(paths[0])
+    SpectrumCache.load(paths[1])
+    SpectrumCache.load(paths[2])
+    assert len(SpectrumCache._memory) == 2
+    assert SpectrumCache.load(paths[0]) is not first
+
+
+def test_disabled_cache_parses_every_time(scan_file, monkeypatch):
+    monkeypatch.setattr(SpectrumCache, "enabled", False)
+    assert SpectrumCache.load(scan_file) is not SpectrumCache.load(scan_file)
+    assert not os.path.exists(SpectrumCache.cache_dir(os.path.dirname(scan_file)))
+
+
+def test_concurrent_loads_prune_once_and_share_blank(scan_file, monkeypatch):
+    calls = []
+    prune = SpectrumCache.prune.__func__
+
+    def counted(cls, path=None, cache=None):
+        calls.append(cache)
+        return prune(cls, path, cache)
+
+    monkeypatch.setattr(SpectrumCache, "prune", classmethod(counted))
+    Blank.clear()
+    paths = [scan_file]
+    for name in ("a", "b", "c"):
+        paths.append(os.path.join(os.path.dirname(scan_file), name + ".csv"))
+        shutil.copy(SOURCE, paths[-1])
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(SpectrumCache.load, paths * 4))
+        blanks = list(pool.map(Blank.get, [scan_file] * 16))
+    assert calls == [SpectrumCache.cache_dir(os.path.dirname(scan_file))]
+    assert all(b is blanks[0] for b in blanks)
+    Blank.clear()
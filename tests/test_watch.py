@@ -0,0 +1,87 @@
+# This Python file uses the following encoding: utf-8
+import json
+import math
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from data_treatment import Adsorption, Plastic
+from fitting import linear_fit
+from watch import Series, Watcher
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WATER = os.path.join(ROOT, "water.csv")
+TIMES = [5, 10, 15, 20, 30, 40, 50, 70, 90]
+A, B, MASS, VOLUME, SAMPLE = 6616.0355, 40394.1147, 0.02, 0.1, 0.004
+
+
+def _intensity(c0=70):
+    paths = [os.path.join(ROOT, "amino_adsorption", "%s-%s.csv" % (c0, t)) for t in TIMES]
+    return Plastic.intensity_at(paths, 526, WATER)
+
+
+def _check(series, qe=None):
+    # 增量维护的拟合结果与对全部数据重新拟合相同
+    t = np.asarray(series.times, dtype=float)
+    q = np.asarray(series.qt)
+    expected = Adsorption.quantity_matrix(series.intensity, series.init_concentration, A, B, MASS, VOLUME,
+                                          SAMPLE)[0, 1:]
+    np.testing.assert_allclose(q, expected, rtol=1e-10)
+    references = {"pso": linear_fit(t, t / q), "ipd": linear_fit(np.around(np.sqrt(t), 1), q)}
+    if qe is not None:
+        with np.errstate(invalid="ignore"):
+            references["pfo"] = linear_fit(t, np.log(qe - q))
+    fits = series.linear_fits()
+    assert set(fits) == set(references)
+    for name, ref in references.items():
+        for field in ("slope", "intercept", "r2"):
+            assert getattr(fits[name], field) == pytest.approx(float(getattr(ref, field)), rel=1e-8, nan_ok=True)
+
+
+def test_incremental_fits_match_full_refit():
+    y = _intensity()
+    series = Series(70, A, B, MASS, VOLUME, SAMPLE, pfo_qe=-1.0)
+    for t, value in zip(TIMES, y):
+        assert series.add(t, value)
+    _check(series, qe=-1.0)
+    assert series.fits()["pso"]["n"] == len(TIMES)
+
+
+def test_out_of_order_and_rewritten_points_rebuild():
+    y = _intensity()
+    order = [0, 1, 2, 5, 3, 4, 6, 8, 7]
+    series = Series(70, A, B, MASS, VOLUME, SAMPLE)
+    incremental = [series.add(TIMES[i], y[i]) for i in order]
+    assert incremental == [True, True, True, True, False, False, True, True, False]
+    assert series.times == TIMES
+    _check(series)
+    # 同一时间点被重写时替换原来的值
+    assert not series.add(TIMES[3], y[3] * 1.1)
+    assert series.intensity[3] == pytest.approx(y[3] * 1.1)
+    _check(series)
+
+
+def test_watcher_skips_incomplete_files(tmp_path):
+    incoming, output = tmp_path / "in", tmp_path / "out"
+    incoming.mkdir()
+    watcher = Watcher(str(incoming), 526, A, B, MASS, VOLUME, SAMPLE, blank=WATER, output=str(output))
+    source = [os.path.join(ROOT, "amino_adsorption", "70-%s.csv" % t) for t in TIMES[:3]]
+    for path in source[:2]:
+        shutil.copy(path, incoming)
+    assert watcher.poll() == [70.0]
+    # 仪器尚未写完的文件留到下次
+    with open(source[2], encoding="utf-8") as f:
+        text = f.read()
+    target = incoming / os.path.basename(source[2])
+    target.write_text(text[:-12], encoding="utf-8")
+    assert watcher.poll() == []
+    target.write_text(text, encoding="utf-8")
+    assert watcher.poll() == [70.0]
+    assert watcher.poll() == []
+    with open(output / "70.json", encoding="utf-8") as f:
+        result = json.load(f)
+    assert result["t"] == TIMES[:3]
+    np.testing.assert_allclose(result["qt"], watcher.series[70.0].qt)
+    assert math.isclose(result["fits"]["ipd"]["slope"], watcher.series[70.0].linear_fits()["ipd"].slope)
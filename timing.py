@@ -0,0 +1,177 @@
+# This Python file uses the following encoding: utf-8
+"""
+各处理环节的计时: 以单调时钟记录文件解析、空白扣除、标准曲线拟合、q(t)、动力学/等温线拟合、绘图与保存等阶段的时间段,
+附带文件数、字节数等计数, 可导出为JSON或Chrome trace文件(在chrome://tracing或Perfetto中查看); 未启用时几乎没有开销
+
+    SR_TIMING=1 python plot.py
+    python runner.py manifest.json --trace trace.json
+"""
+import json
+import os
+import threading
+import time
+from typing import NamedTuple
+
+
+class Span(NamedTuple):
+    """
+    :description: 一个已结束的时间段, start为time.perf_counter()的读数(秒)
+    """
+    name: str
+    category: str
+    start: float
+    duration: float
+    pid: int
+    thread: int
+    thread_name: str
+    args: dict
+
+
+class _NullSpan(object):
+    # 未启用计时时所有span共用的空对象, 布尔值为False, 调用方可据此跳过计数的计算
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __bool__(self):
+        return False
+
+    def add(self, **counts):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _ActiveSpan(object):
+    __slots__ = ("name", "category", "args", "_start")
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._start
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        thread = threading.current_thread()
+        Timing.record(Span(self.name, self.category, self._start, duration, os.getpid(), thread.ident,
+                           thread.name, self.args))
+        return False
+
+    def add(self, **counts):
+        # 累加计数(files、bytes等)
+        for key, value in counts.items():
+            self.args[key] = self.args.get(key, 0) + value
+
+
+class Timing(object):
+    """
+    :description: 时间段的收集与导出; 进程池子进程中的时间段留在子进程内, 不汇总到主进程
+    """
+    # 可用环境变量SR_TIMING=1启用
+    enabled = os.environ.get("SR_TIMING", "") not in ("", "0")
+    _spans = []
+    _lock = threading.Lock()
+    # 导出时以此为0时刻
+    _origin = time.perf_counter()
+
+    @classmethod
+    def enable(cls, enabled=True):
+        cls.enabled = enabled
+
+    @classmethod
+    def span(cls, name, category="stage", **args):
+        """
+        :description: 记录一个时间段, 用法: with Timing.span("parse", "io", files=1) as span: ...
+        :param name: 阶段名
+        :param category: 类别(io/compute/fit/render/stage)
+        :param args: 附带的计数或说明, 可在with块内用span.add继续累加
+        :return: 上下文管理器; 未启用时为共用的空对象
+        """
+        if not cls.enabled:
+            return _NULL_SPAN
+        return _ActiveSpan(name, category, args)
+
+    @classmethod
+    def record(cls, span):
+        with cls._lock:
+            cls._spans.append(span)
+
+    @classmethod
+    def spans(cls):
+        with cls._lock:
+            return list(cls._spans)
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._spans = []
+            cls._origin = time.perf_counter()
+
+    @classmethod
+    def summary(cls):
+        """
+        :description: 按阶段名汇总
+        :return: {阶段名: {"category", "count", "total", "mean", "max", 以及各计数的合计}}, 按总时间从大到小排列
+        """
+        table = {}
+        for span in cls.spans():
+            row = table.setdefault(span.name, {"category": span.category, "count": 0, "total": 0.0, "max": 0.0})
+            row["count"] += 1
+            row["total"] += span.duration
+            row["max"] = max(row["max"], span.duration)
+            for key, value in span.args.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    row[key] = row.get(key, 0) + value
+        for row in table.values():
+            row["mean"] = row["total"] / row["count"]
+        return dict(sorted(table.items(), key=lambda item: -item[1]["total"]))
+
+    @classmethod
+    def report(cls):
+        # 打印汇总表, 替代原来每个绘图函数的start/end时间
+        summary = cls.summary()
+        if not summary:
+            return
+        print("%-28s %-8s %6s %10s %10s %8s %12s" % ("stage", "category", "count", "total(s)", "mean(ms)", "files",
+                                                    "bytes"))
+        for name, row in summary.items():
+            print("%-28s %-8s %6d %10.4f %10.3f %8s %12s" % (name, row["category"], row["count"], row["total"],
+                                                           row["mean"] * 1000, row.get("files", ""),
+                                                           row.get("bytes", "")))
+
+    @classmethod
+    def to_json(cls, path):
+        """
+        :description: 导出全部时间段与汇总, 时间以秒为单位, start为相对于Timing._origin的时刻
+        """
+        spans = [dict(span._asdict(), start=span.start - cls._origin) for span in cls.spans()]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"spans": spans, "summary": cls.summary()}, f, ensure_ascii=False, indent=2, default=str)
+
+    @classmethod
+    def to_chrome_trace(cls, path):
+        """
+        :description: 导出Chrome trace事件格式("X"完整事件, 时间单位为微秒), 每个线程一行
+        """
+        events = []
+        threads = {}
+        for span in cls.spans():
+            threads[(span.pid, span.thread)] = span.thread_name
+            events.append({"name": span.name, "cat": span.category, "ph": "X", "pid": span.pid, "tid": span.thread,
+                           "ts": (span.start - cls._origin) * 1e6, "dur": span.duration * 1e6, "args": span.args})
+        for (pid, tid), name in threads.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False, default=str)
@@ -0,0 +1,266 @@
+# This Python file uses the following encoding: utf-8
+"""
+吸附实验进行中监视数据目录, 荧光仪每写出一个时间点的数据文件(<初始浓度>-<时间>.csv),
+只解析这一个文件, 增量更新q(t)与动力学拟合, 并只重绘对应初始浓度的图片
+
+    python watch.py amino_adsorption --a 6616.0355 --b 40394.1147 --kind amino --output results/watch
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import re
+import time
+
+import numpy as np
+
+from data_treatment import Blank, Adsorption, SpectrumCache
+from emscan import pick
+from fitting import LinearStats
+
+logger = logging.getLogger(__name__)
+
+# 数据文件名: <初始浓度>-<时间>.csv
+FILE_PATTERN = re.compile(r"^(?P<c0>\d+(?:\.\d+)?)-(?P<t>\d+(?:\.\d+)?)\.csv$")
+
+
+class Series(object):
+    """
+    :description: 一个初始浓度的时间梯度数据; 保存q(t)计算所需的累计量和各线性化模型的充分统计量,
+                  新的时间点只需O(1)的计算
+    """
+    def __init__(self, init_concentration, a, b, mass, init_volume, sample, pfo_qe=None):
+        self.init_concentration = init_concentration
+        self.a = a
+        self.b = b
+        self.mass = mass
+        self.init_volume = init_volume
+        self.sample = sample
+        # PFO的线性化需要给定的qe, 未给出时不做PFO
+        self.pfo_qe = pfo_qe
+        self.times = []
+        self.intensity = []
+        self.qt = []
+        self._reset()
+
+    def _reset(self):
+        self.concentration_sum = 0.0
+        self.stats = {"pso": LinearStats(), "ipd": LinearStats()}
+        if self.pfo_qe is not None:
+            self.stats["pfo"] = LinearStats()
+
+    def _accumulate(self, t, qt):
+        # 各线性化模型加入一个数据点
+        self.stats["pso"].add(t, t / qt if qt != 0 else float("nan"))
+        self.stats["ipd"].add(round(math.sqrt(t), 1), qt)
+        if "pfo" in self.stats:
+            self.stats["pfo"].add(t, math.log(self.pfo_qe - qt) if self.pfo_qe > qt else float("nan"))
+
+    def add(self, t, intensity):
+        """
+        :description: 加入一个时间点; 时间晚于已有数据时增量更新, 否则按时间重新排序后整体重算
+        :param t: 时间(min)
+        :param intensity: 扣除空白后激发波长处的荧光强度
+        :return: 是否为增量更新
+        """
+        if self.times and t <= self.times[-1]:
+            if t in self.times:
+                self.intensity[self.times.index(t)] = intensity
+            else:
+                self.times.append(t)
+                self.intensity.append(intensity)
+            self._rebuild()
+            return False
+        # 第k个时间点测定时, 锥形瓶中已被取出k-1次样品
+        k = len(self.times) + 1
+        ct = (intensity - self.b) / self.a
+        qt = (self.init_volume * self.init_concentration - (self.init_volume - (k - 1) * self.sample) * ct
+              - self.sample * self.concentration_sum) / self.mass
+        self.concentration_sum += ct
+        self.times.append(t)
+        self.intensity.append(intensity)
+        self.qt.append(qt)
+        self._accumulate(t, qt)
+        return True
+
+    def _rebuild(self):
+        order = np.argsort(self.times)
+        self.times = [self.times[i] for i in order]
+        self.intensity = [self.intensity[i] for i in order]
+        q = Adsorption.quantity_matrix(self.intensity, self.init_concentration, self.a, self.b, self.mass,
+                                       self.init_volume, self.sample)[0, 1:]
+        self.qt = q.tolist()
+        self._reset()
+        self.concentration_sum = float(np.sum((np.asarray(self.intensity) - self.b) / self.a))
+        for t, qt in zip(self.times, self.qt):
+            self._accumulate(t, qt)
+
+    def linear_fits(self):
+        # 各线性化模型当前的拟合结果(LinearFit), 由充分统计量直接得到
+        return {name: stats.fit() for name, stats in self.stats.items()}
+
+    def fits(self):
+        # 各线性化模型当前的拟合结果, 保存为JSON
+        return {name: {"slope": fit.slope, "intercept": fit.intercept, "r2": fit.r2, "n": fit.n}
+                for name, fit in self.linear_fits().items()}
+
+
+class Watcher(object):
+    """
+    :description: 轮询数据目录, 处理新到达的数据文件
+    """
+    def __init__(self, directory, excitation_wave_length, a, b, mass, init_volume, sample, blank=None,
+                 kind=None, key="English", output=None, pfo_qe=None, figures=True):
+        self.directory = directory
+        self.excitation_wave_length = excitation_wave_length
+        self.a = a
+        self.b = b
+        self.mass = mass
+        self.init_volume = init_volume
+        self.sample = sample
+        # 空白对照只读取一次
+        self.blank = Blank.get(blank)
+        self.kind = kind
+        self.key = key
+        self.output = output
+        self.pfo_qe = pfo_qe
+        self.figures = figures and kind is not None
+        self.series = {}
+        # 已处理的文件 --> (大小, 修改时间), 文件被重写时重新处理
+        self._seen = {}
+
+    def scan(self):
+        """
+        :description: 找出新到达或被重写的数据文件
+        :return: [(路径, 初始浓度, 时间, (文件大小, 修改时间))], 按时间排序
+        """
+        found = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                match = FILE_PATTERN.match(entry.name)
+                if not match or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                if self._seen.get(entry.path) == (stat.st_size, stat.st_mtime_ns):
+                    continue
+                found.append((entry.path, float(match.group("c0")), float(match.group("t")),
+                              (stat.st_size, stat.st_mtime_ns)))
+        found.sort(key=lambda item: item[2])
+        return found
+
+    def poll(self):
+        """
+        :description: 处理一次新到达的数据文件, 尚未写完的文件(数据点数与元数据头不符)留到下次
+        :return: 被更新的初始浓度列表
+        """
+        updated = []
+        for path, c0, t, signature in self.scan():
+            start = time.perf_counter()
+            try:
+                intensity = self.intensity(path)
+            except (ValueError, IndexError, OSError) as error:
+                logger.debug("%s not ready: %s", path, error)
+                continue
+            self._seen[path] = signature
+            series = self.series.get(c0)
+            if series is None:
+                series = Series(c0, self.a, self.b, self.mass, self.init_volume, self.sample, self.pfo_qe)
+                self.series[c0] = series
+            incremental = series.add(t, intensity)
+            if c0 not in updated:
+                updated.append(c0)
+            logger.info("c0=%g t=%g q=%.4f (%s, %.1f ms)", c0, t, series.qt[series.times.index(t)],
+                        "incremental" if incremental else "rebuilt", (time.perf_counter() - start) * 1000)
+        for c0 in updated:
+            self.publish(c0)
+        return updated
+
+    def intensity(self, path):
+        """
+        :description: 直接解析新到达的数据文件(不经过缓存, 以免缓存尚未写完的文件), 取出激发波长处扣除空白后的荧光强度;
+                      文件不完整或波长轴与空白对照不一致时报ValueError
+        """
+        scan = SpectrumCache.parse(path)
+        if not scan.header.same_axis(self.blank.header):
+            raise ValueError("%s: 波长轴与空白对照不一致" % path)
+        wave_length = self.excitation_wave_length
+        return float(pick(scan.header, scan.intensity, wave_length)
+                     - pick(self.blank.header, self.blank.intensity, wave_length))
+
+    def publish(self, c0):
+        # 保存一个初始浓度的当前结果, 并只重绘该初始浓度的图片
+        series = self.series[c0]
+        if self.output is None:
+            return
+        os.makedirs(self.output, exist_ok=True)
+        name = "%g" % c0
+        with open(os.path.join(self.output, name + ".json"), "w", encoding="utf-8") as f:
+            json.dump({"c0": c0, "t": series.times, "qt": series.qt, "fits": series.fits()}, f,
+                      ensure_ascii=False, indent=2, default=float)
+        if self.figures and len(series.times) >= 2:
+            self.render(series, name)
+
+    def render(self, series, name):
+        # 直接绘制Series增量维护的拟合结果, 不重新拟合、不做bootstrap; 图片在后台线程写出, 不等待
+        from operation_model import Kinetics, axis_limits
+
+        fits = series.linear_fits()
+        t = series.times
+        x_limit = [0, t[-1] + 10]
+        pso = [ti / qi if qi != 0 else float("nan") for ti, qi in zip(t, series.qt)]
+        t_ipd = np.around(np.sqrt(t), 1)
+        Kinetics.kinetics_pso(t, pso, self.kind, 2, self.key, x_limit, axis_limits(pso),
+                              os.path.join(self.output, "pso_%s.png" % name), fit=fits["pso"])
+        Kinetics.kinetics_ipd(t_ipd, series.qt, self.kind, self.key, [0, t_ipd[-1] + 2], axis_limits(series.qt),
+                              os.path.join(self.output, "ipd_%s.png" % name), fit=fits["ipd"])
+        if "pfo" in fits:
+            pfo = [math.log(self.pfo_qe - q) if self.pfo_qe > q else float("nan") for q in series.qt]
+            Kinetics.kinetics_pfo(t, pfo, self.kind, 1, self.key, x_limit, axis_limits(pfo),
+                                  os.path.join(self.output, "pfo_%s.png" % name), fit=fits["pfo"])
+
+    def run(self, interval=0.2, timeout=None):
+        """
+        :description: 每隔interval秒轮询一次, 直到超时(为None时一直运行, Ctrl+C结束)
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                self.poll()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if self.figures:
+                from operation_model import Render
+                # 等待图片写完并释放模板图片
+                Render.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="吸附实验进行中增量更新q(t)与动力学拟合")
+    parser.add_argument("directory", help="数据目录, 文件名为<初始浓度>-<时间>.csv")
+    parser.add_argument("--a", type=float, required=True, help="标准曲线斜率")
+    parser.add_argument("--b", type=float, required=True, help="标准曲线截距")
+    parser.add_argument("--wave-length", type=float, default=526, help="激发波长")
+    parser.add_argument("--mass", type=float, default=0.02)
+    parser.add_argument("--init-volume", type=float, default=0.1)
+    parser.add_argument("--sample", type=float, default=0.004)
+    parser.add_argument("--blank", default=None, help="空白对照(水)的数据文件")
+    parser.add_argument("--kind", default=None, help="材料类型(carboxyl/amino/null), 给出时重绘图片")
+    parser.add_argument("--pfo-qe", type=float, default=None, help="PFO线性化使用的qe")
+    parser.add_argument("--output", default=None, help="结果与图片的保存目录")
+    parser.add_argument("--interval", type=float, default=0.2, help="轮询间隔(秒)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    if args.kind:
+        from operation_model import Render
+        Render.use_headless()
+    watcher = Watcher(args.directory, args.wave_length, args.a, args.b, args.mass, args.init_volume, args.sample,
+                      args.blank, args.kind, output=args.output, pfo_qe=args.pfo_qe)
+    watcher.run(args.interval)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())